@@ -1,36 +1,159 @@
 import streamlit as st
 import pandas as pd
-from utils.news_fetcher import fetch_news
-from utils.summarizer import summarize_news, configure_gemini
-from utils.sales_context import generate_sales_context, generate_email_pitch, setup_graph
+from utils.summarizer import configure_llm
+from utils.sales_context import setup_graph
 from utils.ui_components import (
     analyze_news_relevance, 
     display_news_articles, 
     display_summaries, 
     display_sales_context, 
     save_email_template, 
-    load_email_template,
-    display_multiple_emails
+    save_email_templates,
+    display_template_library,
+    display_multiple_emails,
+    display_batch_jobs,
+    display_timing_breakdown,
+    display_llm_usage
 )
+from utils.pipeline import NodeCache, run_pipeline, run_staged_batch, prospect_email_data, get_shared_news_cache
+from utils.journal import RunJournal, run_id_for, file_digest
+from utils.batch import stream_batch, read_prospects, read_columns, validate_columns, count_prospects, open_result_writer, result_record
+from utils.jobs import get_job_queue
+from utils.session_store import SessionNewsStore
+from utils.tracing import trace, start_metrics_server
+from utils.metering import attribution, over_budget
+from utils.usage_store import get_usage_store
 from utils.auth import signup, login, update_user_details, logout
-from utils.config import gemini_api_key, news_api_key, DEFAULT_KEYWORDS, TECH_SOURCES, INDUSTRY_SOURCES
+from utils.config import gemini_api_key, news_api_key, DEFAULT_KEYWORDS, TECH_SOURCES, INDUSTRY_SOURCES, LLM_PROVIDER, CACHE_DIR, SESSION_NODE_CACHE_ENTRIES
 from datetime import datetime
+import os
+
+PIPELINE_PROGRESS = {
+    "fetch_prospect_news": (0.15, "Step 2/4: Summarizing news articles..."),
+    "fetch_competitor_news": (0.25, "Step 2/4: Summarizing news articles..."),
+    "summarize_prospect_news": (0.40, "Step 3/4: Generating sales context and talking points..."),
+    "summarize_competitor_news": (0.50, "Step 3/4: Generating sales context and talking points..."),
+    "generate_sales_context": (0.75, "Step 4/4: Crafting your personalized email..."),
+    "email_option_1": (0.80, "Step 4/4: Crafting your personalized email..."),
+    "email_option_2": (0.85, "Step 4/4: Crafting your personalized email..."),
+    "email_option_3": (0.90, "Step 4/4: Crafting your personalized email..."),
+}
+
+EXPORT_FORMATS = {
+    "ZIP of .txt files": (".zip", "application/zip"),
+    "ZIP of .eml files": (".eml.zip", "application/zip"),
+    "CSV": (".csv", "text/csv"),
+}
+
+@st.cache_resource(ttl=3600)  # Cache the configured LLM provider and chat graph
+def load_llm():
+    llm = configure_llm()
+    return llm, setup_graph(llm)
+
+def record_pipeline_result(company, result):
+    st.session_state.news_store.record(company, result)
+
+def store_batch_results(batch_emails, export=None):
+    st.session_state.batch_emails = batch_emails
+    st.session_state.batch_export = export
+    st.session_state.batch_results_page = 0
+
+def display_batch_results():
+    export = st.session_state.get("batch_export")
+    if export and os.path.exists(export["path"]):
+        with open(export["path"], "rb") as f:
+            st.download_button("Download all emails", data=f, file_name=export["file_name"], mime=export["mime"])
+        st.subheader(f"📧 Most recent {len(st.session_state.batch_emails)} emails:")
+    else:
+        st.subheader("📧 Generated Emails:")
+    display_multiple_emails(st.session_state.batch_emails)
+
+def refresh_news_for(node_cache, *companies):
+    # Drop cached fetches and summaries for these companies, here and in the cross-session cache.
+    # The refetch is incremental: only articles newer than the last result are requested,
+    # summarized and merged, and an unchanged top set reuses the cached sales context.
+    for cache in (node_cache, get_shared_news_cache()):
+        if cache is not None:
+            cache.invalidate(*companies)
+
+def refreshing_rows(rows, competitor_company):
+    refresh_news_for(None, competitor_company)
+    seen = set()
+    for row in rows:
+        if row['prospect_company'] not in seen:
+            seen.add(row['prospect_company'])
+            refresh_news_for(None, row['prospect_company'])
+        yield row
+
+def batch_run_id(uploaded_file, base_email_data, settings, refresh_news):
+    # A refresh starts a new journal instead of replaying the previous run's results.
+    run_settings = {**settings, "refreshed_at": datetime.now().isoformat()} if refresh_news else settings
+    return run_id_for(file_digest(uploaded_file), base_email_data, run_settings)
+
+def run_streaming_batch(uploaded_file, base_email_data, settings, llm, graph, export_format, refresh_news):
+    try:
+        validate_columns(read_columns(uploaded_file))
+        total_prospects = count_prospects(uploaded_file)
+        run_id = batch_run_id(uploaded_file, base_email_data, settings, refresh_news)
+        suffix, mime = EXPORT_FORMATS[export_format]
+        export_dir = os.path.join(CACHE_DIR, "exports")
+        os.makedirs(export_dir, exist_ok=True)
+        export_path = os.path.join(export_dir, f"emails_{run_id}{suffix}")
+        progress_bar = st.progress(0)
+        progress_text = st.empty()
+        progress_text.text(f"Processing {total_prospects} prospects...")
+        completed = []
+
+        def on_result(index, row, record):
+            completed.append(index)
+            progress_bar.progress(min(len(completed) / max(1, total_prospects), 1.0))
+            progress_text.text(f"Processed prospect {len(completed)}/{total_prospects}: {row['prospect_name']}")
+
+        writer = open_result_writer(export_path, base_email_data=base_email_data)
+        try:
+            rows = read_prospects(uploaded_file)
+            if refresh_news:
+                rows = refreshing_rows(rows, base_email_data.get("competitor_company"))
+            with attribution(user=st.session_state.user["email"]):
+                summary = stream_batch(rows, writer, base_email_data, settings, llm, graph, journal=RunJournal(run_id), on_result=on_result)
+        finally:
+            writer.close()
+    except Exception as e:
+        st.error(f"❌ Error processing CSV: {str(e)}")
+        return
+    store_batch_results(summary["recent"], {"path": export_path, "mime": mime, "file_name": os.path.basename(export_path)})
+    st.session_state.email_content = ""
+    st.session_state.email_data = base_email_data
+    progress_text.success(f"✅ Generated {summary['processed']} emails ({summary['errors']} errors) in {summary['elapsed']:.0f}s")
+    display_batch_results()
+
+def submit_batch_job(uploaded_file, base_email_data, settings, export_format):
+    try:
+        validate_columns(read_columns(uploaded_file))
+        total_prospects = count_prospects(uploaded_file)
+        job_settings = {k: v for k, v in settings.items() if k != "news_api_key"}
+        job_id = get_job_queue().submit(
+            st.session_state.user["email"],
+            uploaded_file,
+            {"base_email_data": base_email_data, "settings": job_settings},
+            total_prospects,
+            EXPORT_FORMATS[export_format][0]
+        )
+    except Exception as e:
+        st.error(f"❌ Error processing CSV: {str(e)}")
+        return
+    st.success(f"✅ Queued background job {job_id} for {total_prospects} prospects. Track it in the Batch Jobs tab.")
 
 def main():
     st.set_page_config(page_title="📩 Smart B2B Email Generator", layout="wide")
     st.title("📩 Smart B2B Email Generator")
+    start_metrics_server()
 
     # Initialize session state
     if 'user' not in st.session_state:
         st.session_state.user = None
-    if 'articles_dict' not in st.session_state:
-        st.session_state.articles_dict = {}
-    if 'summaries_dict' not in st.session_state:
-        st.session_state.summaries_dict = {}
-    if 'competitor_summaries_dict' not in st.session_state:
-        st.session_state.competitor_summaries_dict = {}
-    if 'sales_context_dict' not in st.session_state:
-        st.session_state.sales_context_dict = {}
+    if 'news_store' not in st.session_state:
+        st.session_state.news_store = SessionNewsStore()
     if 'email_content' not in st.session_state:
         st.session_state.email_content = ""
     if 'email_data' not in st.session_state:
@@ -41,6 +164,8 @@ def main():
         st.session_state.batch_emails = []
     if 'current_mode' not in st.session_state:
         st.session_state.current_mode = "Single Prospect"
+    if 'pipeline_cache' not in st.session_state:
+        st.session_state.pipeline_cache = NodeCache(max_entries=SESSION_NODE_CACHE_ENTRIES)
 
     # Authentication
     if not st.session_state.user:
@@ -79,7 +204,7 @@ def main():
 
     # Load models
     missing_keys = []
-    if not gemini_api_key:
+    if not gemini_api_key and LLM_PROVIDER.lower() in ("gemini", "record"):
         missing_keys.append("GEMINI_API_KEY")
     if not news_api_key:
         missing_keys.append("NEWS_API")
@@ -87,17 +212,14 @@ def main():
         st.error(f"❌ Missing API keys: {', '.join(missing_keys)}! Set these in your .env file.")
         st.stop()
 
-    with st.spinner("Loading models..."):
-        gemini_model = configure_gemini()
-        graph = setup_graph(gemini_api_key)
-
     # Main application
     st.sidebar.header(f"Welcome, {st.session_state.user['salesperson_name']}")
     if st.sidebar.button("Logout"):
         logout()
         st.rerun()
+    show_timings = st.sidebar.checkbox("Show timing breakdown", value=False)
 
-    tabs = st.tabs(["Email Generator", "Saved Templates", "Settings"])
+    tabs = st.tabs(["Email Generator", "Batch Jobs", "Saved Templates", "Settings"])
 
     with tabs[0]:
         st.subheader("Select Email Generation Mode")
@@ -152,6 +274,9 @@ def main():
                     date_range = st.slider("Search date range (days)", min_value=7, max_value=90, value=30)
                     generate_context = st.checkbox("Generate sales context", value=True)
                     refresh_news = st.checkbox("Refresh news data", value=False)
+                    stream_results = st.checkbox("Stream CSV results to a file (large uploads)", value=False)
+                    background_job = st.checkbox("Run CSV batch as a background job", value=False)
+                    export_format = st.selectbox("Streamed export format:", list(EXPORT_FORMATS.keys()))
 
             submitted = st.form_submit_button("Generate Personalized Email(s)")
 
@@ -178,112 +303,55 @@ def main():
                 "competitor_company": competitor_company
             }
 
+            settings = {
+                "news_api_key": news_api_key,
+                "product_keywords": product_keywords_list,
+                "industry": industry.lower(),
+                "min_articles": min_articles,
+                "max_articles": max_articles,
+                "generate_context": generate_context
+            }
+            node_cache = st.session_state.pipeline_cache
+            # Loaded on the first generation rather than on page render: building the LLM
+            # client and graph imports google.generativeai and langgraph.
+            with st.spinner("Loading models..."):
+                llm, graph = load_llm()
+            if over_budget(st.session_state.user["email"]):
+                st.info("ℹ Today's LLM budget is used up: emails are generated in economy mode (headline summaries, no sales context, one email option).")
+
             # Generate emails based on mode
             if mode == "Single Prospect":
                 if not all([prospect_name, prospect_title, prospect_email, prospect_company]):
                     st.warning("⚠ Please fill in all prospect details for single prospect mode.")
                     return
-                email_data = base_email_data.copy()
-                email_data.update({
+                email_data = prospect_email_data(base_email_data, {
                     "prospect_name": prospect_name,
                     "prospect_title": prospect_title,
                     "prospect_email": prospect_email,
-                    "prospect_company": prospect_company,
-                    "company_name": prospect_company
+                    "prospect_company": prospect_company
                 })
-
-                # Fetch news
-                if refresh_news or prospect_company not in st.session_state.articles_dict:
-                    st.session_state.articles_dict[prospect_company] = []
-                    st.session_state.summaries_dict[prospect_company] = []
-                    st.session_state.competitor_summaries_dict[prospect_company] = []
-                    st.session_state.sales_context_dict[prospect_company] = ""
-
-                    progress_bar = st.progress(0)
-                    progress_text = st.empty()
-
-                    progress_text.text("Step 1/4: Searching for relevant news articles...")
-                    articles = fetch_news(
-                        prospect_company, 
-                        news_api_key, 
-                        product_keywords_list, 
-                        industry.lower(),
-                        min_articles, 
-                        max_articles,
-                        competitor_company=competitor_company
-                    )
-                    st.session_state.articles_dict[prospect_company] = articles
-                    progress_bar.progress(0.25)
-
-                    prospect_articles = [a for a in articles if not a.get("is_competitor", False)][:max_articles]
-                    competitor_articles = [a for a in articles if a.get("is_competitor", False)][:min(2, max_articles)]
-
-                    if not prospect_articles:
-                        print(f"No news found for {prospect_company}. Checking competitor news for {competitor_company}.")
-                        news_summary = f"No specific recent news found for {prospect_company}."
-                        summaries = []
-                    else:
-                        progress_text.text(f"Step 2/4: Summarizing {len(prospect_articles)} news articles for {prospect_company}...")
-                        summaries = []
-                        for i, article in enumerate(prospect_articles[:max_articles]):  # Limit to max_articles
-                            summary = summarize_news(article, gemini_model)
-                            if summary:
-                                summaries.append(summary)
-                            sub_progress = 0.25 + (i + 1) / max(1, len(prospect_articles)) * 0.25
-                            progress_bar.progress(min(sub_progress, 0.50))
-                        st.session_state.summaries_dict[prospect_company] = summaries
-                        news_summary = "\n\n".join(summaries[:3]) if summaries else f"No specific recent news found for {prospect_company}."
-
-                    competitor_summaries = []
-                    if competitor_articles:
-                        progress_text.text(f"Summarizing {len(competitor_articles)} news articles for {competitor_company}...")
-                        for i, article in enumerate(competitor_articles[:min(2, max_articles)]):  # Limit to 2 or max_articles
-                            summary = summarize_news(article, gemini_model)
-                            if summary:
-                                competitor_summaries.append(summary)
-                            sub_progress = 0.25 + (i + 1) / max(1, len(competitor_articles)) * 0.25
-                            progress_bar.progress(min(sub_progress, 0.50))
-                        st.session_state.competitor_summaries_dict[prospect_company] = competitor_summaries
-                    competitor_summary = "\n\n".join(competitor_summaries[:2]) if competitor_summaries else ""
-
-                    if not prospect_articles and not competitor_summaries:
-                        print(f"No news found for {prospect_company} or {competitor_company}. Falling back to industry trends.")
-                    elif not prospect_articles and competitor_summaries:
-                        print(f"No news found for {prospect_company}. Using competitor news for {competitor_company}.")
-
-                    progress_bar.progress(0.50)
-                else:
-                    articles = st.session_state.articles_dict.get(prospect_company, [])
-                    prospect_articles = [a for a in articles if not a.get("is_competitor", False)][:max_articles]
-                    competitor_articles = [a for a in articles if a.get("is_competitor", False)][:min(2, max_articles)]
-                    summaries = st.session_state.summaries_dict.get(prospect_company, [])
-                    competitor_summaries = st.session_state.competitor_summaries_dict.get(prospect_company, [])
-                    news_summary = "\n\n".join(summaries[:3]) if summaries else f"No specific recent news found for {prospect_company}."
-                    competitor_summary = "\n\n".join(competitor_summaries[:2]) if competitor_summaries else ""
-                    if not prospect_articles and not competitor_summaries:
-                        print(f"Using cached empty news for {prospect_company} and {competitor_company}. Falling back to industry trends.")
-                    elif not prospect_articles and competitor_summaries:
-                        print(f"Using cached empty news for {prospect_company}. Using competitor news for {competitor_company}.")
-                    progress_bar = st.progress(0.50)
-                    progress_text = st.empty()
-
-                if generate_context:
-                    progress_text.text("Step 3/4: Generating sales context and talking points...")
-                    sales_context = generate_sales_context(email_data, news_summary, competitor_summary, graph)
-                    st.session_state.sales_context = sales_context
-                    st.session_state.sales_context_dict[prospect_company] = sales_context
-                    progress_bar.progress(0.75)
-                else:
-                    sales_context = ""
-                    st.session_state.sales_context = sales_context
-                    st.session_state.sales_context_dict[prospect_company] = sales_context
-                    progress_bar.progress(0.75)
-
-                progress_text.text("Step 4/4: Crafting your personalized email...")
-                email_content = generate_email_pitch(email_data, news_summary, sales_context, competitor_summary, graph)
+                if refresh_news:
+                    refresh_news_for(node_cache, prospect_company, competitor_company)
+
+                progress_bar = st.progress(0)
+                progress_text = st.empty()
+                progress_text.text("Step 1/4: Searching for relevant news articles...")
+
+                def on_step(node_name, update):
+                    if node_name in PIPELINE_PROGRESS:
+                        progress, message = PIPELINE_PROGRESS[node_name]
+                        progress_bar.progress(progress)
+                        progress_text.text(message)
+
+                with attribution(user=st.session_state.user["email"]), trace("generate_email", company=prospect_company) as email_trace:
+                    result = run_pipeline(email_data, settings, llm, graph, node_cache, on_step=on_step)
+                st.session_state.timing_breakdown = email_trace.breakdown()
+                record_pipeline_result(prospect_company, result)
+                email_content = result.get("email_content", "")
+                st.session_state.sales_context = result.get("sales_context", "")
                 st.session_state.email_content = email_content
                 st.session_state.email_data = email_data
-                st.session_state.batch_emails = []
+                store_batch_results([])
 
                 if template_name:
                     save_email_template(email_content, template_name)
@@ -294,6 +362,8 @@ def main():
 
                 st.subheader("📧 Your Personalized Email:")
                 email_box = st.text_area("", email_content, height=400)
+                if show_timings:
+                    display_timing_breakdown(st.session_state.timing_breakdown)
 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -312,156 +382,64 @@ def main():
                 if not uploaded_file:
                     st.warning("⚠ Please upload a CSV file with prospect details.")
                     return
+                if background_job:
+                    submit_batch_job(uploaded_file, base_email_data, settings, export_format)
+                    return
+                if stream_results:
+                    run_streaming_batch(uploaded_file, base_email_data, settings, llm, graph, export_format, refresh_news)
+                    return
                 try:
                     df = pd.read_csv(uploaded_file)
                     required_columns = ['prospect_name', 'prospect_title', 'prospect_email', 'prospect_company']
                     if not all(col in df.columns for col in required_columns):
                         st.error("❌ CSV must contain columns: prospect_name, prospect_title, prospect_email, prospect_company")
                         return
-                    batch_emails = []
+                    rows = df[required_columns].to_dict("records")
+                    if refresh_news:
+                        refresh_news_for(node_cache, competitor_company, *{row['prospect_company'] for row in rows})
                     progress_bar = st.progress(0)
                     progress_text = st.empty()
-                    total_prospects = len(df)
-                    prospect_weight = 1.0 / total_prospects
-
-                    for idx, row in df.iterrows():
-                        email_data = base_email_data.copy()
-                        email_data.update({
-                            "prospect_name": row['prospect_name'],
-                            "prospect_title": row['prospect_title'],
-                            "prospect_email": row['prospect_email'],
-                            "prospect_company": row['prospect_company'],
-                            "company_name": row['prospect_company']
-                        })
-
-                        base_progress = idx * prospect_weight
-                        progress_text.text(f"Processing prospect {idx + 1}/{total_prospects}: {row['prospect_name']}...")
-
-                        if refresh_news or row['prospect_company'] not in st.session_state.articles_dict:
-                            st.session_state.articles_dict[row['prospect_company']] = []
-                            st.session_state.summaries_dict[row['prospect_company']] = []
-                            st.session_state.competitor_summaries_dict[row['prospect_company']] = []
-                            st.session_state.sales_context_dict[row['prospect_company']] = ""
-
-                            progress_text.text(f"Step 1/4: Searching for relevant news articles for {row['prospect_company']}...")
-                            articles = fetch_news(
-                                row['prospect_company'], 
-                                news_api_key, 
-                                product_keywords_list, 
-                                industry.lower(),
-                                min_articles, 
-                                max_articles,
-                                competitor_company=competitor_company
-                            )
-                            st.session_state.articles_dict[row['prospect_company']] = articles
-                            progress_bar.progress(base_progress + prospect_weight * 0.25)
-
-                            prospect_articles = [a for a in articles if not a.get("is_competitor", False)][:max_articles]
-                            competitor_articles = [a for a in articles if a.get("is_competitor", False)][:min(2, max_articles)]
-
-                            if not prospect_articles:
-                                print(f"No news found for {row['prospect_company']}. Checking competitor news for {competitor_company}.")
-                                news_summary = f"No specific recent news found for {row['prospect_company']}."
-                                summaries = []
-                            else:
-                                progress_text.text(f"Step 2/4: Summarizing {len(prospect_articles)} news articles for {row['prospect_company']}...")
-                                summaries = []
-                                for i, article in enumerate(prospect_articles[:max_articles]):  # Limit to max_articles
-                                    summary = summarize_news(article, gemini_model)
-                                    if summary:
-                                        summaries.append(summary)
-                                    sub_progress = base_progress + 0.25 * prospect_weight + (i + 1) / max(1, len(prospect_articles)) * 0.25 * prospect_weight
-                                    progress_bar.progress(min(sub_progress, base_progress + 0.50 * prospect_weight))
-                                st.session_state.summaries_dict[row['prospect_company']] = summaries
-                                news_summary = "\n\n".join(summaries[:3]) if summaries else f"No specific recent news found for {row['prospect_company']}."
-
-                            competitor_summaries = []
-                            if competitor_articles:
-                                progress_text.text(f"Summarizing {len(competitor_articles)} news articles for {competitor_company}...")
-                                for i, article in enumerate(competitor_articles[:min(2, max_articles)]):  # Limit to 2 or max_articles
-                                    summary = summarize_news(article, gemini_model)
-                                    if summary:
-                                        competitor_summaries.append(summary)
-                                    sub_progress = base_progress + 0.25 * prospect_weight + (i + 1) / max(1, len(competitor_articles)) * 0.25 * prospect_weight
-                                    progress_bar.progress(min(sub_progress, base_progress + 0.50 * prospect_weight))
-                                st.session_state.competitor_summaries_dict[row['prospect_company']] = competitor_summaries
-                            competitor_summary = "\n\n".join(competitor_summaries[:2]) if competitor_summaries else ""
-
-                            if not prospect_articles and not competitor_summaries:
-                                print(f"No news found for {row['prospect_company']} or {competitor_company}. Falling back to industry trends.")
-                            elif not prospect_articles and competitor_summaries:
-                                print(f"No news found for {row['prospect_company']}. Using competitor news for {competitor_company}.")
-                        else:
-                            articles = st.session_state.articles_dict.get(row['prospect_company'], [])
-                            prospect_articles = [a for a in articles if not a.get("is_competitor", False)][:max_articles]
-                            competitor_articles = [a for a in articles if a.get("is_competitor", False)][:min(2, max_articles)]
-                            summaries = st.session_state.summaries_dict.get(row['prospect_company'], [])
-                            competitor_summaries = st.session_state.competitor_summaries_dict.get(row['prospect_company'], [])
-                            news_summary = "\n\n".join(summaries[:3]) if summaries else f"No specific recent news found for {row['prospect_company']}."
-                            competitor_summary = "\n\n".join(competitor_summaries[:2]) if competitor_summaries else ""
-                            if not prospect_articles and not competitor_summaries:
-                                print(f"Using cached empty news for {row['prospect_company']} and {competitor_company}. Falling back to industry trends.")
-                            elif not prospect_articles and competitor_summaries:
-                                print(f"Using cached empty news for {row['prospect_company']}. Using competitor news for {competitor_company}.")
-                            progress_bar.progress(base_progress + 0.50 * prospect_weight)
-
-                        if generate_context:
-                            progress_text.text(f"Step 3/4: Generating sales context for {row['prospect_company']}...")
-                            sales_context = generate_sales_context(email_data, news_summary, competitor_summary, graph)
-                            st.session_state.sales_context_dict[row['prospect_company']] = sales_context
-                            progress_bar.progress(base_progress + 0.75 * prospect_weight)
-                        else:
-                            sales_context = ""
-                            st.session_state.sales_context_dict[row['prospect_company']] = sales_context
-                            progress_bar.progress(base_progress + 0.75 * prospect_weight)
-
-                        progress_text.text(f"Step 4/4: Crafting personalized email for {row['prospect_name']}...")
-                        email_content = generate_email_pitch(email_data, news_summary, sales_context, competitor_summary, graph)
-                        batch_emails.append({
-                            "prospect_name": row['prospect_name'],
-                            "prospect_email": row['prospect_email'],
-                            "email_content": email_content
-                        })
-                        progress_bar.progress(base_progress + prospect_weight)
-
-                    st.session_state.batch_emails = batch_emails
+                    total_prospects = len(rows)
+                    completed = []
+
+                    def on_result(index, row, result):
+                        record_pipeline_result(row['prospect_company'], result)
+                        completed.append(index)
+                        progress_bar.progress(len(completed) / total_prospects)
+                        progress_text.text(f"Processed prospect {len(completed)}/{total_prospects}: {row['prospect_name']}")
+
+                    progress_text.text(f"Processing {total_prospects} prospects...")
+                    journal = RunJournal(batch_run_id(uploaded_file, base_email_data, settings, refresh_news))
+                    with attribution(user=st.session_state.user["email"]):
+                        results = run_staged_batch(rows, base_email_data, settings, llm, graph, node_cache, on_result=on_result, journal=journal)
+                    batch_emails = [result_record(i, row, result) for i, (row, result) in enumerate(zip(rows, results))]
+
+                    store_batch_results(batch_emails)
                     st.session_state.email_content = ""
                     st.session_state.email_data = base_email_data
 
                     if template_name:
-                        for email in batch_emails:
-                            save_email_template(email['email_content'], f"{template_name}_{email['prospect_email']}")
+                        save_email_templates({f"{template_name}_{email['prospect_email']}": email['email_content'] for email in batch_emails})
                         st.success(f"✅ Email templates saved with prefix '{template_name}'!")
 
                     progress_text.success("✅ Emails generated successfully!")
 
-                    st.subheader("📧 Generated Emails:")
-                    display_multiple_emails(batch_emails)
+                    display_batch_results()
                 except Exception as e:
                     st.error(f"❌ Error processing CSV: {str(e)}")
                     return
+        elif st.session_state.batch_emails:
+            # Paging and search controls rerun the script without the form being submitted.
+            display_batch_results()
 
     with tabs[1]:
-        st.subheader("📋 Saved Email Templates")
-        if 'email_templates' not in st.session_state or not st.session_state.email_templates:
-            st.info("No saved templates yet. Save templates in the Email Generator tab.")
-        else:
-            template_content = load_email_template()
-            if template_content:
-                st.text_area("Template Content", template_content, height=400)
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Copy Template"):
-                        st.success("✅ Template copied to clipboard!")
-                with col2:
-                    if st.button("Delete Template"):
-                        template_name = st.session_state.get('selected_template')
-                        if template_name and template_name in st.session_state.email_templates:
-                            del st.session_state.email_templates[template_name]
-                            st.success(f"✅ Template '{template_name}' deleted!")
-                            st.rerun()
+        display_batch_jobs(get_job_queue(), st.session_state.user["email"])
 
     with tabs[2]:
+        st.subheader("📋 Saved Email Templates")
+        display_template_library(st.session_state.user["email"])
+
+    with tabs[3]:
         st.subheader("⚙ Application Settings")
         with st.expander("User Details", expanded=True):
             st.markdown("Update your personal details below:")
@@ -502,12 +480,22 @@ def main():
                 except:
                     st.error("Error updating keywords")
 
-    if st.session_state.articles_dict:
+        with st.expander("LLM Usage", expanded=False):
+            display_llm_usage(get_usage_store(), st.session_state.user["email"])
+
+    if st.session_state.news_store:
         st.markdown("---")
         st.header("📊 News Analysis")
+        news_store = st.session_state.news_store
         product_keywords_list = []
         if st.session_state.email_data.get("product_keywords"):
             product_keywords_list = [k.strip() for k in st.session_state.email_data.get("product_keywords", "").split(",") if k.strip()]
+        # One account at a time: the tabs below cost the same however many accounts a batch covered.
+        companies = news_store.companies()[::-1]
+        company = st.selectbox("Account:", companies, key="analysis_company")
+        company_news = news_store.get(company)
+        if company_news is None:
+            return
         analysis_tab, news_tab, summary_tab, context_tab = st.tabs([
             "Relevance Analysis", 
             "News Articles", 
@@ -515,17 +503,13 @@ def main():
             "Sales Context"
         ])
         with analysis_tab:
-            analyze_news_relevance(
-                st.session_state.articles_dict, 
-                st.session_state.summaries_dict,
-                product_keywords_list
-            )
+            analyze_news_relevance(news_store.account_summary(), news_store.metrics_frame(), company)
         with news_tab:
-            display_news_articles(st.session_state.articles_dict, product_keywords_list)
+            display_news_articles({company: company_news.articles}, product_keywords_list)
         with summary_tab:
-            display_summaries(st.session_state.articles_dict, st.session_state.summaries_dict)
+            display_summaries({company: company_news.articles}, {company: company_news.summaries})
         with context_tab:
-            display_sales_context(st.session_state.sales_context_dict)
+            display_sales_context({company: company_news.sales_context})
 
 if __name__ == "__main__":
     main()
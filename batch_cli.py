@@ -0,0 +1,114 @@
+import argparse
+import glob
+import sys
+from utils.batch import run_batch_file, merge_results
+from utils.sharding import run_sharded_batch, run_shard
+from utils.llm import get_llm_provider
+from utils.sales_context import setup_graph
+from utils.metering import attribution
+from utils.config import news_api_key, LLM_PROVIDER, BATCH_STAGE_CONCURRENCY, BATCH_QUEUE_SIZE
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate personalized emails for a prospect CSV without the Streamlit UI.")
+    parser.add_argument("input", help="CSV with prospect_name, prospect_title, prospect_email, prospect_company columns (with --merge: a glob of shard result files)")
+    parser.add_argument("output", help="Result file: .csv, .zip (one .txt per email), .eml.zip (one .eml per email) or JSON lines otherwise")
+    parser.add_argument("--salesperson-name", default="")
+    parser.add_argument("--salesperson-title", default="")
+    parser.add_argument("--salesperson-company", default="")
+    parser.add_argument("--salesperson-email", default="")
+    parser.add_argument("--salesperson-mobile", default="")
+    parser.add_argument("--salesperson-website", default="")
+    parser.add_argument("--salesperson-linkedin", default="")
+    parser.add_argument("--product-name", default="")
+    parser.add_argument("--product-description", default="")
+    parser.add_argument("--product-keywords", default="", help="Comma-separated keywords")
+    parser.add_argument("--product-usp", default="")
+    parser.add_argument("--competitor", default="")
+    parser.add_argument("--industry", default="tech")
+    parser.add_argument("--tone", default="professional")
+    parser.add_argument("--length", default="medium", choices=["short", "medium", "long"])
+    parser.add_argument("--email-type", default="initial pitch", choices=["initial pitch", "follow-up", "thank you", "schedule meeting/demo"])
+    parser.add_argument("--min-articles", type=int, default=2)
+    parser.add_argument("--max-articles", type=int, default=5)
+    parser.add_argument("--no-context", action="store_true", help="Skip sales context generation")
+    parser.add_argument("--llm-provider", default=LLM_PROVIDER, help="gemini, stub, record or replay")
+    for stage, default in BATCH_STAGE_CONCURRENCY.items():
+        parser.add_argument(f"--{stage}-concurrency", type=int, default=default)
+    parser.add_argument("--queue-size", type=int, default=BATCH_QUEUE_SIZE)
+    parser.add_argument("--no-resume", action="store_true", help="Ignore and do not write the run journal")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes; rows are sharded by prospect_company")
+    parser.add_argument("--shard-index", type=int, help="Process only this shard (for spreading one CSV across machines)")
+    parser.add_argument("--shard-count", type=int, help="Total number of shards when using --shard-index")
+    parser.add_argument("--merge", action="store_true", help="Merge shard result files matching INPUT into OUTPUT in row order")
+    parser.add_argument("--user", help="Login email that LLM usage (and its daily budget) is attributed to; defaults to --salesperson-email")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.merge:
+        shard_paths = sorted(glob.glob(args.input))
+        if not shard_paths:
+            print(f"No shard result files match {args.input}", file=sys.stderr)
+            return 1
+        merged = merge_results(shard_paths, args.output)
+        print(f"Merged {merged} results from {len(shard_paths)} shard files -> {args.output}")
+        return 0
+    if (args.shard_index is None) != (args.shard_count is None):
+        print("--shard-index and --shard-count must be given together", file=sys.stderr)
+        return 1
+    if args.shard_index is not None and not 0 <= args.shard_index < args.shard_count:
+        print(f"--shard-index must be between 0 and --shard-count - 1 ({args.shard_count - 1})", file=sys.stderr)
+        return 1
+    if not news_api_key:
+        print("Missing API key: NEWS_API! Set it in your .env file.", file=sys.stderr)
+        return 1
+    base_email_data = {
+        "salesperson_name": args.salesperson_name,
+        "salesperson_title": args.salesperson_title,
+        "salesperson_company": args.salesperson_company,
+        "salesperson_email": args.salesperson_email,
+        "salesperson_mobile": args.salesperson_mobile,
+        "salesperson_website": args.salesperson_website,
+        "salesperson_linkedin": args.salesperson_linkedin,
+        "product_name": args.product_name,
+        "product_description": args.product_description,
+        "product_usp": args.product_usp,
+        "tone": args.tone.lower(),
+        "length": args.length,
+        "email_type": args.email_type,
+        "industry": args.industry.lower(),
+        "product_keywords": args.product_keywords,
+        "competitor_company": args.competitor
+    }
+    settings = {
+        "news_api_key": news_api_key,
+        "product_keywords": [k.strip() for k in args.product_keywords.split(",") if k.strip()],
+        "industry": args.industry.lower(),
+        "min_articles": args.min_articles,
+        "max_articles": args.max_articles,
+        "generate_context": not args.no_context
+    }
+    stage_concurrency = {stage: getattr(args, f"{stage}_concurrency") for stage in BATCH_STAGE_CONCURRENCY}
+    llm = get_llm_provider(args.llm_provider) if args.workers <= 1 and args.shard_index is None else None
+    graph = setup_graph(llm) if llm else None
+
+    def on_result(index, row, record):
+        print(f"[{record['status']}] row {index}: {row['prospect_name']} ({row['prospect_company']})")
+
+    user = args.user or args.salesperson_email
+    try:
+        if args.shard_index is not None:
+            summary = run_shard(args.input, args.output, base_email_data, settings, args.shard_index, args.shard_count, stage_concurrency, args.llm_provider, resume=not args.no_resume, user=user, queue_size=args.queue_size)
+        elif args.workers > 1:
+            summary = run_sharded_batch(args.input, args.output, base_email_data, settings, args.workers, stage_concurrency, args.llm_provider, resume=not args.no_resume, user=user, queue_size=args.queue_size)
+        else:
+            with attribution(user=user):
+                summary = run_batch_file(args.input, args.output, base_email_data, settings, llm, graph, stage_concurrency, args.queue_size, on_result, resume=not args.no_resume)
+    except ValueError as e:
+        print(f"Error processing CSV: {str(e)}", file=sys.stderr)
+        return 1
+    print(f"Processed {summary['processed']} prospects ({summary['errors']} errors) in {summary['elapsed']:.1f}s -> {args.output}")
+    return 0 if summary["errors"] == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
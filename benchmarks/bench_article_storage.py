@@ -0,0 +1,111 @@
+"""Memory and disk size of cached articles: plain dicts against compact, compressed records.
+
+    python -m benchmarks.bench_article_storage --articles 10000
+    python -m benchmarks.bench_article_storage --codecs none,zlib --output storage.json
+
+Articles are built offline from the recorded fixtures the way the news fetcher builds them
+(NewsAPI fields, scraped body, relevance details), each under a distinct company name and
+with a distinct body, so the content store's sharing of identical bodies does not flatter
+the compact layout. Memory is what the retained objects allocate (tracemalloc);
+disk is the pickled size of the whole set, as a disk-backed cache would store it.
+"""
+import argparse
+import gc
+import json
+import pickle
+import sys
+import time
+import tracemalloc
+from benchmarks.bench_suite import per_call_us
+from benchmarks.stub_services import FIXTURES_DIR, FixtureSet
+
+def fixture_articles(count, fixtures):
+    """`count` article dicts serialized as JSON lines, so each measured load gets fresh strings."""
+    from utils.news_fetcher import calculate_relevance_score, extract_text_from_html, relevance_metrics
+    keywords = ["cloud", "AI", "security"]
+    page_texts = {name: extract_text_from_html(html) for name, html in fixtures.pages.items()}
+    lines = []
+    company_number = 0
+    while len(lines) < count:
+        company = f"Storage Co {company_number}"
+        company_number += 1
+        for item in json.loads(fixtures.newsapi_response(company, "http://bench.invalid", 10))["articles"]:
+            page = page_texts.get(item["url"].rsplit("/", 1)[-1])
+            article = {
+                "title": item["title"], "description": item.get("description", ""), "content": item.get("content", ""),
+                "url": item["url"], "publishedAt": item.get("publishedAt", ""), "source": item.get("source", {}).get("name", "Unknown Source"),
+                "company_name": company, "is_competitor": False,
+            }
+            if page:
+                # A distinct first line per article keeps the content store from sharing bodies.
+                article["full_content"] = f"{company}: {item['title']}.\n{page}"
+            text = f"{article['title']} {article['description']} {article['content']}"
+            article["relevance_score"], article["relevance_details"] = calculate_relevance_score(text, company, keywords, "tech")
+            article["relevance_metrics"] = relevance_metrics(article)
+            lines.append(json.dumps(article))
+            if len(lines) == count:
+                break
+    return lines
+
+def retained_bytes(build):
+    """Bytes still allocated by build()'s result once its temporaries are collected."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, retained
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--articles", type=int, default=10000)
+    parser.add_argument("--codecs", default="none,zlib,zstd", help="Comma-separated codecs for the compact records")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    from utils.session_store import ArticleRecord, ContentStore
+    lines = fixture_articles(args.articles, FixtureSet(FIXTURES_DIR))
+    body_chars = sum(len(json.loads(line).get("full_content", "")) for line in lines)
+
+    articles, dict_bytes = retained_bytes(lambda: [json.loads(line) for line in lines])
+    report = {
+        "articles": len(lines),
+        "body_chars": body_chars,
+        "dict": {"memory_mb": round(dict_bytes / 1e6, 2), "pickle_mb": round(len(pickle.dumps(articles)) / 1e6, 2)},
+    }
+    del articles
+    for codec in [c for c in args.codecs.split(",") if c]:
+        if codec == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                print("zstd skipped: the optional zstandard package is not installed", file=sys.stderr)
+                continue
+        store = ContentStore(max_bytes=1 << 40, codec=codec)
+        started = time.perf_counter()
+        records, record_bytes = retained_bytes(lambda: [ArticleRecord.from_article(json.loads(line), store) for line in lines])
+        build_seconds = time.perf_counter() - started
+        with_body = [record for record in records if record.body is not None]
+        report[f"record_{codec}"] = {
+            "memory_mb": round(record_bytes / 1e6, 2),
+            "pickle_mb": round(len(pickle.dumps(records)) / 1e6, 2),
+            "body_mb": round(store.size / 1e6, 2),
+            "build_us_per_article": round(build_seconds / len(lines) * 1e6, 1),
+            "read_body_us": per_call_us(lambda record: record.full_content, with_body[:500]) if with_body else None,
+        }
+        del records, with_body, store
+
+    print(f"{report['articles']} articles, {report['body_chars'] / 1e6:.1f}M body characters")
+    print(f"  {'layout':<14} {'memory MB':>10} {'pickle MB':>10} {'bodies MB':>10} {'read body us':>13}")
+    for name, row in report.items():
+        if isinstance(row, dict):
+            print(f"  {name:<14} {row['memory_mb']:>10} {row['pickle_mb']:>10} {row.get('body_mb', ''):>10} {row.get('read_body_us') or '':>13}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""LLM calls and input tokens per CSV row with and without batched email generation.
+
+    python -m benchmarks.bench_email_batching --rows 200 --per-company 5
+    python -m benchmarks.bench_email_batching --rows 200 --per-company 5 --shuffle --llm-latency 0.2
+
+Runs the same CSV batch through run_staged_batch once with one LLM call per email option
+and once with prospects at the same company sharing batched calls, against the recorded
+fixtures and the stub LLM. Each mode uses its own company names, so both do the same fetch,
+summarize and context work; usage comes from the metering store.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from benchmarks.bench_suite import bench_email_data
+from benchmarks.stub_services import FIXTURES_DIR, start_stub_services, stub_environment
+
+def batch_rows(count, per_company, prefix, shuffle):
+    rows = [
+        {"prospect_name": f"Prospect {i}", "prospect_title": "CTO", "prospect_email": f"p{i}@example.com", "prospect_company": f"{prefix} Co {i // per_company}"}
+        for i in range(count)
+    ]
+    if shuffle:
+        random.Random(0).shuffle(rows)
+    return rows
+
+def run_mode(label, email_batch_size, args, llm, graph, settings):
+    from utils.pipeline import run_staged_batch
+    from utils.metering import attribution
+    from utils.usage_store import get_usage_store
+    rows = batch_rows(args.rows, args.per_company, label, args.shuffle)
+    started = time.perf_counter()
+    with attribution(user=f"bench-{label}"):
+        results = run_staged_batch(rows, bench_email_data(""), settings, llm, graph, email_batch_size=email_batch_size)
+    elapsed = time.perf_counter() - started
+    usage = get_usage_store().summary(group_by=("stage",), user=f"bench-{label}")
+    email_usage = [stage for stage in usage if stage["stage"] in ("email_variant", "email_batch")]
+    return {
+        "seconds": round(elapsed, 2),
+        "errors": sum(1 for result in results if result.get("error")),
+        "llm_calls_per_row": round(sum(stage["calls"] for stage in usage) / len(rows), 2),
+        "email_calls_per_row": round(sum(stage["calls"] for stage in email_usage) / len(rows), 2),
+        "input_tokens": sum(stage["prompt_tokens"] for stage in usage),
+        "email_input_tokens": sum(stage["prompt_tokens"] for stage in email_usage),
+        "by_stage": {stage["stage"]: {"calls": stage["calls"], "prompt_tokens": stage["prompt_tokens"]} for stage in usage},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--per-company", type=int, default=5, help="Prospects per company in the CSV")
+    parser.add_argument("--shuffle", action="store_true", help="Interleave companies instead of listing each company's prospects together")
+    parser.add_argument("--batch-size", type=int, default=None, help="Prospects per batched call (default: EMAIL_BATCH_MAX_PROSPECTS)")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    server, base_url, _ = start_stub_services(fixtures_dir=FIXTURES_DIR)
+    workdir = tempfile.TemporaryDirectory()
+    os.environ.update(stub_environment(base_url, llm_latency=args.llm_latency))
+    os.environ.update({"CACHE_DIR": workdir.name, "TRACE_EXPORT_PATH": ""})
+
+    from utils.config import EMAIL_BATCH_MAX_PROSPECTS
+    from utils.llm import StubProvider
+    from utils.sales_context import setup_graph
+    llm = StubProvider(latency=args.llm_latency)
+    graph = setup_graph(llm)
+    settings = {"news_api_key": os.environ["NEWS_API"], "product_keywords": ["cloud", "AI", "security"], "industry": "tech", "min_articles": 2, "max_articles": 4, "generate_context": True}
+    batch_size = args.batch_size or EMAIL_BATCH_MAX_PROSPECTS
+    report = {
+        "rows": args.rows, "per_company": args.per_company, "shuffle": args.shuffle, "batch_size": batch_size,
+        "single": run_mode("single", 1, args, llm, graph, settings),
+        "batched": run_mode("batched", batch_size, args, llm, graph, settings),
+    }
+    server.shutdown()
+    workdir.cleanup()
+
+    single, batched = report["single"], report["batched"]
+    print(f"{args.rows} rows, {args.per_company} prospects per company{' (shuffled)' if args.shuffle else ''}, up to {batch_size} per batched call")
+    print(f"  {'mode':<8} {'seconds':>8} {'errors':>7} {'calls/row':>10} {'email calls/row':>16} {'input tokens':>13} {'email input':>12}")
+    for name in ("single", "batched"):
+        row = report[name]
+        print(f"  {name:<8} {row['seconds']:>8} {row['errors']:>7} {row['llm_calls_per_row']:>10} {row['email_calls_per_row']:>16} {row['input_tokens']:>13} {row['email_input_tokens']:>12}")
+    if single["input_tokens"]:
+        print(f"  input tokens x{batched['input_tokens'] / single['input_tokens']:.2f}, email calls x{batched['email_calls_per_row'] / max(single['email_calls_per_row'], 1e-9):.2f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Login lookup latency with many accounts: legacy users.json versus the SQLite user store.
+
+    python -m benchmarks.bench_login --users 100000 --logins 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from utils.user_store import UserStore, PROFILE_FIELDS
+
+def make_users(count):
+    return {
+        f"rep{i}@example.com": {
+            **{field: f"{field} {i}" for field in PROFILE_FIELDS},
+            "salesperson_email": f"rep{i}@example.com",
+            "password": f"secret{i}",
+            "created_at": "2024-01-01T00:00:00",
+        }
+        for i in range(count)
+    }
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"p50_ms": round(pick(0.50), 3), "p95_ms": round(pick(0.95), 3), "p99_ms": round(pick(0.99), 3), "mean_ms": round(statistics.mean(samples) * 1000, 3)}
+
+def legacy_login(json_path, email, password):
+    # What utils/auth.py used to do on every login: parse the whole file, then look up.
+    with open(json_path, "r") as f:
+        users = json.load(f)
+    return email in users and users[email]["password"] == password
+
+def store_login(store, email, password):
+    user = store.get(email)
+    return bool(user) and user["password"] == password
+
+def timed(fn, emails):
+    samples = []
+    for email in emails:
+        started = time.perf_counter()
+        assert fn(email, "secret" + email[3:email.index("@")])
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--legacy-logins", type=int, default=20, help="Logins timed against users.json (slow)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    users = make_users(args.users)
+    rng = random.Random(0)
+    emails = [f"rep{rng.randrange(args.users)}@example.com" for _ in range(args.logins)]
+    results = {"users": args.users}
+    with tempfile.TemporaryDirectory() as workdir:
+        json_path = os.path.join(workdir, "users.json")
+        with open(json_path, "w") as f:
+            json.dump(users, f, indent=2)
+        results["json_file_mb"] = round(os.path.getsize(json_path) / 1e6, 1)
+        results["legacy_json"] = percentiles(timed(lambda e, p: legacy_login(json_path, e, p), emails[:args.legacy_logins]))
+
+        store = UserStore(os.path.join(workdir, "users.sqlite3"))
+        started = time.perf_counter()
+        store.import_json(json_path)
+        results["migration_seconds"] = round(time.perf_counter() - started, 2)
+        results["sqlite"] = percentiles(timed(lambda e, p: store_login(store, e, p), emails))
+
+    print(f"{args.users} users (users.json {results['json_file_mb']} MB), migration {results['migration_seconds']}s")
+    for name in ("legacy_json", "sqlite"):
+        r = results[name]
+        print(f"  {name:>11}: p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms  p99 {r['p99_ms']:9.3f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Throughput of sharded batch runs at several worker counts, against local stub services.
+
+    python -m benchmarks.bench_sharding --rows 400 --workers 1,2,4,8
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from benchmarks.stub_services import start_stub_services, stub_environment
+
+def write_prospects(path, rows, companies):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["prospect_name", "prospect_title", "prospect_email", "prospect_company"])
+        for i in range(rows):
+            writer.writerow([f"Prospect {i}", "CTO", f"prospect{i}@example.com", f"Company {i % companies}"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--http-latency", type=float, default=0.01)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    server, base_url, _ = start_stub_services(latency={"newsapi": args.http_latency, "serper": args.http_latency, "article": args.http_latency})
+    os.environ.update(stub_environment(base_url, llm_latency=args.llm_latency))
+    from utils.sharding import run_sharded_batch  # after the environment points at the stubs
+
+    base_email_data = {"salesperson_name": "Bench", "product_name": "SecureShield AI", "email_type": "initial pitch", "tone": "professional", "length": "medium", "industry": "tech", "competitor_company": ""}
+    settings = {"news_api_key": os.environ["NEWS_API"], "product_keywords": ["cloud", "AI"], "industry": "tech", "min_articles": 2, "max_articles": 3, "generate_context": True}
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"{args.rows} rows, {args.companies} companies, {cores} usable cores", flush=True)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        input_path = os.path.join(workdir, "prospects.csv")
+        write_prospects(input_path, args.rows, args.companies)
+        for workers in [int(w) for w in args.workers.split(",")]:
+            # Fresh cache directory per run so no run benefits from another's cached context.
+            os.environ["CACHE_DIR"] = os.path.join(workdir, f"cache-{workers}")
+            started = time.perf_counter()
+            summary = run_sharded_batch(input_path, os.path.join(workdir, f"out-{workers}.jsonl"), base_email_data, settings, workers, resume=False)
+            elapsed = time.perf_counter() - started
+            results.append({"workers": workers, "rows": summary["processed"], "errors": summary["errors"], "seconds": round(elapsed, 2), "rows_per_second": round(summary["processed"] / elapsed, 2)})
+            print(f"workers={workers:>2}  rows={summary['processed']}  {elapsed:7.2f}s  {summary['processed'] / elapsed:7.2f} rows/s", flush=True)
+    server.shutdown()
+    baseline = results[0]["rows_per_second"]
+    for result in results:
+        result["speedup"] = round(result["rows_per_second"] / baseline, 2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
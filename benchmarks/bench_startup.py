@@ -0,0 +1,131 @@
+"""Cold-start time and resident memory of the Streamlit app for the login and generator pages.
+
+Each sample runs in a fresh interpreter that has already imported Streamlit (as a running
+server has), then renders one page with streamlit.testing.AppTest.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --importtime 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+HEAVY_MODULES = ("langgraph", "google.generativeai", "bs4", "requests", "langchain_core")
+TEST_USER = {
+    "email": "bench@example.com", "salesperson_name": "Bench", "salesperson_title": "AE",
+    "salesperson_company": "Bench Co", "salesperson_email": "bench@example.com",
+    "salesperson_mobile": "", "salesperson_website": "", "salesperson_linkedin": "",
+}
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def measure_page(page):
+    """Child process: render one page and print its timings as JSON."""
+    import streamlit  # noqa: F401 -- already loaded in a real server process
+    from streamlit.testing.v1 import AppTest
+    base_rss = rss_mb()
+    started = time.perf_counter()
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    if page == "generator":
+        app.session_state["user"] = TEST_USER
+    app.run()
+    elapsed = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(f"{page} page raised: {app.exception[0].message}")
+    print(json.dumps({
+        "page": page,
+        "seconds": elapsed,
+        "rss_mb": rss_mb(),
+        "app_rss_mb": rss_mb() - base_rss,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+def child_environment(cache_dir):
+    env = {**os.environ, "CACHE_DIR": cache_dir, "PYTHONPATH": os.path.dirname(APP_PATH)}
+    env.setdefault("NEWS_API", "bench-news-key")
+    env.setdefault("LLM_PROVIDER", "stub")
+    return env
+
+def import_profile(top, env):
+    """Slowest modules imported by app.py itself, beyond what Streamlit already loads."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import streamlit; import app"],
+        cwd=os.path.dirname(APP_PATH), env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    after_preloaded = False
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        if not after_preloaded:
+            # Skip everything up to the top-level streamlit import (pandas included); a server has it loaded.
+            after_preloaded = raw_name.rstrip() == " streamlit"  # top level: no extra indentation
+            continue
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), raw_name.strip()))
+    app_total = next((us for us, name in rows if name == "app"), 0)
+    print(f"app.py import: {app_total / 1000:.1f} ms")
+    for us, name in sorted(rows, reverse=True)[1:top + 1]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pages", default="login,generator")
+    parser.add_argument("--importtime", type=int, metavar="N", help="Also print the N slowest imports of app.py")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        measure_page(args.child)
+        return 0
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = child_environment(cache_dir)
+        for page in args.pages.split(","):
+            samples = []
+            for _ in range(args.runs):
+                completed = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_startup", "--child", page],
+                    cwd=os.path.dirname(APP_PATH), env=env, capture_output=True, text=True
+                )
+                if completed.returncode:
+                    print(completed.stderr, file=sys.stderr)
+                    return 1
+                samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            result = {
+                "page": page,
+                "seconds": round(statistics.median(s["seconds"] for s in samples), 3),
+                "rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+                "app_rss_mb": round(statistics.median(s["app_rss_mb"] for s in samples), 1),
+                "heavy_modules": samples[-1]["heavy_modules"],
+            }
+            results.append(result)
+            print(f"{page:>10}: {result['seconds']:.3f}s first render, RSS {result['rss_mb']:.0f} MB "
+                  f"(+{result['app_rss_mb']:.0f} MB over Streamlit), heavy modules: {', '.join(result['heavy_modules']) or 'none'}")
+        if args.importtime:
+            import_profile(args.importtime, env)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
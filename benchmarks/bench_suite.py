@@ -0,0 +1,176 @@
+"""Offline benchmark suite: micro benchmarks of the hot functions and macro pipeline runs.
+
+    python -m benchmarks.bench_suite                          # run and compare with baselines.json
+    python -m benchmarks.bench_suite --save-baseline          # run and store the numbers as the baseline
+    python -m benchmarks.bench_suite --only micro --batch-sizes 100
+
+Runs without network: NewsAPI, Serper and article pages are served from the recorded
+fixtures in benchmarks/fixtures, and the LLM is the deterministic stub provider. Every
+metric is lower-is-better; the run exits with status 1 when any metric is slower than
+its baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks.stub_services import FIXTURES_DIR, FixtureSet, start_stub_services, stub_environment
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+def per_call_us(fn, inputs, rounds=5, min_round_seconds=0.2):
+    """Median microseconds per call of fn over inputs, each round repeated to at least min_round_seconds."""
+    started = time.perf_counter()
+    for item in inputs:
+        fn(item)
+    passes = max(1, int(min_round_seconds / max(time.perf_counter() - started, 1e-6)))
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(passes):
+            for item in inputs:
+                fn(item)
+        samples.append((time.perf_counter() - started) / (passes * len(inputs)) * 1e6)
+    return round(statistics.median(samples), 2)
+
+def fixture_inputs(fixtures):
+    texts = []
+    for company in fixtures.companies:
+        for article in json.loads(fixtures.newsapi[company])["articles"]:
+            texts.append((company, f"{article['title']} {article.get('description', '')} {article.get('content', '')}"))
+    return texts, list(fixtures.pages.values())
+
+def bench_email_data(company):
+    return {
+        "salesperson_name": "Bench Rep", "salesperson_title": "Account Executive", "salesperson_company": "Bench Co",
+        "salesperson_email": "rep@bench.example", "salesperson_mobile": "", "salesperson_website": "", "salesperson_linkedin": "",
+        "product_name": "SecureShield AI", "product_description": "AI-driven cloud security automation for enterprises.",
+        "product_usp": "Cuts incident response time in half.", "tone": "professional", "length": "medium",
+        "email_type": "initial pitch", "industry": "tech", "product_keywords": "cloud, AI, security", "competitor_company": "",
+        "prospect_name": "Pat Prospect", "prospect_title": "CTO", "prospect_email": "pat@prospect.example",
+        "prospect_company": company, "company_name": company,
+    }
+
+def run_micro(fixtures):
+    from utils.news_fetcher import calculate_relevance_score, extract_text_from_html
+    from utils.summarizer import extract_key_entities, format_summary
+    from utils.sales_context import build_email_prompts
+    texts, pages = fixture_inputs(fixtures)
+    keywords = ["cloud", "AI", "security"]
+    page_texts = [extract_text_from_html(page) for page in pages]
+    summary = format_summary(page_texts[0][:800])
+    email_inputs = [
+        ({**bench_email_data(company), "email_type": email_type}, summary, page_texts[0][:1500], "")
+        for company in fixtures.companies
+        for email_type in ("initial pitch", "follow-up", "thank you", "schedule meeting/demo")
+    ]
+    return {
+        "micro.calculate_relevance_score.us": per_call_us(lambda item: calculate_relevance_score(item[1], item[0], keywords, "tech"), texts),
+        "micro.extract_text_from_html.us": per_call_us(extract_text_from_html, pages),
+        "micro.extract_key_entities.us": per_call_us(lambda text: extract_key_entities(text, "Acme"), page_texts),
+        "micro.format_summary.us": per_call_us(lambda text: format_summary(text[:800]), page_texts),
+        "micro.build_email_prompts.us": per_call_us(lambda item: build_email_prompts(*item), email_inputs),
+    }
+
+def run_macro(batch_sizes, llm_latency, single_runs=3):
+    from utils.llm import StubProvider
+    from utils.sales_context import setup_graph
+    from utils.pipeline import NodeCache, run_pipeline, run_staged_batch
+    llm = StubProvider(latency=llm_latency)
+    graph = setup_graph(llm)
+    settings = {"news_api_key": os.environ["NEWS_API"], "product_keywords": ["cloud", "AI", "security"], "industry": "tech", "min_articles": 2, "max_articles": 4, "generate_context": True}
+    results = {}
+    # Company names are unique per run so no run reuses another's cached news or sales context.
+    samples = []
+    for run in range(single_runs):
+        started = time.perf_counter()
+        run_pipeline(bench_email_data(f"Single Co {run}"), settings, llm, graph, NodeCache())
+        samples.append(time.perf_counter() - started)
+    results["macro.single_prospect.seconds"] = round(statistics.median(samples), 3)
+    for size in batch_sizes:
+        rows = [{"prospect_name": f"Prospect {i}", "prospect_title": "CTO", "prospect_email": f"p{i}@example.com", "prospect_company": f"Batch{size} Co {i}"} for i in range(size)]
+        started = time.perf_counter()
+        batch = run_staged_batch(rows, bench_email_data(""), settings, llm, graph)
+        elapsed = time.perf_counter() - started
+        errors = sum(1 for result in batch if result.get("error"))
+        if errors:
+            print(f"batch_{size}: {errors} rows failed", file=sys.stderr)
+        results[f"macro.batch_{size}.seconds"] = round(elapsed, 3)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Print each metric against its baseline; returns the names of metrics that regressed."""
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"  {name:<40} {value:>12}   (no baseline)")
+            continue
+        ratio = value / base
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"  {name:<40} {value:>12}   baseline {base:>12}   x{ratio:5.2f} {flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", choices=["micro", "macro"], help="Run one half of the suite")
+    parser.add_argument("--batch-sizes", default="100,1000", help="Comma-separated batch row counts for the macro runs")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM seconds per call; 0 measures pipeline overhead only")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's numbers as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown over the baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--output", help="Also write this run's results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    server, base_url, _ = start_stub_services(fixtures_dir=FIXTURES_DIR)
+    workdir = tempfile.TemporaryDirectory()
+    os.environ.update(stub_environment(base_url, llm_latency=args.llm_latency))
+    # Fresh caches, no cross-session sharing and no trace export, so every run does the same work.
+    os.environ.update({"CACHE_DIR": workdir.name, "SHARED_NEWS_CACHE_ENTRIES": "0", "TRACE_EXPORT_PATH": ""})
+    fixtures = FixtureSet(FIXTURES_DIR)
+
+    results = {}
+    if args.only in (None, "micro"):
+        results.update(run_micro(fixtures))
+    if args.only in (None, "macro"):
+        results.update(run_macro([int(size) for size in args.batch_sizes.split(",") if size], args.llm_latency))
+    server.shutdown()
+    workdir.cleanup()
+
+    run_info = {
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cores": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+        "llm_latency": args.llm_latency,
+        "fixtures": fixtures.manifest,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"run": run_info, "results": results}, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        if stored["run"].get("llm_latency") != args.llm_latency:
+            print(f"Note: baseline was recorded with --llm-latency {stored['run'].get('llm_latency')}")
+    regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"run": run_info, "results": {**baseline, **results}}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
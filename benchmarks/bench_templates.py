@@ -0,0 +1,72 @@
+"""Template library latency with tens of thousands of saved templates per user.
+
+    python -m benchmarks.bench_templates --templates 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from utils.template_store import TemplateStore
+
+WORDS = ["cloud", "security", "migration", "renewal", "pricing", "launch", "demo", "follow", "quarter", "expansion", "healthcare", "finance", "retail", "platform", "analytics"]
+
+def make_templates(count, rng):
+    templates = {}
+    for i in range(count):
+        topic = rng.sample(WORDS, 3)
+        name = f"{topic[0]}_{i}_prospect{i}@company{i % 500}.com"
+        templates[name] = f"Hi there,\n\nFollowing up on our {topic[1]} conversation about {topic[2]} at Company {i % 500}. " * 4
+    return templates
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"p50_ms": round(samples[len(samples) // 2], 3), "max_ms": round(samples[-1], 3)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", type=int, default=50000)
+    parser.add_argument("--other-users", type=int, default=5, help="Other users with the same number of templates")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    results = {"templates_per_user": args.templates, "users": args.other_users + 1}
+    with tempfile.TemporaryDirectory() as workdir:
+        store = TemplateStore(os.path.join(workdir, "templates.sqlite3"))
+        started = time.perf_counter()
+        for user in range(args.other_users + 1):
+            store.save_many(f"rep{user}@example.com", make_templates(args.templates, rng))
+        results["insert_seconds"] = round(time.perf_counter() - started, 2)
+        owner = "rep0@example.com"
+        some_name = f"x_{args.templates // 2}_prospect{args.templates // 2}@company{(args.templates // 2) % 500}.com"
+        cases = {
+            "list_first_page": lambda: store.search(owner, "", 20, 0),
+            "list_page_100": lambda: store.search(owner, "", 20, 20 * 100),
+            "keyword_search": lambda: store.search(owner, "renewal pricing", 20, 0),
+            "prefix_search": lambda: store.search(owner, "migr secur", 20, 0),
+            "name_search": lambda: store.search(owner, f"prospect{args.templates // 2}", 20, 0),
+            "get_by_name": lambda: store.get(owner, some_name),
+        }
+        for name, fn in cases.items():
+            results[name] = timed(fn, args.repeat)
+        results["prefix_search_matches"] = store.search(owner, "migr secur", 1, 0)[1]
+
+    print(f"{results['users']} users x {args.templates} templates, inserted in {results['insert_seconds']}s")
+    for name in cases:
+        print(f"  {name:>16}: p50 {results[name]['p50_ms']:8.3f} ms  max {results[name]['max_ms']:8.3f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Load test: many concurrent rep sessions or batch jobs on one server process, against local stubs.
+
+    python -m benchmarks.load_test --mode sessions --sessions 20 --requests 5 --llm-latency 0.5
+    python -m benchmarks.load_test --mode batches --sessions 4 --rows 50 --http-error-rate 0.05
+    python -m benchmarks.load_test --mode mixed --sessions 6 --rows 100 --llm-latency 0.3
+    python -m benchmarks.load_test --mode batches --sessions 4 --rows 100 --llm-capacity 6
+
+Each simulated session owns what a Streamlit session owns (a node cache and a news store)
+and runs the same pipeline calls as app.py, in threads of this one process, so contention
+for the shared caches, the LLM client and the GIL matches a single server. NewsAPI, Serper,
+article hosts and the LLM are local stand-ins with configurable latency and error rates.
+In mixed mode, even-numbered sessions run batches while the others generate single emails,
+showing how long a rep waits behind other reps' batches on the shared upstream limits.
+With --llm-capacity, the stub LLM answers 429 beyond that many calls in flight, like an
+exhausted Gemini quota; the report shows where the adaptive LLM concurrency limit settled.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.bench_startup import rss_mb
+from benchmarks.bench_suite import bench_email_data
+from benchmarks.stub_services import FIXTURES_DIR, start_stub_services, stub_environment
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50": round(pick(0.50), 3), "p95": round(pick(0.95), 3), "p99": round(pick(0.99), 3), "max": round(samples[-1], 3), "mean": round(statistics.mean(samples), 3)}
+
+def result_failed(result):
+    """A generation counts as failed if it raised, the batch marked it, or an email came back as an error."""
+    return bool(result.get("error")) or "Error generating" in (result.get("email_content") or "")
+
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=0.1):
+        super().__init__(name="memory-sampler", daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class SimulatedSession:
+    """The per-session state app.py keeps in st.session_state, plus this session's measurements."""
+
+    def __init__(self, number, mode="sessions"):
+        from utils.pipeline import NodeCache
+        from utils.session_store import SessionNewsStore
+        from utils.config import SESSION_NODE_CACHE_ENTRIES
+        self.number = number
+        self.kind = "batches" if mode == "batches" or (mode == "mixed" and number % 2 == 0) else "sessions"
+        self.node_cache = NodeCache(max_entries=SESSION_NODE_CACHE_ENTRIES)
+        self.news_store = SessionNewsStore()
+        self.latencies = []
+        self.rows = 0
+        self.errors = 0
+
+    def generate(self, company, settings, llm, graph):
+        """One single-prospect generation, as in the app's Email Generator tab."""
+        from utils.pipeline import run_pipeline
+        from utils.tracing import trace
+        started = time.perf_counter()
+        try:
+            with trace("generate_email", company=company):
+                result = run_pipeline(bench_email_data(company), settings, llm, graph, self.node_cache)
+            self.news_store.record(company, result)
+            failed = result_failed(result)
+        except Exception:
+            failed = True
+        self.latencies.append(time.perf_counter() - started)
+        self.rows += 1
+        self.errors += failed
+
+    def run_batch(self, companies, settings, llm, graph):
+        """One in-app CSV batch over `companies`; latency is the whole job."""
+        from utils.pipeline import run_staged_batch
+        rows = [{"prospect_name": f"Prospect {i}", "prospect_title": "CTO", "prospect_email": f"p{i}@example.com", "prospect_company": company} for i, company in enumerate(companies)]
+
+        def on_result(index, row, result):
+            self.news_store.record(row["prospect_company"], result)
+            self.rows += 1
+            self.errors += result_failed(result)
+
+        started = time.perf_counter()
+        try:
+            run_staged_batch(rows, bench_email_data(""), settings, llm, graph, self.node_cache, on_result=on_result)
+        except Exception:
+            self.errors += len(rows) - self.rows
+            self.rows = len(rows)
+        self.latencies.append(time.perf_counter() - started)
+
+def run_session(session, args, companies, settings, llm, graph, start_at):
+    rng = random.Random(session.number)
+    time.sleep(max(0.0, start_at - time.time()))
+    for _ in range(args.requests):
+        if session.kind == "sessions":
+            session.generate(rng.choice(companies), settings, llm, graph)
+        else:
+            session.run_batch(rng.sample(companies, min(args.rows, len(companies))), settings, llm, graph)
+        if args.think:
+            time.sleep(rng.uniform(0, 2 * args.think))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["sessions", "batches", "mixed"], default="sessions", help="Single-prospect generations, in-app CSV batches, or both")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated reps")
+    parser.add_argument("--requests", type=int, default=3, help="Generations (or batch jobs) per session")
+    parser.add_argument("--rows", type=int, default=25, help="Rows per batch job in batches mode")
+    parser.add_argument("--companies", type=int, default=200, help="Distinct prospect companies; fewer means more overlap between reps")
+    parser.add_argument("--ramp", type=float, default=1.0, help="Seconds over which session start times are spread")
+    parser.add_argument("--think", type=float, default=0.0, help="Mean seconds a rep waits between requests")
+    parser.add_argument("--http-latency", type=float, default=0.05, help="Seconds per NewsAPI, Serper and article request")
+    parser.add_argument("--http-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-capacity", type=int, default=0, help="Concurrent LLM calls the stub accepts before answering 429 (0 = unlimited)")
+    parser.add_argument("--synthetic", action="store_true", help="Serve synthetic news instead of the recorded fixtures")
+    parser.add_argument("--no-shared-cache", action="store_true", help="Disable the cross-session news cache")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    http = {"newsapi": args.http_latency, "serper": args.http_latency, "article": args.http_latency}
+    errors = {"newsapi": args.http_error_rate, "serper": args.http_error_rate, "article": args.http_error_rate}
+    server, base_url, service_config = start_stub_services(http, errors, fixtures_dir=None if args.synthetic else FIXTURES_DIR)
+    workdir = tempfile.TemporaryDirectory()
+    os.environ.update(stub_environment(base_url, llm_latency=args.llm_latency, llm_error_rate=args.llm_error_rate))
+    os.environ.update({"CACHE_DIR": workdir.name, "TRACE_EXPORT_PATH": ""})
+    if args.no_shared_cache:
+        os.environ["SHARED_NEWS_CACHE_ENTRIES"] = "0"
+
+    from utils.llm import StubProvider
+    from utils.sales_context import setup_graph
+    from utils.tracing import get_span_metrics
+    from utils.scheduler import get_scheduler
+    import utils.pipeline, utils.session_store  # noqa: F401 -- loaded before the baseline RSS reading
+    # One LLM client and graph for the whole server, as load_llm() caches them in the app.
+    llm = StubProvider(latency=args.llm_latency, error_rate=args.llm_error_rate, jitter=args.llm_jitter, capacity=args.llm_capacity)
+    graph = setup_graph(llm)
+    settings = {"news_api_key": os.environ["NEWS_API"], "product_keywords": ["cloud", "AI", "security"], "industry": "tech", "min_articles": 2, "max_articles": 4, "generate_context": True}
+    companies = [f"Load Co {i}" for i in range(args.companies)]
+
+    rss_before = rss_mb()
+    sampler = MemorySampler()
+    sampler.start()
+    sessions = [SimulatedSession(number, args.mode) for number in range(args.sessions)]
+    started = time.time()
+    threads = [
+        threading.Thread(target=run_session, args=(session, args, companies, settings, llm, graph, started + args.ramp * i / max(1, args.sessions)), name=f"session-{i}")
+        for i, session in enumerate(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    sampler.stop()
+    rss_after = rss_mb()  # sessions (and their stores) are still alive here
+    server.shutdown()
+    workdir.cleanup()
+
+    latencies = [latency for session in sessions for latency in session.latencies]
+    rows = sum(session.rows for session in sessions)
+    failed = sum(session.errors for session in sessions)
+    stage_seconds = {name: round(stats["sum"] / stats["count"], 3) for name, stats in get_span_metrics().snapshot().items() if stats["count"]}
+    report = {
+        "mode": args.mode,
+        "sessions": args.sessions,
+        "seconds": round(elapsed, 2),
+        "requests": len(latencies),
+        "rows": rows,
+        "errors": failed,
+        "error_rate": round(failed / rows, 4) if rows else 0.0,
+        "throughput_rows_per_second": round(rows / elapsed, 2),
+        "latency_seconds": percentiles(latencies),
+        "latency_seconds_by_kind": {kind: percentiles([l for session in sessions if session.kind == kind for l in session.latencies]) for kind in ("sessions", "batches")},
+        "memory_mb": {
+            "rss_before": round(rss_before, 1),
+            "rss_peak": round(sampler.peak, 1),
+            "rss_after": round(rss_after, 1),
+            "per_session": round((rss_after - rss_before) / max(1, args.sessions), 2),
+            "session_store_avg": round(statistics.mean(session.news_store.size for session in sessions) / 1e6, 3),
+        },
+        "stub_requests": service_config.requests,
+        "stub_errors": service_config.errors,
+        "mean_stage_seconds": stage_seconds,
+        "llm_rejected": llm.rejected,
+        "llm_adaptive": get_scheduler().snapshot().get("llm", {}).get("adaptive"),
+        "scheduler_mean_wait_seconds": {
+            resource: {p: round(stats["wait_sum"] / stats["granted"], 4) for p, stats in queue["stats"].items() if stats["granted"]}
+            for resource, queue in get_scheduler().snapshot().items()
+        },
+    }
+
+    latency = report["latency_seconds"]
+    memory = report["memory_mb"]
+    unit = {"sessions": "generation", "batches": "batch job", "mixed": "request"}[args.mode]
+    print(f"{args.sessions} {args.mode}, {report['requests']} {unit}s, {rows} rows in {report['seconds']}s")
+    print(f"  throughput  {report['throughput_rows_per_second']} rows/s   errors {failed}/{rows} ({report['error_rate']:.1%})")
+    if args.mode == "mixed":
+        for kind, label in (("sessions", "generation"), ("batches", "batch job")):
+            kind_latency = report["latency_seconds_by_kind"][kind]
+            if kind_latency:
+                print(f"  {label} latency  p50 {kind_latency['p50']}s  p95 {kind_latency['p95']}s  p99 {kind_latency['p99']}s  max {kind_latency['max']}s")
+    else:
+        print(f"  {unit} latency  p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  max {latency['max']}s")
+    print(f"  memory  rss {memory['rss_before']} -> peak {memory['rss_peak']} -> {memory['rss_after']} MB, {memory['per_session']} MB/session retained")
+    print(f"  stub requests {service_config.requests}  injected errors {service_config.errors}")
+    adaptive = report["llm_adaptive"]
+    if adaptive:
+        decreases = adaptive["decreases"]
+        print(f"  llm concurrency limit {adaptive['limit']}  (+{adaptive['increases']}, -{decreases['overload']} overload, -{decreases['latency']} latency)  429s {report['llm_rejected']}")
+    for resource, waits in report["scheduler_mean_wait_seconds"].items():
+        if not waits:
+            continue
+        print(f"  {resource} mean queue wait  " + "  ".join(f"{p} {seconds}s" for p, seconds in waits.items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
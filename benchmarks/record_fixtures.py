@@ -0,0 +1,87 @@
+"""Capture NewsAPI/Serper responses and article pages as offline benchmark fixtures.
+
+    python -m benchmarks.record_fixtures "Acme Cloud" Globex --output benchmarks/fixtures
+    python -m benchmarks.record_fixtures --from-stub ...   # no network: record the synthetic stubs
+
+Uses NEWS_API, SERPER_API_KEY, NEWS_API_URL and SERPER_API_URL from the environment/.env.
+Article URLs are rewritten to `{base_url}/articles/{company}/<page>` so
+benchmarks.stub_services.FixtureSet can serve the saved pages.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from benchmarks.stub_services import FIXTURES_DIR, company_slug, start_stub_services, stub_environment
+
+KEYWORDS = ["cloud", "AI", "security", "automation", "SaaS"]
+
+def _save_page(requests, url, output, page, headers, saved):
+    """Save the page once per URL; returns the fixture page name, or None if it could not be fetched."""
+    if url in saved:
+        return saved[url]
+    try:
+        response = requests.get(url, headers=headers, timeout=15)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"  skipped {url}: {str(e)}", file=sys.stderr)
+        return None
+    with open(os.path.join(output, "articles", f"{page}.html"), "w", encoding="utf-8") as f:
+        f.write(response.text)
+    saved[url] = page
+    return page
+
+def record_company(company, output, page_size):
+    import requests
+    from utils.config import news_api_key, serper_api_key, NEWS_API_URL, SERPER_API_URL
+    from utils.news_fetcher import _newsapi_params
+    headers = {"User-Agent": "SmartB2BEmailGenerator/1.0"}
+    slug = company_slug(company)
+    response = requests.get(NEWS_API_URL, params=_newsapi_params(company, news_api_key, KEYWORDS, page_size), headers=headers, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    saved = {}
+    for article in data.get("articles", []):
+        page = article.get("url") and _save_page(requests, article["url"], output, f"{slug}-{len(saved)}", headers, saved)
+        if page:
+            article["url"] = f"{{base_url}}/articles/{{company}}/{page}"
+    with open(os.path.join(output, "newsapi", f"{slug}.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+
+    if serper_api_key:
+        payload = json.dumps({"q": f"{company} {' '.join(KEYWORDS[:3])}", "gl": "us", "hl": "en", "num": 10, "type": "news"})
+        response = requests.post(SERPER_API_URL, headers={"X-API-KEY": serper_api_key, "Content-Type": "application/json"}, data=payload, timeout=30)
+        response.raise_for_status()
+        news = response.json().get("news", [])
+        for item in news:
+            page = item.get("link") and _save_page(requests, item["link"], output, f"{slug}-{len(saved)}", headers, saved)
+            if page:
+                item["link"] = f"{{base_url}}/articles/{{company}}/{page}"
+        with open(os.path.join(output, "serper", f"{slug}.json"), "w", encoding="utf-8") as f:
+            json.dump({"news": news}, f, indent=1)
+    return len(saved)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("companies", nargs="+")
+    parser.add_argument("--output", default=FIXTURES_DIR)
+    parser.add_argument("--page-size", type=int, default=5)
+    parser.add_argument("--from-stub", action="store_true", help="Record the synthetic stub services instead of the live APIs")
+    args = parser.parse_args(argv)
+
+    source = "live"
+    if args.from_stub:
+        server, base_url, _ = start_stub_services()
+        os.environ.update(stub_environment(base_url))
+        source = "synthetic stub services"
+    for directory in ("newsapi", "serper", "articles"):
+        os.makedirs(os.path.join(args.output, directory), exist_ok=True)
+    for company in args.companies:
+        pages = record_company(company, args.output, args.page_size)
+        print(f"{company}: {pages} article pages")
+    with open(os.path.join(args.output, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"companies": args.companies, "source": source, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Local stand-ins for NewsAPI, Serper and article hosts, for offline benchmarks and load tests.
+
+Start them with `start_stub_services()` and export `stub_environment(base_url)` into
+os.environ *before* importing anything from utils, since utils.config reads the
+environment at import time. Responses are synthetic unless `fixtures_dir` points at
+payloads captured by benchmarks.record_fixtures.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, quote, unquote
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PARAGRAPH = (
+    "{company} announced a new cloud security platform built on AI-driven automation, "
+    "expanding its enterprise SaaS portfolio after revenue grew 18% to $2.4 billion. "
+    "Executives said digital transformation and data protection remain the top priorities "
+    "for customers in healthcare, finance and retail, while DevOps teams adopt the new API. "
+)
+
+def article_html(company, article_id, paragraphs=40):
+    body = "".join(f"<p>{PARAGRAPH.format(company=company)}</p>" for _ in range(paragraphs))
+    return (
+        "<html><head><title>{0}</title><style>p {{ margin: 0 }}</style>"
+        "<script>var tracking = {{id: '{1}'}};</script></head><body>"
+        "<header><nav><a href='/'>Home</a><a href='/tech'>Tech</a></nav></header>"
+        "<article><h1>{0} expands platform</h1>{2}</article>"
+        "<aside>Related stories</aside><footer>Copyright</footer></body></html>"
+    ).format(company, article_id, body)
+
+def _company_from_query(query):
+    return query.split('"')[1] if '"' in query else query.split(" ")[0]
+
+def newsapi_articles(company, base_url, page_size):
+    seed = int(hashlib.sha1(company.encode("utf-8")).hexdigest()[:8], 16)
+    articles = []
+    for i in range(page_size):
+        article_id = f"{seed:x}-{i}"
+        articles.append({
+            "source": {"name": ["TechCrunch", "Reuters", "ZDNet", "CIO Dive"][(seed + i) % 4]},
+            "title": f"{company} expands its AI cloud platform ({i + 1})",
+            "description": f"{company} announced new enterprise security automation features.",
+            "content": f"{company} said cloud revenue grew {10 + (seed + i) % 20}% this quarter...",
+            "url": f"{base_url}/articles/{company.replace(' ', '_')}/{article_id}",
+            "publishedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - (i + 1) * 86400)),
+        })
+    return articles
+
+def company_slug(company):
+    return "".join(c if c.isalnum() else "_" for c in company.lower()).strip("_")
+
+class FixtureSet:
+    """Recorded NewsAPI/Serper payloads and article pages, served for any company name.
+
+    A company that was not recorded is mapped onto a recorded one by hash, with the recorded
+    company's name replaced by the requested one, so large batches see distinct companies
+    with realistic text. Article URLs are stored as `{base_url}/articles/{company}/<page>`.
+    """
+
+    def __init__(self, directory=FIXTURES_DIR):
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.companies = self.manifest["companies"]
+        self.newsapi = {}
+        self.serper = {}
+        for company in self.companies:
+            slug = company_slug(company)
+            with open(os.path.join(directory, "newsapi", f"{slug}.json"), "r", encoding="utf-8") as f:
+                self.newsapi[company] = f.read()
+            serper_path = os.path.join(directory, "serper", f"{slug}.json")
+            if os.path.exists(serper_path):
+                with open(serper_path, "r", encoding="utf-8") as f:
+                    self.serper[company] = f.read()
+        self.pages = {}
+        articles_dir = os.path.join(directory, "articles")
+        for name in os.listdir(articles_dir):
+            with open(os.path.join(articles_dir, name), "r", encoding="utf-8") as f:
+                self.pages[os.path.splitext(name)[0]] = f.read()
+
+    def recorded_company(self, company):
+        if company in self.newsapi:
+            return company
+        return self.companies[int(hashlib.sha1(company.encode("utf-8")).hexdigest()[:8], 16) % len(self.companies)]
+
+    def _render(self, payload, recorded, company, base_url, escape=lambda text: text):
+        return (
+            payload.replace("{base_url}", base_url)
+            .replace("{company}", quote(company, safe=""))
+            .replace(escape(recorded), escape(company))
+        )
+
+    def newsapi_response(self, company, base_url, page_size):
+        recorded = self.recorded_company(company)
+        data = json.loads(self._render(self.newsapi[recorded], recorded, company, base_url, lambda text: json.dumps(text)[1:-1]))
+        data["articles"] = data.get("articles", [])[:page_size]
+        return json.dumps(data)
+
+    def serper_response(self, company, base_url):
+        recorded = self.recorded_company(company)
+        payload = self.serper.get(recorded, json.dumps({"news": []}))
+        return self._render(payload, recorded, company, base_url, lambda text: json.dumps(text)[1:-1])
+
+    def article(self, company_path, page):
+        html = self.pages.get(page)
+        if html is None:
+            return None
+        # The page name starts with the recorded company's slug; swap in the requested company.
+        recorded = next((c for c in self.companies if page.startswith(company_slug(c) + "-")), None)
+        return html.replace(recorded, unquote(company_path)) if recorded else html
+
+class StubServiceConfig:
+    def __init__(self, latency=None, error_rate=None, seed=0, fixtures=None):
+        # Per-service latency (seconds) and error rate; keys: newsapi, serper, article
+        self.latency = {"newsapi": 0.0, "serper": 0.0, "article": 0.0, **(latency or {})}
+        self.error_rate = {"newsapi": 0.0, "serper": 0.0, "article": 0.0, **(error_rate or {})}
+        self.requests = {"newsapi": 0, "serper": 0, "article": 0}
+        self.errors = {"newsapi": 0, "serper": 0, "article": 0}
+        self.fixtures = fixtures
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def admit(self, service):
+        """Count the request, sleep for the service latency and decide whether to fail it."""
+        with self._lock:
+            self.requests[service] += 1
+            fail = self._rng.random() < self.error_rate[service]
+            if fail:
+                self.errors[service] += 1
+        if self.latency[service]:
+            time.sleep(self.latency[service])
+        return not fail
+
+def _handler(config, base_url_holder):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json"):
+            data = body.encode("utf-8") if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if parsed.path == "/newsapi/v2/everything":
+                if not config.admit("newsapi"):
+                    return self._send(429, json.dumps({"status": "error", "code": "rateLimited"}))
+                params = parse_qs(parsed.query)
+                company = _company_from_query(params.get("q", [""])[0])
+                page_size = int(params.get("pageSize", ["5"])[0])
+                if config.fixtures:
+                    return self._send(200, config.fixtures.newsapi_response(company, base_url_holder[0], page_size))
+                articles = newsapi_articles(company, base_url_holder[0], page_size)
+                return self._send(200, json.dumps({"status": "ok", "totalResults": len(articles), "articles": articles}))
+            if parsed.path.startswith("/articles/"):
+                if not config.admit("article"):
+                    return self._send(503, "Service Unavailable", "text/plain")
+                _, _, company, article_id = parsed.path.split("/", 3)
+                if config.fixtures:
+                    html = config.fixtures.article(company, article_id)
+                    return self._send(200, html, "text/html") if html is not None else self._send(404, "Not Found", "text/plain")
+                return self._send(200, article_html(company.replace("_", " "), article_id), "text/html")
+            self._send(404, json.dumps({"status": "error"}))
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/serper/search":
+                return self._send(404, json.dumps({"error": "not found"}))
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not config.admit("serper"):
+                return self._send(500, json.dumps({"error": "stub failure"}))
+            company = payload.get("q", "").split(" ")[0]
+            if config.fixtures:
+                return self._send(200, config.fixtures.serper_response(company, base_url_holder[0]))
+            news = [{
+                "title": a["title"], "snippet": a["description"], "link": a["url"],
+                "date": a["publishedAt"][:10], "source": a["source"]["name"]
+            } for a in newsapi_articles(company, base_url_holder[0], 5)]
+            self._send(200, json.dumps({"news": news}))
+
+    return StubHandler
+
+def start_stub_services(latency=None, error_rate=None, seed=0, port=0, fixtures_dir=None):
+    """Start the stub HTTP services on a background thread; returns (server, base_url, config)."""
+    config = StubServiceConfig(latency, error_rate, seed, FixtureSet(fixtures_dir) if fixtures_dir else None)
+    base_url_holder = [""]
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(config, base_url_holder))
+    server.daemon_threads = True
+    base_url_holder[0] = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="stub-services", daemon=True).start()
+    return server, base_url_holder[0], config
+
+def stub_environment(base_url, llm_latency=0.0, llm_error_rate=0.0):
+    return {
+        "NEWS_API": "stub-news-key",
+        "NEWS_API_URL": f"{base_url}/newsapi/v2/everything",
+        "SERPER_API_KEY": "stub-serper-key",
+        "SERPER_API_URL": f"{base_url}/serper/search",
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY": str(llm_latency),
+        "LLM_STUB_ERROR_RATE": str(llm_error_rate),
+    }
@@ -0,0 +1,39 @@
+"""Test setup: the stub NewsAPI/Serper/article services and the stub LLM, with a throwaway CACHE_DIR.
+
+utils.config reads the environment at import time, so this runs before any test module imports utils.
+"""
+import os
+import tempfile
+import pytest
+from benchmarks.stub_services import start_stub_services, stub_environment, FIXTURES_DIR
+
+_server, _base_url, _stub_config = start_stub_services(fixtures_dir=FIXTURES_DIR)
+os.environ.update(stub_environment(_base_url))
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="email-generator-tests-")
+os.environ["TEMPLATES_DB_PATH"] = os.path.join(os.environ["CACHE_DIR"], "templates.sqlite3")
+
+SETTINGS = {"news_api_key": "stub-news-key", "product_keywords": ["cloud"], "industry": "tech", "min_articles": 2, "max_articles": 4, "generate_context": True}
+
+@pytest.fixture(scope="session")
+def stub_services():
+    """(base_url, config) of the running stub services; config.requests counts calls per service."""
+    yield _base_url, _stub_config
+
+@pytest.fixture
+def settings():
+    return dict(SETTINGS)
+
+@pytest.fixture
+def llm():
+    from utils.llm import StubProvider
+    return StubProvider(latency=0.0, error_rate=0.0)
+
+def prospect_rows(prefix, count):
+    """CSV-style rows, one company per row; unknown companies are served from the recorded fixtures."""
+    return [
+        {"prospect_name": f"P{i}", "prospect_title": "CTO", "prospect_email": f"p{i}@example.com", "prospect_company": f"{prefix} {i}"}
+        for i in range(count)
+    ]
+
+def pytest_sessionfinish(session, exitstatus):
+    _server.shutdown()
@@ -0,0 +1,60 @@
+import json
+import pytest
+import batch_cli
+from utils.batch import run_batch_file, merge_results, stream_batch
+from utils.sales_context import setup_graph
+from utils.sharding import run_shard
+from benchmarks.bench_suite import bench_email_data
+from tests.conftest import prospect_rows
+
+class ListWriter:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+def _write_csv(path, rows):
+    lines = ["prospect_name,prospect_title,prospect_email,prospect_company"]
+    lines += [f"{r['prospect_name']},{r['prospect_title']},{r['prospect_email']},{r['prospect_company']}" for r in rows]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+def _write_jsonl(path, rows):
+    path.write_text("".join(json.dumps({"row": row, "prospect_name": f"P{row}"}) + "\n" for row in rows))
+    return str(path)
+
+def test_ordered_stream_writes_in_row_order(settings, llm):
+    writer = ListWriter()
+    stream_batch(prospect_rows("Order Co", 12), writer, bench_email_data(""), settings, llm, setup_graph(llm), stage_concurrency={"fetch": 4}, ordered=True)
+    assert [record["row"] for record in writer.records] == list(range(12))
+
+def test_run_batch_file_output_is_in_row_order(tmp_path, settings, llm):
+    source = _write_csv(tmp_path / "in.csv", prospect_rows("File Co", 8))
+    output = str(tmp_path / "out.jsonl")
+    summary = run_batch_file(source, output, bench_email_data(""), settings, llm, setup_graph(llm), stage_concurrency={"fetch": 4})
+    rows = [json.loads(line)["row"] for line in open(output)]
+    assert rows == list(range(8))
+    assert summary["processed"] == 8
+
+def test_merge_streams_shards_into_row_order(tmp_path):
+    shards = [_write_jsonl(tmp_path / "a.jsonl", [0, 3, 4, 8]), _write_jsonl(tmp_path / "b.jsonl", [1, 2, 6]), _write_jsonl(tmp_path / "c.jsonl", [5, 7])]
+    output = str(tmp_path / "merged.jsonl")
+    assert merge_results(shards, output) == 9
+    assert [json.loads(line)["row"] for line in open(output)] == list(range(9))
+
+def test_merge_rejects_shard_out_of_row_order(tmp_path):
+    with pytest.raises(ValueError, match="not in row order"):
+        merge_results([_write_jsonl(tmp_path / "a.jsonl", [0, 4, 2])], str(tmp_path / "merged.jsonl"))
+
+def test_run_shard_rejects_index_out_of_range(tmp_path, settings):
+    source = _write_csv(tmp_path / "in.csv", prospect_rows("Shard Co", 2))
+    with pytest.raises(ValueError):
+        run_shard(source, str(tmp_path / "out.jsonl"), bench_email_data(""), settings, 2, 2, llm_provider="stub")
+
+@pytest.mark.parametrize("index,count", [("2", "2"), ("-1", "2"), ("0", "0")])
+def test_cli_rejects_shard_index_out_of_range(tmp_path, capsys, index, count):
+    source = _write_csv(tmp_path / "in.csv", prospect_rows("Shard Co", 2))
+    assert batch_cli.main([source, str(tmp_path / "out.jsonl"), "--shard-index", index, "--shard-count", count]) == 1
+    assert "--shard-index" in capsys.readouterr().err
+    assert not (tmp_path / "out.jsonl").exists()
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+import time
+from utils.jobs import JobQueue
+from utils.config import JOB_STALE_SECONDS
+
+def _queue(tmp_path):
+    source = tmp_path / "prospects.csv"
+    source.write_text("prospect_name,prospect_title,prospect_email,prospect_company\nP,CTO,p@example.com,Acme\n")
+    return JobQueue(str(tmp_path / "jobs.sqlite3")), str(source)
+
+def test_claim_next_takes_oldest_queued_job(tmp_path):
+    jobs, source = _queue(tmp_path)
+    first = jobs.submit("alice", source, {"n": 1}, total=1)
+    second = jobs.submit("alice", source, {"n": 2}, total=1)
+    claimed = jobs.claim_next("worker-1")
+    assert claimed["id"] == first
+    assert claimed["params"] == {"n": 1}
+    assert jobs.get(first)["status"] == "running"
+    assert jobs.claim_next("worker-2")["id"] == second
+    assert jobs.claim_next("worker-3") is None
+
+def test_concurrent_claims_hand_out_each_job_once(tmp_path):
+    jobs, source = _queue(tmp_path)
+    job_ids = {jobs.submit("alice", source, {}, total=1) for _ in range(5)}
+    claimed = []
+    lock = threading.Lock()
+
+    def claim(worker):
+        while True:
+            job = jobs.claim_next(worker)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=claim, args=(f"worker-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(job_ids)
+
+def test_stale_running_job_is_requeued(tmp_path):
+    jobs, source = _queue(tmp_path)
+    job_id = jobs.submit("alice", source, {}, total=1)
+    assert jobs.claim_next("crashed-worker")["id"] == job_id
+    # A live worker's job is not taken over.
+    assert jobs.claim_next("worker-2") is None
+    with sqlite3.connect(jobs.path) as conn:
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time() - JOB_STALE_SECONDS - 1, job_id))
+    reclaimed = jobs.claim_next("worker-2")
+    assert reclaimed["id"] == job_id
+    assert jobs.get(job_id)["worker"] == "worker-2"
+
+def test_heartbeat_keeps_job_claimed(tmp_path):
+    jobs, source = _queue(tmp_path)
+    job_id = jobs.submit("alice", source, {}, total=1)
+    jobs.claim_next("worker-1")
+    with sqlite3.connect(jobs.path) as conn:
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time() - JOB_STALE_SECONDS - 1, job_id))
+    jobs.heartbeat(job_id)
+    assert jobs.claim_next("worker-2") is None
+
+def test_cancel_only_queued_jobs_of_owner(tmp_path):
+    jobs, source = _queue(tmp_path)
+    job_id = jobs.submit("alice", source, {}, total=1)
+    assert not jobs.cancel(job_id, "bob")
+    assert jobs.cancel(job_id, "alice")
+    assert jobs.claim_next("worker-1") is None
+    assert jobs.queue_depth() == 0
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+import pytest
+import utils.pipeline as pipeline
+from utils.journal import RunJournal, prune_journals, run_id_for, BODY_KEY
+from utils.pipeline import run_staged_batch
+from utils.sales_context import setup_graph
+from utils.session_store import ArticleRecord
+from benchmarks.bench_suite import bench_email_data
+from tests.conftest import prospect_rows
+
+def test_load_rebuilds_states_and_compressed_bodies(tmp_path):
+    journal = RunJournal("run", directory=str(tmp_path))
+    article = ArticleRecord.from_article({"title": "Acme raises", "url": "https://example.com/a", "publishedAt": "2026-10-01T00:00:00Z", "full_content": "Full text " * 50})
+    journal.record(0, "fetch", {"prospect_articles": [article], "competitor_articles": []})
+    journal.record(0, "summarize", {"summaries": ["s"], "news_summary": "news"})
+    journal.record_error(1, "fetch", RuntimeError("boom"))
+    journal.close()
+    line = json.loads(open(journal.path).readline())
+    assert BODY_KEY in line["data"]["prospect_articles"][0]
+    assert "full_content" not in line["data"]["prospect_articles"][0]
+    with open(journal.path, "a") as f:
+        f.write('{"row": 2, "stage": "fet')  # torn last line from a crash
+    states = RunJournal("run", directory=str(tmp_path)).load()
+    assert list(states) == [0]
+    assert states[0]["completed_stages"] == ["fetch", "summarize"]
+    assert states[0]["news_summary"] == "news"
+    restored = states[0]["prospect_articles"][0]
+    assert isinstance(restored, ArticleRecord)
+    assert restored.full_content == article.full_content
+
+def test_run_id_ignores_api_key():
+    settings = {"industry": "tech", "news_api_key": "a"}
+    assert run_id_for("digest", {}, settings) == run_id_for("digest", {}, {**settings, "news_api_key": "b"})
+    assert run_id_for("digest", {}, settings) != run_id_for("digest", {}, {**settings, "industry": "retail"})
+
+def test_prune_by_age_and_count_keeps_open_journal(tmp_path):
+    for n in range(5):
+        (tmp_path / f"run{n}.jsonl").write_text("")
+        os.utime(tmp_path / f"run{n}.jsonl", (time.time() - n, time.time() - n))
+    os.utime(tmp_path / "run4.jsonl", (0, 0))
+    (tmp_path / "notes.txt").write_text("")
+    keep = str(tmp_path / "run3.jsonl")
+    removed = prune_journals(str(tmp_path), max_age=3600, max_files=3, keep=(keep,))
+    assert removed == 2
+    assert sorted(os.listdir(tmp_path)) == ["notes.txt", "run0.jsonl", "run1.jsonl", "run3.jsonl"]
+
+def test_opening_a_journal_prunes_old_ones(tmp_path):
+    (tmp_path / "old.jsonl").write_text("")
+    os.utime(tmp_path / "old.jsonl", (0, 0))
+    RunJournal("new", directory=str(tmp_path))
+    assert not (tmp_path / "old.jsonl").exists()
+
+def test_rerun_resumes_only_failed_rows(tmp_path, monkeypatch, settings, llm):
+    graph = setup_graph(llm)
+    rows = prospect_rows("Journal Co", 4)
+    real_fetch = pipeline.fetch_company_news
+
+    def failing_fetch(company, *args, **kwargs):
+        if company == "Journal Co 2":
+            raise RuntimeError("news down")
+        return real_fetch(company, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "fetch_company_news", failing_fetch)
+    journal = RunJournal("resume", directory=str(tmp_path))
+    results = run_staged_batch(rows, bench_email_data(""), settings, llm, graph, journal=journal)
+    assert [bool(result.get("error")) for result in results] == [False, False, True, False]
+    assert os.path.exists(journal.path)
+
+    monkeypatch.setattr(pipeline, "fetch_company_news", real_fetch)
+    stage_runs = []
+    real_stage = pipeline._run_stage_graph
+    monkeypatch.setattr(pipeline, "_run_stage_graph", lambda stage, state, configurable: stage_runs.append((stage, state["row_index"])) or real_stage(stage, state, configurable))
+    resumed = run_staged_batch(rows, bench_email_data(""), settings, llm, graph, journal=RunJournal("resume", directory=str(tmp_path)))
+    assert not any(result.get("error") for result in resumed)
+    assert {row for _, row in stage_runs} == {2}
+    assert [result["email_content"] for result in resumed][:2] == [result["email_content"] for result in results][:2]
+    assert not os.path.exists(journal.path)  # a clean finish deletes the journal
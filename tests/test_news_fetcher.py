@@ -0,0 +1,35 @@
+from datetime import datetime
+from utils.news_fetcher import _serper_published, newest_published, search_google_news
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+def test_serper_dates_become_utc_timestamps():
+    assert _serper_published("2 hours ago", now=NOW) == "2026-10-18T10:00:00Z"
+    assert _serper_published("3 days ago", now=NOW) == "2026-10-15T12:00:00Z"
+    assert _serper_published("yesterday", now=NOW) == "2026-10-17T12:00:00Z"
+    assert _serper_published("Oct 5, 2026", now=NOW).startswith("2026-10-05")
+    assert _serper_published("2026-10-17", now=NOW).startswith("2026-10-17")
+    assert _serper_published("sometime soon", now=NOW) == ""
+    assert _serper_published("", now=NOW) == ""
+
+def test_incremental_since_ignores_serper_dates():
+    articles = [
+        {"publishedAt": "2026-10-10T08:00:00Z", "provider": "newsapi"},
+        {"publishedAt": "2026-10-18T11:00:00Z", "provider": "serper"},
+        {"publishedAt": "2026-10-12T08:00:00Z"},
+    ]
+    assert newest_published(articles) == datetime(2026, 10, 12, 8, 0, 0)
+    assert newest_published([{"publishedAt": "2026-10-18T11:00:00Z", "provider": "serper"}]) is None
+
+def test_known_serper_links_are_not_scraped(stub_services):
+    _, config = stub_services
+    before = config.requests["article"]
+    articles = search_google_news("Serper Co", ["cloud"], "tech", "stub-serper-key")
+    scraped = config.requests["article"] - before
+    assert articles and scraped == len(articles)
+    assert all(article["provider"] == "serper" for article in articles)
+    known = {article["url"] for article in articles[:2]}
+    before = config.requests["article"]
+    again = search_google_news("Serper Co", ["cloud"], "tech", "stub-serper-key", known_urls=known)
+    assert config.requests["article"] - before == len(articles) - 2
+    assert not known & {article["url"] for article in again}
@@ -0,0 +1,20 @@
+from utils.llm import StubProvider
+from utils.pipeline import run_pipeline, prospect_email_data, NodeCache, DEGRADED
+from utils.sales_context import setup_graph
+from benchmarks.bench_suite import bench_email_data
+
+def _run(company, llm, settings):
+    data = prospect_email_data(bench_email_data(""), {"prospect_name": "P", "prospect_title": "CTO", "prospect_email": "p@example.com", "prospect_company": company})
+    return run_pipeline(data, settings, llm, setup_graph(llm), NodeCache())
+
+def test_title_fallback_summaries_are_not_cached(settings):
+    failing = _run("Degraded Co", StubProvider(latency=0.0, error_rate=1.0), settings)
+    titles = [article.title for article in failing["prospect_articles"]]
+    assert failing["summaries"] and failing["summaries"] == titles[:len(failing["summaries"])]
+    assert DEGRADED not in failing
+
+    healthy = StubProvider(latency=0.0, error_rate=0.0)
+    retried = _run("Degraded Co", healthy, settings)
+    assert not retried["cache_hits"]["summarize_prospect_news"]
+    assert retried["summaries"] != failing["summaries"]
+    assert _run("Degraded Co", healthy, settings)["cache_hits"]["summarize_prospect_news"]
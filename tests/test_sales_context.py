@@ -0,0 +1,42 @@
+import json
+from utils.sales_context import build_batch_email_prompt, parse_batch_emails, generate_email_batches, build_email_prompts
+from benchmarks.bench_suite import bench_email_data
+
+def _prospects(count):
+    return [{**bench_email_data("Acme"), "prospect_name": f"Prospect {n}", "prospect_title": "VP Engineering"} for n in range(count)]
+
+def test_prompt_lists_prospects_and_briefs():
+    prompt = build_batch_email_prompt(["Write brief one.", "Write brief two."], _prospects(2))
+    assert '"id": "p1"' in prompt and '"id": "p2"' in prompt
+    assert "Prospect 1" in prompt
+    assert "=== BRIEF 2 ===\nWrite brief two." in prompt
+
+def test_stub_answer_parses_for_every_prospect(llm):
+    prompt = build_batch_email_prompt(["Brief one.", "Brief two.", "Brief three."], _prospects(3))
+    emails = parse_batch_emails(llm.generate(prompt, json_output=True), ["p1", "p2", "p3"], 3)
+    assert sorted(emails) == ["p1", "p2", "p3"]
+    assert all(len(options) == 3 for options in emails.values())
+
+def test_malformed_entries_are_left_out():
+    response = "Sure! " + json.dumps({"emails": [
+        {"id": "p1", "options": ["a", "b"]},
+        {"id": "p2", "options": ["a"]},        # wrong option count
+        {"id": "p3", "options": ["a", "  "]},  # blank option
+        {"id": "p9", "options": ["a", "b"]},   # unknown id
+        "p4",
+    ]}) + " Hope this helps."
+    assert parse_batch_emails(response, ["p1", "p2", "p3", "p4"], 2) == {"p1": ["a", "b"]}
+    assert parse_batch_emails("no json here", ["p1"], 2) == {}
+    assert parse_batch_emails('{"emails": [', ["p1"], 2) == {}
+    assert parse_batch_emails('["p1"]', ["p1"], 2) == {}
+
+def test_generate_email_batches_covers_every_prospect(llm):
+    prospects = _prospects(4)
+    results = generate_email_batches(prospects, "Acme expands its cloud platform.", "Acme is investing in cloud.", "", llm)
+    briefs = build_email_prompts(prospects[0], "Acme expands its cloud platform.", "Acme is investing in cloud.", "")
+    assert len(results) == 4
+    assert all(result is not None and sorted(result) == list(range(1, len(briefs) + 1)) for result in results)
+    assert results[0][1].startswith("=== Email Option 1 ===")
+
+def test_single_prospect_is_not_batched(llm):
+    assert generate_email_batches(_prospects(1), "news", "context", "", llm) == [None]
@@ -0,0 +1,147 @@
+import threading
+import time
+import pytest
+from utils.llm import LLMProviderError
+from utils.scheduler import ResourceQueue, AIMDController, Scheduler, INTERACTIVE, BATCH, PREFETCH, is_overload, parse_weights, priority, current_priority
+
+def _enqueue(queue, waiters, order):
+    """Queue each (user, priority) behind a held slot, in order; each records its grant and releases."""
+    threads = []
+    for user, priority_name in waiters:
+        def wait(user=user, priority_name=priority_name):
+            queue.acquire(user, priority_name)
+            order.append((user, priority_name))
+            queue.release()
+        depth = queue.depth()
+        thread = threading.Thread(target=wait, daemon=True)
+        thread.start()
+        while queue.depth() == depth:
+            time.sleep(0.001)
+        threads.append(thread)
+    return threads
+
+def _drain(queue, threads):
+    queue.release()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+def test_free_slot_is_granted_without_waiting():
+    queue = ResourceQueue("test", 2)
+    assert queue.acquire("alice", BATCH) == 0.0
+    assert queue.acquire("bob", BATCH) == 0.0
+    assert queue.in_use == 2
+
+def test_more_urgent_class_goes_first():
+    queue = ResourceQueue("test", 1, aging_seconds=1000)
+    queue.acquire("holder", INTERACTIVE)
+    order = []
+    threads = _enqueue(queue, [("a", PREFETCH), ("b", BATCH), ("c", INTERACTIVE)], order)
+    _drain(queue, threads)
+    assert [p for _, p in order] == [INTERACTIVE, BATCH, PREFETCH]
+    assert queue.in_use == 0
+
+def test_users_share_a_class_by_weight():
+    queue = ResourceQueue("test", 1, aging_seconds=1000, weights={"alice": 2.0})
+    queue.acquire("holder", BATCH)
+    order = []
+    threads = _enqueue(queue, [("alice", BATCH)] * 6 + [("bob", BATCH)] * 6, order)
+    _drain(queue, threads)
+    first = [user for user, _ in order[:6]]
+    assert first.count("alice") == 4 and first.count("bob") == 2
+
+def test_waiting_prefetch_call_ages_into_interactive():
+    queue = ResourceQueue("test", 1, aging_seconds=0.05)
+    queue.acquire("holder", INTERACTIVE)
+    order = []
+    threads = _enqueue(queue, [("a", PREFETCH)], order)
+    time.sleep(0.12)  # two aging steps: prefetch -> batch -> interactive
+    threads += _enqueue(queue, [("b", INTERACTIVE)], order)
+    _drain(queue, threads)
+    assert order[0] == ("a", PREFETCH)
+    assert queue.snapshot()["stats"][PREFETCH]["promoted"] == 1
+
+def test_raised_limit_grants_waiters_and_lowered_limit_drops_slots():
+    queue = ResourceQueue("test", 1)
+    queue.acquire("holder", BATCH)
+    order = []
+    threads = _enqueue(queue, [("a", BATCH), ("b", BATCH)], order)
+    queue.set_limit(3)
+    for thread in threads:
+        thread.join(5)
+    assert len(order) == 2 and queue.in_use == 1
+    queue.acquire("x", BATCH)
+    queue.acquire("y", BATCH)
+    queue.set_limit(1)
+    queue.release()
+    queue.release()
+    assert queue.in_use == 1
+
+def test_is_overload():
+    assert is_overload(LLMProviderError("quota", code=429))
+    assert is_overload(LLMProviderError("down", code=503))
+    assert not is_overload(LLMProviderError("bad prompt", code=400))
+    assert not is_overload(ValueError("parse error"))
+    assert is_overload(type("ResourceExhausted", (Exception,), {})())
+
+def _controller(limit=2, **kwargs):
+    queue = ResourceQueue("llm-test", limit)
+    options = {"min_limit": 1, "max_limit": 4, "decrease": 0.5, "tolerance": 3.0, "warmup": 2}
+    return queue, AIMDController(queue, **{**options, **kwargs})
+
+def test_aimd_increases_only_when_saturated():
+    queue, controller = _controller()
+    controller.on_success(time.monotonic(), 0.1)
+    assert queue.limit == 2  # idle queue: no credit
+    queue.acquire("a", BATCH)
+    queue.acquire("b", BATCH)
+    for _ in range(2):
+        controller.on_success(time.monotonic(), 0.1)
+    assert queue.limit == 3
+    assert controller.snapshot()["increases"] == 1
+
+def test_aimd_cuts_once_per_overload_burst():
+    queue, controller = _controller(limit=4)
+    burst_started = time.monotonic()
+    controller.on_error(burst_started, LLMProviderError("quota", code=429))
+    assert queue.limit == 2
+    # Calls from the same burst started before the cut and do not cut again.
+    controller.on_error(burst_started, LLMProviderError("quota", code=429))
+    assert queue.limit == 2
+    controller.on_error(time.monotonic(), LLMProviderError("bad prompt", code=400))
+    assert queue.limit == 2
+    controller.on_error(time.monotonic(), LLMProviderError("quota", code=429))
+    assert queue.limit == 1
+    assert controller.snapshot()["decreases"] == {"overload": 2, "latency": 0}
+
+def test_aimd_cuts_on_latency_spike_after_warmup():
+    queue, controller = _controller(limit=4)
+    for _ in range(2):
+        controller.on_success(time.monotonic(), 0.1, latency_class=500)
+    controller.on_success(time.monotonic(), 0.2, latency_class=1500)  # a new class has no baseline yet
+    assert queue.limit == 4
+    controller.on_success(time.monotonic(), 1.0, latency_class=500)
+    assert queue.limit == 2
+    assert controller.snapshot()["decreases"]["latency"] == 1
+
+def test_scheduler_slot_feeds_the_controller():
+    scheduler = Scheduler(limits={"llm": 1, "news": 0}, weights={})
+    with scheduler.slot("news"):
+        pass  # unlimited resources are not queued
+    with pytest.raises(LLMProviderError):
+        with scheduler.slot("llm"):
+            raise LLMProviderError("quota", code=429)
+    snapshot = scheduler.snapshot()
+    assert "news" not in snapshot
+    assert snapshot["llm"]["in_use"] == 0
+    assert snapshot["llm"]["adaptive"]["decreases"]["overload"] == 1
+
+def test_priority_context_and_weights():
+    assert current_priority() == INTERACTIVE
+    with priority(BATCH):
+        assert current_priority() == BATCH
+    assert current_priority() == INTERACTIVE
+    with pytest.raises(ValueError):
+        with priority("urgent"):
+            pass
+    assert parse_weights("a@example.com=2, b@example.com=0.5,") == {"a@example.com": 2.0, "b@example.com": 0.5}
@@ -0,0 +1,90 @@
+import threading
+import time
+import pytest
+from utils.staged_executor import Stage, StagedPipeline, StageFailure
+
+def _run(pipeline, items, timeout=10):
+    """Drain pipeline.run(items) on a thread, so a hang fails the test instead of blocking it."""
+    results, errors = [], []
+
+    def drain():
+        try:
+            results.extend(pipeline.run(items))
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not finish"
+    return results, errors
+
+def test_items_pass_through_every_stage():
+    pipeline = StagedPipeline([Stage("double", lambda x: x * 2, concurrency=3), Stage("inc", lambda x: x + 1, concurrency=2)], queue_size=2)
+    results, errors = _run(pipeline, range(50))
+    assert not errors
+    assert sorted(results) == [(i, i * 2 + 1) for i in range(50)]
+
+def test_failed_item_skips_later_stages():
+    seen = []
+
+    def check(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    pipeline = StagedPipeline([Stage("check", check), Stage("record", lambda x: seen.append(x) or x)])
+    results, errors = _run(pipeline, range(6))
+    assert not errors
+    failures = {index: result for index, result in results if isinstance(result, StageFailure)}
+    assert list(failures) == [3]
+    assert failures[3].stage == "check" and isinstance(failures[3].error, ValueError) and failures[3].item == 3
+    assert sorted(seen) == [0, 1, 2, 4, 5]
+
+def test_stages_overlap():
+    pipeline = StagedPipeline([Stage("a", lambda x: time.sleep(0.05) or x), Stage("b", lambda x: time.sleep(0.05) or x)])
+    started = time.perf_counter()
+    _run(pipeline, range(6))
+    # Run back to back, the stages would take 0.6s.
+    assert time.perf_counter() - started < 0.5
+    assert pipeline.busy_seconds["a"] >= 0.25 and pipeline.busy_seconds["b"] >= 0.25
+
+def test_batched_stage_groups_by_key():
+    batches = []
+
+    def handle(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    stage = Stage("batch", handle, concurrency=2, batch_size=3, batch_key=lambda x: x % 2, linger=0.05)
+    results, errors = _run(StagedPipeline([stage]), range(10))
+    assert not errors
+    assert sorted(results) == [(i, i * 10) for i in range(10)]
+    assert all(len(batch) <= 3 and len({item % 2 for item in batch}) == 1 for batch in batches)
+    assert len(batches) < 10
+
+def test_batch_result_exception_fails_one_item():
+    stage = Stage("batch", lambda items: [ValueError("no") if item == 2 else item for item in items], batch_size=4, batch_key=lambda x: "all", linger=0.05)
+    results, _ = _run(StagedPipeline([stage]), range(4))
+    failed = [index for index, result in results if isinstance(result, StageFailure)]
+    assert failed == [2]
+
+def test_input_error_finishes_fed_items_then_raises():
+    def items():
+        yield from range(3)
+        raise RuntimeError("bad input row")
+
+    results, errors = _run(StagedPipeline([Stage("a", lambda x: x, concurrency=2), Stage("b", lambda x: x, concurrency=3)]), items())
+    assert sorted(results) == [(0, 0), (1, 1), (2, 2)]
+    assert len(errors) == 1 and str(errors[0]) == "bad input row"
+
+def test_input_error_on_batched_stage_does_not_hang():
+    def items():
+        yield 1
+        raise RuntimeError("bad input row")
+
+    stage = Stage("batch", lambda items: items, batch_size=4, batch_key=lambda x: "all", linger=10)
+    results, errors = _run(StagedPipeline([stage]), items())
+    assert results == [(0, 1)]
+    with pytest.raises(RuntimeError):
+        raise errors[0]
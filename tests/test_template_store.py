@@ -0,0 +1,39 @@
+from utils.template_store import TemplateStore, fts_query
+
+def test_fts_query_prefix_matches_every_word():
+    assert fts_query("Cloud  sec!") == '"cloud"* AND "sec"*'
+    assert fts_query("  ") == ""
+
+def test_search_matches_prefixes_in_name_and_content(tmp_path):
+    store = TemplateStore(str(tmp_path / "templates.sqlite3"))
+    store.save_many("alice", {
+        "Cloud follow-up": "Following up on our cloud security chat.",
+        "Intro": "A quick introduction to SecureShield.",
+        "Renewal": "Your contract renews next month.",
+    })
+    rows, total = store.search("alice", "secur")
+    assert total == 2
+    assert {row["name"] for row in rows} == {"Cloud follow-up", "Intro"}
+    rows, total = store.search("alice", "cloud sec")
+    assert total == 1 and rows[0]["name"] == "Cloud follow-up"
+    assert store.search("alice", "nothing")[1] == 0
+
+def test_search_is_scoped_to_owner_and_tracks_updates(tmp_path):
+    store = TemplateStore(str(tmp_path / "templates.sqlite3"))
+    store.save("alice", "Intro", "cloud pitch")
+    store.save("bob", "Intro", "cloud pitch")
+    assert store.search("alice", "cloud")[1] == 1
+    store.save("alice", "Intro", "security pitch")
+    assert store.search("alice", "cloud")[1] == 0
+    assert store.search("alice", "security")[1] == 1
+    assert store.delete("alice", "Intro")
+    assert store.search("alice", "security")[1] == 0
+    assert store.search("bob", "cloud")[1] == 1
+
+def test_empty_query_pages_newest_first(tmp_path):
+    store = TemplateStore(str(tmp_path / "templates.sqlite3"))
+    for n in range(5):
+        store.save("alice", f"T{n}", f"content {n}")
+    rows, total = store.search("alice", "", limit=2, offset=1)
+    assert total == 5
+    assert [row["name"] for row in rows] == ["T3", "T2"]
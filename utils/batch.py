@@ -0,0 +1,235 @@
+import csv
+import hashlib
+import heapq
+import io
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from collections import deque
+from email.message import EmailMessage
+from utils.pipeline import NodeCache, iter_staged_batch
+from utils.journal import RunJournal, file_digest, run_id_for
+from utils.config import BATCH_QUEUE_SIZE, BATCH_DISPLAY_WINDOW, BATCH_NODE_CACHE_ENTRIES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['prospect_name', 'prospect_title', 'prospect_email', 'prospect_company']
+RESULT_FIELDS = ["row", "prospect_name", "prospect_title", "prospect_email", "prospect_company", "status", "error", "email_content", "sales_context"]
+
+def validate_columns(columns):
+    if not all(col in columns for col in REQUIRED_COLUMNS):
+        raise ValueError("CSV must contain columns: prospect_name, prospect_title, prospect_email, prospect_company")
+
+def _open_text(source):
+    if hasattr(source, "read"):
+        source.seek(0)
+        return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    return open(source, newline="", encoding="utf-8-sig")
+
+def _close_text(source, text):
+    if hasattr(source, "read"):
+        text.detach()  # leave the caller's binary buffer (e.g. a Streamlit upload) open
+    else:
+        text.close()
+
+def read_columns(source):
+    """The CSV header of a path or binary file object, read without consuming any rows."""
+    text = _open_text(source)
+    try:
+        return csv.DictReader(text).fieldnames or []
+    finally:
+        _close_text(source, text)
+
+def read_prospects(source, shard=None):
+    """Yield prospect rows one at a time from a CSV path or binary file object.
+
+    Only the current row is held in memory, so arbitrarily large uploads stream through.
+    With `shard` = (index, count), only rows whose company hashes to that shard are
+    yielded, each tagged with its original `source_row`. Rows are read lazily, so callers
+    check the header with validate_columns(read_columns(source)) before starting a run.
+    """
+    text = _open_text(source)
+    try:
+        reader = csv.DictReader(text)
+        validate_columns(reader.fieldnames or [])
+        for source_row, row in enumerate(reader):
+            prospect = {col: (row.get(col) or "").strip() for col in REQUIRED_COLUMNS}
+            if shard is None:
+                yield prospect
+            elif shard_for(prospect['prospect_company'], shard[1]) == shard[0]:
+                prospect["source_row"] = source_row
+                yield prospect
+    finally:
+        _close_text(source, text)
+
+def shard_for(company, shard_count):
+    """Stable shard for a company, so all of its rows (and its cached news) land on one worker."""
+    digest = hashlib.sha1(company.strip().lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+def count_prospects(source):
+    text = _open_text(source)
+    try:
+        return max(0, sum(1 for _ in csv.reader(text)) - 1)
+    finally:
+        _close_text(source, text)
+
+def result_record(index, row, result):
+    return {
+        "row": row.get("source_row", index),
+        **{col: row.get(col, "") for col in REQUIRED_COLUMNS},
+        "status": "error" if result.get("error") else "ok",
+        "error": result.get("error", ""),
+        "email_content": result.get("email_content", ""),
+        "sales_context": result.get("sales_context", ""),
+    }
+
+class JsonlResultWriter:
+    def __init__(self, path, append=False):
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class CsvResultWriter:
+    def __init__(self, path, append=False):
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+        if write_header:
+            self._writer.writeheader()
+
+    def write(self, record):
+        self._writer.writerow({field: record.get(field, "") for field in RESULT_FIELDS})
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ZipResultWriter:
+    """Writes one .txt or .eml file per generated email straight into a ZIP archive."""
+
+    def __init__(self, path, extension="txt", base_email_data=None):
+        self.extension = extension
+        self.base_email_data = base_email_data or {}
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def _eml(self, record):
+        message = EmailMessage()
+        message["To"] = record["prospect_email"]
+        if self.base_email_data.get("salesperson_email"):
+            message["From"] = self.base_email_data["salesperson_email"]
+        email_type = self.base_email_data.get("email_type", "initial pitch").title()
+        message["Subject"] = f"{email_type}: {record['prospect_company']}"
+        message.set_content(record["email_content"])
+        return message.as_bytes()
+
+    def write(self, record):
+        safe_email = re.sub(r"[^A-Za-z0-9._-]", "_", record["prospect_email"] or "prospect")
+        name = f"{record['row']:06d}_{safe_email}.{self.extension}"
+        data = self._eml(record) if self.extension == "eml" else record["email_content"].encode("utf-8")
+        self._zip.writestr(name, data)
+
+    def close(self):
+        self._zip.close()
+
+def open_result_writer(path, append=False, base_email_data=None):
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return CsvResultWriter(path, append)
+    if lowered.endswith(".eml.zip"):
+        return ZipResultWriter(path, "eml", base_email_data)
+    if lowered.endswith(".zip"):
+        return ZipResultWriter(path, "txt", base_email_data)
+    return JsonlResultWriter(path, append)
+
+def stream_batch(rows, writer, base_email_data, settings, llm, graph, stage_concurrency=None, queue_size=BATCH_QUEUE_SIZE, journal=None, window_size=BATCH_DISPLAY_WINDOW, on_result=None, ordered=False):
+    """Run rows through the staged pipeline, handing each finished email to `writer`.
+
+    Only the last `window_size` records are kept (for display), so memory stays flat no
+    matter how many rows the input has. With `ordered`, records reach the writer in input
+    order; only rows that finished ahead of a slower earlier row are held back.
+    """
+    started = time.perf_counter()
+    processed = errors = 0
+    recent = deque(maxlen=window_size)
+    held = {}  # index -> record finished ahead of an earlier row (ordered mode)
+    next_index = 0
+    node_cache = NodeCache(max_entries=BATCH_NODE_CACHE_ENTRIES)
+    for index, row, result in iter_staged_batch(rows, base_email_data, settings, llm, graph, node_cache, stage_concurrency, queue_size, journal):
+        record = result_record(index, row, result)
+        if ordered:
+            held[index] = record
+            while next_index in held:
+                writer.write(held.pop(next_index))
+                next_index += 1
+        else:
+            writer.write(record)
+        recent.append(record)
+        processed += 1
+        errors += record["status"] == "error"
+        if on_result:
+            on_result(index, row, record)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Batch finished: {processed} rows, {errors} errors in {elapsed:.1f}s")
+    return {"processed": processed, "errors": errors, "elapsed": elapsed, "recent": list(recent)}
+
+def run_batch_file(input_path, output_path, base_email_data, settings, llm, graph, stage_concurrency=None, queue_size=BATCH_QUEUE_SIZE, on_result=None, resume=True, shard=None):
+    """Generate emails for every row of a prospect CSV, writing each result as soon as it completes.
+
+    Results are written in CSV row order (the `row` field holds the original CSV position), so
+    shard outputs can be merged as streams.
+    An output path ending in .zip or .eml.zip gets one file per email. With `resume`,
+    stages already journaled by an earlier run of the same CSV and settings are replayed
+    instead of recomputed. With `shard` = (index, count) only that shard's rows are processed.
+    """
+    validate_columns(read_columns(input_path))
+    input_digest = file_digest(input_path) + (f":shard{shard[0]}of{shard[1]}" if shard else "")
+    journal = RunJournal(run_id_for(input_digest, base_email_data, settings)) if resume else None
+    writer = open_result_writer(output_path, base_email_data=base_email_data)
+    try:
+        return stream_batch(read_prospects(input_path, shard), writer, base_email_data, settings, llm, graph, stage_concurrency, queue_size, journal, window_size=0, on_result=on_result, ordered=True)
+    finally:
+        writer.close()
+
+def export_results(results_path, export_path, base_email_data=None):
+    """Convert a JSONL results file into another export format (CSV, ZIP of .txt or .eml), in row order."""
+    merge_results([results_path], export_path, base_email_data)
+    return export_path
+
+def _read_records(path):
+    """Records of a JSONL result file one at a time, checking they are in row order."""
+    last_row = -1
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["row"] < last_row:
+                raise ValueError(f"{path} is not in row order (row {record['row']} after {last_row})")
+            last_row = record["row"]
+            yield record
+
+def merge_results(results_paths, output_path, base_email_data=None):
+    """Merge JSONL result files (e.g. one per shard) into one output in original CSV row order.
+
+    Each file must already be in row order, as run_batch_file writes it; files are streamed,
+    so memory does not grow with the number of rows.
+    """
+    writer = open_result_writer(output_path, base_email_data=base_email_data)
+    merged = 0
+    try:
+        for record in heapq.merge(*(_read_records(path) for path in results_paths), key=lambda record: record["row"]):
+            writer.write(record)
+            merged += 1
+    finally:
+        writer.close()
+    return merged
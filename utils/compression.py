@@ -0,0 +1,34 @@
+import threading
+import zlib
+from utils.config import ARTICLE_COMPRESSION, ARTICLE_COMPRESSION_MIN_CHARS
+
+# First byte of every blob names its codec, so blobs stay readable after the setting changes.
+RAW, ZLIB, ZSTD = b"r", b"z", b"s"
+
+# zstandard compressor and decompressor objects are not thread-safe: one pair per thread.
+_zstd_local = threading.local()
+
+def _zstd():
+    if not hasattr(_zstd_local, "codec"):
+        import zstandard  # optional: only needed with ARTICLE_COMPRESSION=zstd
+        _zstd_local.codec = (zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor())
+    return _zstd_local.codec
+
+def compress_text(text, codec=ARTICLE_COMPRESSION, min_chars=ARTICLE_COMPRESSION_MIN_CHARS):
+    """Text as a tagged blob; texts shorter than min_chars are stored uncompressed."""
+    data = text.encode("utf-8")
+    if len(text) < min_chars or codec == "none":
+        return RAW + data
+    if codec == "zstd":
+        return ZSTD + _zstd()[0].compress(data)
+    if codec == "zlib":
+        return ZLIB + zlib.compress(data, 6)
+    raise ValueError(f"Unknown ARTICLE_COMPRESSION codec '{codec}'. Use zlib, zstd or none.")
+
+def decompress_text(blob):
+    tag, data = blob[:1], blob[1:]
+    if tag == ZLIB:
+        data = zlib.decompress(data)
+    elif tag == ZSTD:
+        data = _zstd()[1].decompress(data)
+    return data.decode("utf-8")
@@ -5,6 +5,8 @@ load_dotenv()
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 news_api_key = os.getenv("NEWS_API")
 serper_api_key = os.getenv("SERPER_API_KEY")
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+SERPER_API_URL = os.getenv("SERPER_API_URL", "https://google.serper.dev/search")
 
 DEFAULT_KEYWORDS = [
     "cloud", "AI", "artificial intelligence", "ML", "machine learning", 
@@ -29,3 +31,117 @@ INDUSTRY_SOURCES = {
     "manufacturing": ["industryweek.com", "manufacturing.net", "automationworld.com"],
     "logistics": ["supplychaindive.com", "freightwaves.com", "logisticsmgmt.com"]
 }
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+SALES_CONTEXT_CACHE_TTL = int(os.getenv("SALES_CONTEXT_CACHE_TTL", str(24 * 3600)))
+
+# Batch run journals (CACHE_DIR/journals): a run that finishes with no failed rows deletes its
+# journal; the rest are swept once older than JOURNAL_MAX_AGE_SECONDS or beyond the newest JOURNAL_MAX_FILES.
+JOURNAL_MAX_AGE_SECONDS = int(os.getenv("JOURNAL_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+JOURNAL_MAX_FILES = int(os.getenv("JOURNAL_MAX_FILES", "200"))
+
+# LLM backend: "gemini", "stub" (deterministic offline text), "record" (Gemini + capture) or "replay"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gemini-2.0-flash-001")
+LLM_RECORDING_PATH = os.getenv("LLM_RECORDING_PATH", os.path.join(CACHE_DIR, "llm_recordings.jsonl"))
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))
+LLM_STUB_ERROR_RATE = float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+LLM_STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+LLM_STUB_CAPACITY = int(os.getenv("LLM_STUB_CAPACITY", "0"))
+
+# Worker threads per stage and queue depth between stages for CSV batch runs
+BATCH_STAGE_CONCURRENCY = {
+    "fetch": int(os.getenv("BATCH_FETCH_CONCURRENCY", "4")),
+    "summarize": int(os.getenv("BATCH_SUMMARIZE_CONCURRENCY", "4")),
+    "context": int(os.getenv("BATCH_CONTEXT_CONCURRENCY", "2")),
+    "email": int(os.getenv("BATCH_EMAIL_CONCURRENCY", "4")),
+}
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "8"))
+
+# Outbound call scheduler (per process): concurrent calls allowed per upstream (0 = unlimited),
+# seconds a waiting call needs to be promoted one priority class (starvation protection), and
+# fair-share weights per user, e.g. "alice@example.com=2,bob@example.com=0.5" (default 1).
+SCHEDULER_LIMITS = {
+    "newsapi": int(os.getenv("SCHEDULER_NEWSAPI_CONCURRENCY", "8")),
+    "serper": int(os.getenv("SCHEDULER_SERPER_CONCURRENCY", "4")),
+    "article": int(os.getenv("SCHEDULER_ARTICLE_CONCURRENCY", "16")),
+    "llm": int(os.getenv("SCHEDULER_LLM_CONCURRENCY", "16")),
+}
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "10"))
+SCHEDULER_USER_WEIGHTS = os.getenv("SCHEDULER_USER_WEIGHTS", "")
+
+# Adaptive (AIMD) concurrency for LLM calls, starting from SCHEDULER_LLM_CONCURRENCY: the limit
+# grows by one per round of healthy calls and is multiplied by LLM_AIMD_DECREASE on a 429/5xx or
+# when a call takes LLM_AIMD_LATENCY_TOLERANCE times the usual latency for its output size.
+# The limit stays within [LLM_AIMD_MIN_CONCURRENCY, LLM_AIMD_MAX_CONCURRENCY]; a max of 0 keeps it fixed.
+LLM_AIMD_MIN_CONCURRENCY = int(os.getenv("LLM_AIMD_MIN_CONCURRENCY", "2"))
+LLM_AIMD_MAX_CONCURRENCY = int(os.getenv("LLM_AIMD_MAX_CONCURRENCY", "64"))
+LLM_AIMD_DECREASE = float(os.getenv("LLM_AIMD_DECREASE", "0.5"))
+LLM_AIMD_LATENCY_TOLERANCE = float(os.getenv("LLM_AIMD_LATENCY_TOLERANCE", "2.0"))
+
+# Batched email generation in CSV batches: prospects at the same company (same news and sales
+# context) share one LLM call returning every tone variant for each of them. A row waits up to
+# the linger time for company-mates; the token budgets bound prospects per call. 1 disables it.
+EMAIL_BATCH_MAX_PROSPECTS = int(os.getenv("EMAIL_BATCH_MAX_PROSPECTS", "4"))
+EMAIL_BATCH_LINGER_SECONDS = float(os.getenv("EMAIL_BATCH_LINGER_SECONDS", "0.5"))
+EMAIL_BATCH_MAX_INPUT_TOKENS = int(os.getenv("EMAIL_BATCH_MAX_INPUT_TOKENS", "24000"))
+EMAIL_BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("EMAIL_BATCH_MAX_OUTPUT_TOKENS", "8192"))
+EMAIL_BATCH_TOKENS_PER_EMAIL = int(os.getenv("EMAIL_BATCH_TOKENS_PER_EMAIL", "600"))
+
+# Streaming batch mode: rows kept in memory for display, and node cache size for one run
+BATCH_DISPLAY_WINDOW = int(os.getenv("BATCH_DISPLAY_WINDOW", "50"))
+BATCH_NODE_CACHE_ENTRIES = int(os.getenv("BATCH_NODE_CACHE_ENTRIES", "2000"))
+
+# Per-session news store: companies kept and approximate bytes of session-owned text.
+# Compressed article bodies are deduplicated across sessions by a content store with its own cap.
+SESSION_STORE_MAX_COMPANIES = int(os.getenv("SESSION_STORE_MAX_COMPANIES", "25"))
+SESSION_STORE_MAX_BYTES = int(os.getenv("SESSION_STORE_MAX_BYTES", str(2 * 1024 * 1024)))
+SESSION_METRICS_MAX_COMPANIES = int(os.getenv("SESSION_METRICS_MAX_COMPANIES", "5000"))
+SESSION_NODE_CACHE_ENTRIES = int(os.getenv("SESSION_NODE_CACHE_ENTRIES", "200"))
+CONTENT_STORE_MAX_BYTES = int(os.getenv("CONTENT_STORE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Scraped article bodies are kept compressed in caches and session state: codec (zlib,
+# zstd with the optional zstandard package, or none) and the shortest body worth compressing.
+ARTICLE_COMPRESSION = os.getenv("ARTICLE_COMPRESSION", "zlib").lower()
+ARTICLE_COMPRESSION_MIN_CHARS = int(os.getenv("ARTICLE_COMPRESSION_MIN_CHARS", "256"))
+
+# Process-wide fetch/summarize cache shared across sessions: entries kept, and the time
+# bucket (seconds) that is part of each key and doubles as the entry TTL. 0 entries disables it.
+SHARED_NEWS_CACHE_ENTRIES = int(os.getenv("SHARED_NEWS_CACHE_ENTRIES", "500"))
+SHARED_NEWS_CACHE_BUCKET_SECONDS = int(os.getenv("SHARED_NEWS_CACHE_BUCKET_SECONDS", "3600"))
+
+# Incremental news refresh: the last ranked articles per company and fetch settings, so later
+# fetches ask NewsAPI only for newer articles; and LLM summaries kept per article. 0 disables either.
+NEWS_HISTORY_ENTRIES = int(os.getenv("NEWS_HISTORY_ENTRIES", "2000"))
+ARTICLE_SUMMARY_CACHE_ENTRIES = int(os.getenv("ARTICLE_SUMMARY_CACHE_ENTRIES", "10000"))
+
+# Batch results view: emails listed per page; only the opened email's body is rendered
+BATCH_RESULTS_PAGE_SIZE = int(os.getenv("BATCH_RESULTS_PAGE_SIZE", "20"))
+
+# Background batch jobs: seconds without a worker heartbeat before a running job is requeued
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+# User accounts: SQLite database, and the legacy users.json imported into it once on first use
+USERS_DB_PATH = os.getenv("USERS_DB_PATH", "users.sqlite3")
+USERS_JSON_PATH = os.getenv("USERS_JSON_PATH", "users.json")
+
+# Saved email templates: SQLite database with a full-text index, and templates listed per page
+TEMPLATES_DB_PATH = os.getenv("TEMPLATES_DB_PATH", "templates.sqlite3")
+TEMPLATE_PAGE_SIZE = int(os.getenv("TEMPLATE_PAGE_SIZE", "20"))
+
+# Tracing: JSON lines file every finished trace is appended to (empty disables), and the
+# port serving span metrics at /metrics in the Prometheus text format (0 disables). The endpoint
+# has no authentication, so it listens on localhost unless METRICS_HOST is set (e.g. 0.0.0.0
+# for a scraper on another host).
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# LLM usage metering: SQLite store of every call's tokens, prices in USD per million tokens,
+# and the per-user daily budget (0 = unlimited) past which generations run in economy mode
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", os.path.join(CACHE_DIR, "llm_usage.sqlite3"))
+LLM_PROMPT_PRICE_PER_MTOK = float(os.getenv("LLM_PROMPT_PRICE_PER_MTOK", "0.10"))
+LLM_COMPLETION_PRICE_PER_MTOK = float(os.getenv("LLM_COMPLETION_PRICE_PER_MTOK", "0.40"))
+LLM_USER_DAILY_BUDGET = float(os.getenv("LLM_USER_DAILY_BUDGET", "0"))
+LLM_BUDGET_REFRESH_SECONDS = int(os.getenv("LLM_BUDGET_REFRESH_SECONDS", "60"))
@@ -0,0 +1,81 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from functools import lru_cache
+from utils.config import CACHE_DIR, SALES_CONTEXT_CACHE_TTL
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def news_fingerprint(news_summary, competitor_summary, competitor_company=""):
+    digest = hashlib.sha256()
+    for part in (news_summary or "", competitor_summary or "", competitor_company or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class SalesContextCache:
+    """Sales context shared by every session on this server, stored in SQLite with a TTL.
+
+    Entries are keyed by company, industry, product, a fingerprint of the news and
+    competitor summaries and the prompt version, so they stop matching as soon as the
+    underlying news changes.
+    """
+
+    def __init__(self, path, ttl=SALES_CONTEXT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sales_context (
+                    cache_key TEXT PRIMARY KEY,
+                    company TEXT NOT NULL,
+                    industry TEXT NOT NULL,
+                    product TEXT NOT NULL,
+                    news_fingerprint TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    sales_context TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_context_created ON sales_context (created_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(company, industry, product, product_description, fingerprint, prompt_version):
+        parts = (company.strip().lower(), industry.strip().lower(), product.strip(), product_description.strip(), fingerprint, prompt_version)
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, cache_key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sales_context FROM sales_context WHERE cache_key = ? AND created_at > ?",
+                (cache_key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, cache_key, company, industry, product, fingerprint, prompt_version, sales_context):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sales_context VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, company, industry, product, fingerprint, prompt_version, sales_context, time.time())
+            )
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM sales_context WHERE created_at <= ?", (time.time() - self.ttl,)).rowcount
+        if deleted:
+            logger.info(f"Purged {deleted} expired sales context entries")
+        return deleted
+
+@lru_cache(maxsize=1)
+def get_sales_context_cache():
+    cache = SalesContextCache(os.path.join(CACHE_DIR, "sales_context.sqlite3"))
+    cache.purge_expired()
+    return cache
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from functools import lru_cache
+from utils.config import CACHE_DIR, JOB_STALE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOB_DIR = os.path.join(CACHE_DIR, "jobs")
+
+class JobQueue:
+    """Local batch job queue in SQLite, shared by the Streamlit app and worker processes.
+
+    Workers claim jobs with an immediate transaction so each job runs once. A running job
+    whose heartbeat goes stale (crashed worker) is put back in the queue and resumes from
+    its run journal.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "jobs.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    input_path TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    export_path TEXT,
+                    params TEXT NOT NULL,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    errors INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, created_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, owner, source, params, total, export_suffix=".jsonl"):
+        """Copy the prospect CSV (path or binary file object) into the job directory and enqueue it."""
+        job_id = uuid.uuid4().hex[:16]
+        job_dir = os.path.join(JOB_DIR, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        input_path = os.path.join(job_dir, "input.csv")
+        if hasattr(source, "read"):
+            source.seek(0)
+            with open(input_path, "wb") as f:
+                shutil.copyfileobj(source, f)
+            source.seek(0)
+        else:
+            shutil.copyfile(source, input_path)
+        output_path = os.path.join(job_dir, "results.jsonl")
+        export_path = None if export_suffix == ".jsonl" else os.path.join(job_dir, f"emails{export_suffix}")
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, status, input_path, output_path, export_path, params, total, created_at) VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, input_path, output_path, export_path, json.dumps(params), total, time.time())
+            )
+        logger.info(f"Queued batch job {job_id} for {owner} ({total} prospects)")
+        return job_id
+
+    def claim_next(self, worker_id):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+                (now - JOB_STALE_SECONDS,)
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = COALESCE(started_at, ?), heartbeat = ? WHERE id = ?",
+                (worker_id, now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            return self._to_dict(row)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def update_progress(self, job_id, processed, errors):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET processed = ?, errors = ?, heartbeat = ? WHERE id = ?",
+                (processed, errors, time.time(), job_id)
+            )
+
+    def heartbeat(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def finish(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, heartbeat = ? WHERE id = ?",
+                (status, error, time.time(), time.time(), job_id)
+            )
+
+    def cancel(self, job_id, owner):
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND owner = ? AND status = 'queued'",
+                (time.time(), job_id, owner)
+            ).rowcount > 0
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_jobs(self, owner, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def queue_depth(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+def read_job_results(job, offset=0, limit=20):
+    """Return up to `limit` result records written so far, starting at line `offset`."""
+    records = []
+    if not os.path.exists(job["output_path"]):
+        return records
+    with open(job["output_path"], "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f):
+            if line_number < offset:
+                continue
+            if len(records) >= limit:
+                break
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # the worker is mid-write on the last line
+    return records
+
+@lru_cache(maxsize=1)
+def get_job_queue():
+    return JobQueue()
@@ -0,0 +1,149 @@
+import base64
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from utils.config import CACHE_DIR, JOURNAL_MAX_AGE_SECONDS, JOURNAL_MAX_FILES
+from utils.session_store import ArticleRecord
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIR = os.path.join(CACHE_DIR, "journals")
+
+# State written to the journal when each batch stage completes for a row
+STAGE_FIELDS = {
+    "fetch": ["prospect_articles", "competitor_articles"],
+    "summarize": ["summaries", "news_summary", "competitor_summaries", "competitor_summary"],
+    "context": ["sales_context", "email_prompts"],
+    "email": ["email_options", "email_content"],
+}
+ARTICLE_FIELDS = ("prospect_articles", "competitor_articles")
+# Key of a journaled article's compressed body (base64 of ArticleRecord.body)
+BODY_KEY = "body_blob"
+
+def file_digest(source):
+    """SHA-256 of a file path or binary file object, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    if hasattr(source, "read"):
+        source.seek(0)
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+        source.seek(0)
+        return digest.hexdigest()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def run_id_for(input_digest, base_email_data, settings):
+    """Same CSV and same generation settings give the same run id, so a rerun finds its journal."""
+    settings = {k: v for k, v in settings.items() if k != "news_api_key"}
+    payload = json.dumps([input_digest, base_email_data, settings], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+def _json_default(value):
+    # Fetched articles are compact records; they are journaled with the body still compressed.
+    if isinstance(value, ArticleRecord):
+        article = value.to_dict(body=False)
+        if value.body is not None:
+            article[BODY_KEY] = base64.b64encode(value.body).decode("ascii")
+        return article
+    return value.to_dict() if hasattr(value, "to_dict") else str(value)
+
+def _restore_article(article):
+    blob = article.pop(BODY_KEY, None)
+    record = ArticleRecord.from_article(article)
+    return dataclasses.replace(record, body=base64.b64decode(blob)) if blob is not None else record
+
+def prune_journals(directory=JOURNAL_DIR, max_age=JOURNAL_MAX_AGE_SECONDS, max_files=JOURNAL_MAX_FILES, keep=()):
+    """Delete journals older than max_age seconds, then the oldest beyond max_files; returns how many."""
+    try:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")]
+        journals = sorted(((os.path.getmtime(path), path) for path in paths if path not in keep), reverse=True)
+    except OSError:
+        return 0
+    cutoff = time.time() - max_age
+    stale = [path for position, (mtime, path) in enumerate(journals) if mtime < cutoff or position >= max(0, max_files - len(keep))]
+    removed = 0
+    for path in stale:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass  # already removed by another process
+    if removed:
+        logger.info(f"Removed {removed} old batch journals from {directory}")
+    return removed
+
+class RunJournal:
+    """Append-only JSONL log of every stage completed for every row of one batch run.
+
+    Opening a journal sweeps old ones from its directory (prune_journals); a run that
+    finishes cleanly deletes its own with discard().
+    """
+
+    def __init__(self, run_id, directory=JOURNAL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self._lock = threading.Lock()
+        self._file = None
+        prune_journals(directory, keep=(self.path,))
+
+    def load(self):
+        """Return {row_index: state} rebuilt from the journal, including `completed_stages`."""
+        states = {}
+        if not os.path.exists(self.path):
+            return states
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves at most one torn line at the end.
+                    logger.warning(f"Skipping unreadable journal line in {self.path}")
+                    continue
+                if entry["stage"] not in STAGE_FIELDS:
+                    continue
+                state = states.setdefault(entry["row"], {"completed_stages": []})
+                for field in ARTICLE_FIELDS:
+                    if entry["data"].get(field):
+                        entry["data"][field] = [_restore_article(article) for article in entry["data"][field]]
+                state.update(entry["data"])
+                if entry["stage"] not in state["completed_stages"]:
+                    state["completed_stages"].append(entry["stage"])
+        completed = sum("email" in s["completed_stages"] for s in states.values())
+        logger.info(f"Journal {self.run_id}: {completed} completed rows, {len(states) - completed} partial rows")
+        return states
+
+    def _append(self, entry):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(entry, default=_json_default) + "\n")
+            self._file.flush()
+
+    def record(self, row_index, stage, state):
+        data = {field: state.get(field) for field in STAGE_FIELDS[stage] if field in state}
+        self._append({"row": row_index, "stage": stage, "data": data, "at": time.time()})
+
+    def record_error(self, row_index, stage, error):
+        self._append({"row": row_index, "stage": "error", "failed_stage": stage, "error": str(error), "at": time.time()})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Close and delete the journal, once its run has nothing left to resume."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from utils.tracing import estimate_tokens
+from utils.metering import meter_llm_call
+from utils.scheduler import get_scheduler
+from utils.config import gemini_api_key, LLM_PROVIDER, LLM_MODEL_NAME, LLM_RECORDING_PATH, LLM_STUB_LATENCY, LLM_STUB_ERROR_RATE, LLM_STUB_SEED, LLM_STUB_CAPACITY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class LLMProviderError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        # HTTP-style status, so the scheduler can tell quota and capacity errors (429/5xx) apart
+        self.code = code
+
+def prompt_key(prompt, max_output_tokens, temperature, top_p):
+    payload = json.dumps([prompt, max_output_tokens, temperature, top_p])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMProvider:
+    """Text-in/text-out interface shared by summarization, sales context and email generation.
+
+    Providers that produce text themselves (not wrappers) meter every call's prompt and
+    completion tokens with meter_llm_call and take an "llm" slot from the outbound scheduler, whose
+    limit adapts to quota errors and latency. With `json_output`, the response is a JSON document.
+    """
+
+    name = "base"
+
+    def generate(self, prompt, max_output_tokens=1500, temperature=0.6, top_p=0.95, json_output=False):
+        raise NotImplementedError
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key, model_name=LLM_MODEL_NAME):
+        import google.generativeai as genai
+        if not api_key:
+            raise ValueError("Gemini API key not found. Please set GEMINI_API_KEY in the .env file.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, max_output_tokens=1500, temperature=0.6, top_p=0.95, json_output=False):
+        generation_config = {
+            "max_output_tokens": max_output_tokens,
+            "temperature": temperature,
+            "top_p": top_p
+        }
+        if json_output:
+            generation_config["response_mime_type"] = "application/json"
+        with get_scheduler().slot("llm", latency_class=max_output_tokens):
+            response = self.model.generate_content(prompt, generation_config=generation_config)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            meter_llm_call(self.name, usage.prompt_token_count, usage.candidates_token_count)
+        else:
+            meter_llm_call(self.name, estimate_tokens(prompt), estimate_tokens(response.text))
+        return response.text
+
+class StubProvider(LLMProvider):
+    """Offline provider: the same prompt always yields the same text, after a configurable delay.
+
+    `error_rate` injects failures from a seeded RNG, so a run with the same seed and call
+    order fails on the same calls every time. With `capacity`, calls beyond that many in flight
+    fail with a 429 like an exhausted Gemini quota. In JSON mode it answers the batched email
+    request (utils.sales_context.build_batch_email_prompt) with one email per prospect and brief.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=LLM_STUB_LATENCY, error_rate=LLM_STUB_ERROR_RATE, seed=LLM_STUB_SEED, jitter=0.0, capacity=LLM_STUB_CAPACITY):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, max_output_tokens=1500, temperature=0.6, top_p=0.95, json_output=False):
+        with self._lock:
+            fail = self._rng.random() < self.error_rate
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        # Scheduled like a remote call, so load tests see the same queueing as Gemini.
+        with get_scheduler().slot("llm", latency_class=max_output_tokens):
+            with self._lock:
+                self.in_flight += 1
+                over_capacity = self.capacity and self.in_flight > self.capacity
+                self.rejected += bool(over_capacity)
+            try:
+                if over_capacity:
+                    raise LLMProviderError("Stub provider quota exceeded", code=429)
+                if delay:
+                    time.sleep(delay)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+        if fail:
+            raise LLMProviderError("Injected stub provider failure")
+        if json_output:
+            ids = re.findall(r'"id": "([^"<]+)"', prompt)
+            briefs = len(re.findall(r"=== BRIEF \d+ ===", prompt)) or 1
+            emails = [{"id": i, "options": [self._text(f"{prompt}|{i}|{n}", max_output_tokens) for n in range(briefs)]} for i in ids]
+            text = json.dumps({"emails": emails})
+        else:
+            text = self._text(prompt, max_output_tokens)
+        meter_llm_call(self.name, estimate_tokens(prompt), estimate_tokens(text))
+        return text
+
+    @staticmethod
+    def _text(prompt, max_output_tokens):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = [w for w in prompt.split() if w.isalpha()] or ["stub"]
+        offset = int(digest[:8], 16)
+        length = min(max_output_tokens, 40 + offset % 80)
+        body = " ".join(words[(offset + i * 7) % len(words)] for i in range(length))
+        return f"[stub {digest[:12]}] {body}."
+
+class RecordingProvider(LLMProvider):
+    """Forwards to another provider and appends every prompt/response pair to a JSONL file."""
+
+    name = "record"
+
+    def __init__(self, provider, path=LLM_RECORDING_PATH):
+        self.provider = provider
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def generate(self, prompt, max_output_tokens=1500, temperature=0.6, top_p=0.95, json_output=False):
+        text = self.provider.generate(prompt, max_output_tokens=max_output_tokens, temperature=temperature, top_p=top_p, json_output=json_output)
+        record = {
+            "key": prompt_key(prompt, max_output_tokens, temperature, top_p),
+            "prompt": prompt,
+            "response": text,
+            "provider": self.provider.name,
+            "recorded_at": time.time()
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        return text
+
+class ReplayProvider(LLMProvider):
+    """Serves responses captured by RecordingProvider; unknown prompts go to `fallback` or fail."""
+
+    name = "replay"
+
+    def __init__(self, path=LLM_RECORDING_PATH, fallback=None, latency=0.0):
+        self.fallback = fallback
+        self.latency = latency
+        self.responses = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record["key"]] = record["response"]
+        logger.info(f"Loaded {len(self.responses)} recorded LLM responses from {path}")
+
+    def generate(self, prompt, max_output_tokens=1500, temperature=0.6, top_p=0.95, json_output=False):
+        if self.latency:
+            time.sleep(self.latency)
+        key = prompt_key(prompt, max_output_tokens, temperature, top_p)
+        if key in self.responses:
+            meter_llm_call(self.name, estimate_tokens(prompt), estimate_tokens(self.responses[key]))
+            return self.responses[key]
+        if self.fallback:
+            return self.fallback.generate(prompt, max_output_tokens=max_output_tokens, temperature=temperature, top_p=top_p, json_output=json_output)
+        raise LLMProviderError(f"No recorded response for prompt {key[:12]}")
+
+def get_llm_provider(name=None):
+    name = (name or LLM_PROVIDER).lower()
+    if name == "gemini":
+        return GeminiProvider(gemini_api_key)
+    if name == "stub":
+        return StubProvider()
+    if name == "record":
+        return RecordingProvider(GeminiProvider(gemini_api_key))
+    if name == "replay":
+        return ReplayProvider()
+    raise ValueError(f"Unknown LLM provider '{name}'. Choose gemini, stub, record or replay.")
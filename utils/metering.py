@@ -0,0 +1,102 @@
+import contextvars
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from utils.config import LLM_PROMPT_PRICE_PER_MTOK, LLM_COMPLETION_PRICE_PER_MTOK, LLM_USER_DAILY_BUDGET, LLM_BUDGET_REFRESH_SECONDS
+from utils.tracing import record, current_span
+from utils.usage_store import get_usage_store
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_attribution = contextvars.ContextVar("llm_attribution", default={})
+
+@contextmanager
+def attribution(**fields):
+    """Attribute LLM calls made inside the block to these fields (user, company); None values are ignored."""
+    token = _attribution.set({**_attribution.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+def current_user():
+    return _attribution.get().get("user", "")
+
+def llm_cost(prompt_tokens, completion_tokens):
+    return (prompt_tokens * LLM_PROMPT_PRICE_PER_MTOK + completion_tokens * LLM_COMPLETION_PRICE_PER_MTOK) / 1e6
+
+def _day_start(now=None):
+    day = datetime.fromtimestamp(now if now is not None else time.time(), timezone.utc).date()
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+
+class BudgetTracker:
+    """Today's (UTC) LLM spend per user, read from the usage store and kept current in memory.
+
+    Calls metered in this process are added as they happen; the total is re-read from the
+    store every `refresh_seconds` to pick up spend from other server or worker processes.
+    """
+
+    def __init__(self, daily_budget=LLM_USER_DAILY_BUDGET, refresh_seconds=LLM_BUDGET_REFRESH_SECONDS):
+        self.daily_budget = daily_budget
+        self.refresh_seconds = refresh_seconds
+        self._spent = {}
+        self._lock = threading.Lock()
+
+    def spent_today(self, user):
+        now = time.time()
+        day = _day_start(now)
+        with self._lock:
+            entry = self._spent.get(user)
+        if entry is None or entry[0] != day or now - entry[2] > self.refresh_seconds:
+            entry = (day, get_usage_store().spend_since(user, day), now)
+            with self._lock:
+                self._spent[user] = entry
+        return entry[1]
+
+    def add(self, user, cost):
+        with self._lock:
+            entry = self._spent.get(user)
+            if entry is not None and entry[0] == _day_start():
+                self._spent[user] = (entry[0], entry[1] + cost, entry[2])
+
+    def over_budget(self, user):
+        return bool(self.daily_budget > 0 and user and self.spent_today(user) >= self.daily_budget)
+
+@lru_cache(maxsize=1)
+def get_budget_tracker():
+    return BudgetTracker()
+
+def over_budget(user=None):
+    """Whether `user` (default: the attributed user) has used up today's LLM budget."""
+    try:
+        return get_budget_tracker().over_budget(user if user is not None else current_user())
+    except sqlite3.Error as e:
+        logger.error(f"Could not read LLM spend: {str(e)}")
+        return False
+
+def meter_llm_call(provider, prompt_tokens, completion_tokens):
+    """Record one LLM call's tokens on the current span and in the usage store.
+
+    The stage is the innermost tracing span (summarize_news, generate_sales_context,
+    email_variant) and the template version its `prompt_version` attribute.
+    """
+    record(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    fields = _attribution.get()
+    span = current_span()
+    cost = llm_cost(prompt_tokens, completion_tokens)
+    try:
+        get_usage_store().record(
+            fields.get("user", ""), fields.get("company", ""),
+            span.name if span else "", span.attrs.get("prompt_version", "") if span else "",
+            provider, prompt_tokens, completion_tokens, cost
+        )
+    except sqlite3.Error as e:
+        # Metering must never fail a generation.
+        logger.error(f"Could not record LLM usage: {str(e)}")
+        return
+    get_budget_tracker().add(fields.get("user", ""), cost)
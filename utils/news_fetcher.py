@@ -1,37 +1,63 @@
-import streamlit as st
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 import re
-from concurrent.futures import ThreadPoolExecutor
-from bs4 import BeautifulSoup
-from utils.config import serper_api_key, DEFAULT_KEYWORDS, TECH_SOURCES, INDUSTRY_SOURCES
+from utils.config import serper_api_key, NEWS_API_URL, SERPER_API_URL, DEFAULT_KEYWORDS, TECH_SOURCES, INDUSTRY_SOURCES
+from utils.tracing import span, traced, record, annotate
+from utils.scheduler import get_scheduler
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Days of news searched on a full fetch; merged articles older than this are dropped
+NEWS_WINDOW_DAYS = 60
+
+# requests and bs4 are imported inside the functions that use them, so importing this
+# module (and the Streamlit login page that pulls it in) stays cheap.
+
+def _traced_request(resource, method, url, company, **kwargs):
+    # `resource` is the scheduler queue (newsapi, serper); the span is named after it.
+    import requests
+    with span(f"{resource}_request", company=company) as current, get_scheduler().slot(resource):
+        response = requests.request(method, url, **kwargs)
+        current.set(status=response.status_code)
+        current.add(bytes=len(response.content))
+        if response.status_code >= 400:
+            current.error = f"HTTP {response.status_code}"
+        return response
+
+def extract_text_from_html(html):
+    """Readable article text from a page: scripts and page chrome removed, capped at 800 words."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
+        script.extract()
+    text = soup.get_text(separator=' ', strip=True)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n+', ' ', text)
+    words = text.split()
+    if len(words) > 800:
+        text = ' '.join(words[:800]) + "..."
+    return text
+
+@traced("extract_content")
 def extract_content_from_url(article_url):
+    import requests
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        response = requests.get(article_url, headers=headers, timeout=10)
+        with get_scheduler().slot("article"):
+            response = requests.get(article_url, headers=headers, timeout=10)
+        record(bytes=len(response.content))
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-            script.extract()
-        text = soup.get_text(separator=' ', strip=True)
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'\n+', ' ', text)
-        words = text.split()
-        if len(words) > 800:
-            text = ' '.join(words[:800]) + "..."
-        return text
+        return extract_text_from_html(response.content)
     except Exception as e:
         logger.error(f"Error extracting content from URL {article_url}: {str(e)}")
+        annotate(error=type(e).__name__)
         return ""
 
+@traced("calculate_relevance_score")
 def calculate_relevance_score(article_text, company_name, product_keywords, industry, is_competitor=False):
     text_lower = article_text.lower()
     company_lower = company_name.lower()
@@ -70,136 +96,232 @@ def calculate_relevance_score(article_text, company_name, product_keywords, indu
         relevance_score *= 0.7
     return relevance_score, relevance_details
 
-def fetch_news(company_name, api_key, product_keywords, industry="tech", min_articles=3, max_articles=7, competitor_company=None):
-    url = "https://newsapi.org/v2/everything"
-    headers = {
-        "User-Agent": "SmartB2BEmailGenerator/1.0",
-        "Accept": "application/json"
+def relevance_metrics(article):
+    """Flat relevance metrics for one scored article, stored with it at fetch time for the analysis views."""
+    details = article.get("relevance_details", {})
+    try:
+        recency_days = (datetime.now() - datetime.strptime(article.get("publishedAt", "")[:10], "%Y-%m-%d")).days
+    except ValueError:
+        recency_days = None
+    return {
+        "score": round(article.get("relevance_score", 0), 2),
+        "company_mentions": details.get("company_mentions", 0),
+        "keyword_matches": len(details.get("keyword_matches", [])),
+        "industry_matches": len(details.get("industry_matches", [])),
+        "recency_days": recency_days,
     }
-    if isinstance(product_keywords, str):
-        product_keywords = [k.strip() for k in product_keywords.split(",") if k.strip()]
-    keywords_to_use = product_keywords if product_keywords else DEFAULT_KEYWORDS[:5]
-    base_query = f'"{company_name}"'
+
+def _published_at(article):
+    try:
+        return datetime.strptime(article.get("publishedAt", "")[:19], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
+_RELATIVE_DATE = re.compile(r"(\d+)\s*(min|minute|hour|day|week|month|year)s?\s+ago", re.IGNORECASE)
+_RELATIVE_UNITS = {"min": timedelta(minutes=1), "minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1), "month": timedelta(days=30), "year": timedelta(days=365)}
+
+def _serper_published(date_text, now=None):
+    """Serper's "2 days ago" / "Jan 5, 2024" as a NewsAPI-style UTC timestamp, or "" if it does not parse.
+
+    Dated articles age out of the merged history; undated ones are dropped at the next merge.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    date_text = (date_text or "").strip()
+    match = _RELATIVE_DATE.search(date_text)
+    if match:
+        published = now - int(match.group(1)) * _RELATIVE_UNITS[match.group(2).lower()]
+    elif "yesterday" in date_text.lower():
+        published = now - timedelta(days=1)
+    else:
+        for date_format in ("%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%Y-%m-%d"):
+            try:
+                published = datetime.strptime(date_text, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            return ""
+    return published.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def newest_published(articles):
+    """Latest NewsAPI publishedAt among the articles, or None if there is none.
+
+    Only NewsAPI's own timestamps are used: this is the `from` of the next incremental
+    NewsAPI query, and a Serper date (estimated from "2 hours ago") could skip articles.
+    """
+    dates = [d for d in (_published_at(a) for a in articles if a.get("provider", "newsapi") == "newsapi") if d is not None]
+    return max(dates) if dates else None
+
+def _newsapi_params(company_name, api_key, keywords_to_use, page_size, since=None):
     keyword_query = " OR ".join([f'"{term}"' for term in keywords_to_use[:5]])
-    from_date = (datetime.now() - timedelta(days=60)).strftime('%Y-%m-%d')
+    if since is not None:
+        from_date = since.strftime('%Y-%m-%dT%H:%M:%S')
+    else:
+        from_date = (datetime.now() - timedelta(days=NEWS_WINDOW_DAYS)).strftime('%Y-%m-%d')
     to_date = datetime.now().strftime('%Y-%m-%d')
-    request_count = max_articles  # Fetch exactly max_articles
-    sources_to_use = TECH_SOURCES
-    if industry.lower() in INDUSTRY_SOURCES:
-        sources_to_use = TECH_SOURCES[:10] + INDUSTRY_SOURCES[industry.lower()]
-    params = {
-        "q": f'{base_query} AND ({keyword_query})',
+    return {
+        "q": f'"{company_name}" AND ({keyword_query})',
         "language": "en",
         "sortBy": "relevancy",
         "from": from_date,
         "to": to_date,
-        "pageSize": request_count,
+        "pageSize": page_size,
         "apiKey": api_key,
     }
+
+def _build_scored_articles(api_articles, company_name, keywords_to_use, industry, limit, is_competitor=False, known=None):
+    # Articles already in `known` (the previous result) are neither scraped nor scored again.
+    known_urls = {a.get("url") for a in known or () if a.get("url")}
+    article_texts = []
+    for article in [a for a in api_articles if a.get("url") not in known_urls][:limit]:
+        if not article.get("title") or not (article.get("description") or article.get("content")):
+            continue
+        article_text = {
+            "title": article.get("title", ""),
+            "description": article.get("description", ""),
+            "content": article.get("content", ""),
+            "url": article.get("url", ""),
+            "publishedAt": article.get("publishedAt", ""),
+            "source": article.get("source", {}).get("name", "Unknown Source"),
+            "company_name": company_name,
+            "is_competitor": is_competitor,
+            "provider": "newsapi"
+        }
+        if article.get("url") and len(article_text["content"]) < 500:
+            additional_content = extract_content_from_url(article.get("url"))
+            if additional_content:
+                article_text["full_content"] = additional_content
+        article_texts.append(_score_article(article_text, company_name, keywords_to_use, industry, is_competitor))
+    article_texts.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
+    return article_texts[:limit]
+
+def _score_article(article_text, company_name, keywords_to_use, industry, is_competitor=False):
+    text_for_scoring = article_text["title"] + " " + article_text.get("description", "") + " " + article_text.get("content", "")
+    score, details = calculate_relevance_score(text_for_scoring, company_name, keywords_to_use, industry, is_competitor=is_competitor)
+    article_text["relevance_score"] = score
+    article_text["relevance_details"] = details
+    article_text["relevance_metrics"] = relevance_metrics(article_text)
+    return article_text
+
+def _as_dict(article):
+    # Cached articles may be compact records (utils.session_store.ArticleRecord) rather than dicts.
+    return article.to_dict() if hasattr(article, "to_dict") else dict(article)
+
+def merge_articles(previous, fresh, company_name, keywords_to_use, industry, limit, is_competitor=False):
+    """Previously ranked articles plus newly fetched ones, deduplicated by URL and ranked best first.
+
+    Kept articles are re-scored (recency moves on) as copies, since the previous list may be
+    shared with other sessions; those that have aged out of the search window, or carry no
+    date to age by, are dropped.
+    """
+    cutoff = datetime.now() - timedelta(days=NEWS_WINDOW_DAYS)
+    merged = []
+    for article in previous:
+        published = _published_at(article)
+        if published is None or published < cutoff:
+            continue
+        if "relevance_details" in article:
+            article = _score_article(_as_dict(article), company_name, keywords_to_use, industry, is_competitor)
+        merged.append(article)
+    kept_urls = {a.get("url") for a in merged}
+    # Ties keep the previous order, so an unchanged top set stays in the same order.
+    merged.extend(a for a in fresh if a.get("url") not in kept_urls)
+    merged.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
+    return merged[:limit]
+
+def _keywords_to_use(product_keywords):
+    if isinstance(product_keywords, str):
+        product_keywords = [k.strip() for k in product_keywords.split(",") if k.strip()]
+    return product_keywords, (product_keywords if product_keywords else DEFAULT_KEYWORDS[:5])
+
+def fetch_company_news(company_name, api_key, product_keywords, industry="tech", min_articles=3, max_articles=7, previous=None):
+    """Ranked news for a company; with `previous` (the last ranked result), an incremental refresh.
+
+    The incremental form asks NewsAPI only for articles published since the newest one in
+    `previous` and merges them in, so kept articles are not fetched or scraped again.
+    """
+    import requests
+    url = NEWS_API_URL
+    headers = {
+        "User-Agent": "SmartB2BEmailGenerator/1.0",
+        "Accept": "application/json"
+    }
+    product_keywords, keywords_to_use = _keywords_to_use(product_keywords)
+    since = newest_published(previous) if previous else None
+    params = _newsapi_params(company_name, api_key, keywords_to_use, max_articles, since)  # Fetch exactly max_articles
     articles = []
-    with st.spinner(f"Fetching industry news for {company_name}..."):
-        try:
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()
+    try:
+        response = _traced_request("newsapi", "GET", url, company_name, params=params, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        # An empty incremental result just means nothing new was published.
+        if since is None and (data.get("status") != "ok" or not data.get("articles")):
+            logger.warning(f"Trying simpler query for {company_name}")
+            params["q"] = f'"{company_name}"'
+            response = _traced_request("newsapi", "GET", url, company_name, params=params, headers=headers)
             data = response.json()
-            if data.get("status") != "ok" or not data.get("articles"):
-                logger.warning(f"Trying simpler query for {company_name}")
-                params["q"] = base_query
-                response = requests.get(url, params=params, headers=headers)
-                data = response.json()
-            if data.get("status") == "ok" and data.get("articles"):
-                api_articles = data["articles"]
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    article_texts = []
-                    for article in api_articles[:max_articles]:  # Limit to max_articles
-                        if not article.get("title") or not (article.get("description") or article.get("content")):
-                            continue
-                        article_text = {
-                            "title": article.get("title", ""),
-                            "description": article.get("description", ""),
-                            "content": article.get("content", ""),
-                            "url": article.get("url", ""),
-                            "publishedAt": article.get("publishedAt", ""),
-                            "source": article.get("source", {}).get("name", "Unknown Source"),
-                            "company_name": company_name,
-                            "is_competitor": False
-                        }
-                        if article.get("url") and len(article_text["content"]) < 500:
-                            additional_content = extract_content_from_url(article.get("url"))
-                            if additional_content:
-                                article_text["full_content"] = additional_content
-                        text_for_scoring = article_text["title"] + " " + article_text.get("description", "") + " " + article_text.get("content", "")
-                        score, details = calculate_relevance_score(text_for_scoring, company_name, keywords_to_use, industry)
-                        article_text["relevance_score"] = score
-                        article_text["relevance_details"] = details
-                        article_texts.append(article_text)
-                article_texts.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-                articles = article_texts[:max_articles]
-
-            # Fetch competitor news if provided
-            competitor_articles = []
-            competitor_max = min(2, max_articles)  # Limit competitor articles to 2 or max_articles
-            if competitor_company:
-                with st.spinner(f"Fetching news for competitor {competitor_company}..."):
-                    params["q"] = f'"{competitor_company}" AND ({keyword_query})'
-                    params["pageSize"] = competitor_max
-                    try:
-                        response = requests.get(url, params=params, headers=headers)
-                        response.raise_for_status()
-                        data = response.json()
-                        if data.get("status") == "ok" and data.get("articles"):
-                            api_articles = data["articles"]
-                            with ThreadPoolExecutor(max_workers=5) as executor:
-                                for article in api_articles[:competitor_max]:
-                                    if not article.get("title") or not (article.get("description") or article.get("content")):
-                                        continue
-                                    article_text = {
-                                        "title": article.get("title", ""),
-                                        "description": article.get("description", ""),
-                                        "content": article.get("content", ""),
-                                        "url": article.get("url", ""),
-                                        "publishedAt": article.get("publishedAt", ""),
-                                        "source": article.get("source", {}).get("name", "Unknown Source"),
-                                        "company_name": competitor_company,
-                                        "is_competitor": True
-                                    }
-                                    if article.get("url") and len(article_text["content"]) < 500:
-                                        additional_content = extract_content_from_url(article.get("url"))
-                                        if additional_content:
-                                            article_text["full_content"] = additional_content
-                                    text_for_scoring = article_text["title"] + " " + article_text.get("description", "") + " " + article_text.get("content", "")
-                                    score, details = calculate_relevance_score(text_for_scoring, competitor_company, keywords_to_use, industry, is_competitor=True)
-                                    article_text["relevance_score"] = score
-                                    article_text["relevance_details"] = details
-                                    competitor_articles.append(article_text)
-                            competitor_articles.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-                            competitor_articles = competitor_articles[:competitor_max]
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Failed to fetch competitor news for {competitor_company}: {str(e)}")
-
-            articles.extend(competitor_articles)
-
-            if len([a for a in articles if not a["is_competitor"]]) < min_articles and serper_api_key:
-                backup_articles = search_google_news(company_name, product_keywords, industry, serper_api_key)
-                seen_urls = {a.get("url") for a in articles}
-                for article in backup_articles[:max_articles - len([a for a in articles if not a["is_competitor"]])]:
-                    if article.get("url") not in seen_urls:
-                        article["is_competitor"] = False
-                        articles.append(article)
-                        seen_urls.add(article.get("url"))
-            if len([a for a in articles if not a["is_competitor"]]) < min_articles:
-                logger.warning(f"Only found {len([a for a in articles if not a['is_competitor']])} relevant articles for {company_name}")
-            return articles
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API Request Error: {str(e)}")
-            if serper_api_key:
-                return search_google_news(company_name, product_keywords, industry, serper_api_key)
-            return []
-
-def search_google_news(company_name, product_keywords, industry, api_key):
+        if data.get("status") == "ok" and data.get("articles"):
+            articles = _build_scored_articles(data["articles"], company_name, keywords_to_use, industry, max_articles, known=previous)
+        if since is not None:
+            articles = merge_articles(previous, articles, company_name, keywords_to_use, industry, max_articles)
+
+        if len(articles) < min_articles and serper_api_key:
+            seen_urls = {a.get("url") for a in articles}
+            # Articles already kept from `previous` are not scraped again.
+            known_urls = seen_urls | {a.get("url") for a in previous or ()}
+            backup_articles = search_google_news(company_name, product_keywords, industry, serper_api_key, known_urls)
+            for article in backup_articles[:max_articles - len(articles)]:
+                if article.get("url") not in seen_urls:
+                    article["is_competitor"] = False
+                    articles.append(article)
+                    seen_urls.add(article.get("url"))
+        if len(articles) < min_articles:
+            logger.warning(f"Only found {len(articles)} relevant articles for {company_name}")
+        return articles
+    except requests.exceptions.RequestException as e:
+        logger.error(f"API Request Error: {str(e)}")
+        if since is not None:
+            return merge_articles(previous, [], company_name, keywords_to_use, industry, max_articles)
+        if serper_api_key:
+            return search_google_news(company_name, product_keywords, industry, serper_api_key)
+        return []
+
+def fetch_competitor_news(competitor_company, api_key, product_keywords, industry="tech", max_articles=7, previous=None):
+    if not competitor_company:
+        return []
+    import requests
+    url = NEWS_API_URL
+    headers = {
+        "User-Agent": "SmartB2BEmailGenerator/1.0",
+        "Accept": "application/json"
+    }
+    _, keywords_to_use = _keywords_to_use(product_keywords)
+    competitor_max = min(2, max_articles)  # Limit competitor articles to 2 or max_articles
+    since = newest_published(previous) if previous else None
+    params = _newsapi_params(competitor_company, api_key, keywords_to_use, competitor_max, since)
+    articles = []
+    try:
+        response = _traced_request("newsapi", "GET", url, competitor_company, params=params, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") == "ok" and data.get("articles"):
+            articles = _build_scored_articles(data["articles"], competitor_company, keywords_to_use, industry, competitor_max, is_competitor=True, known=previous)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to fetch competitor news for {competitor_company}: {str(e)}")
+    if since is not None:
+        return merge_articles(previous, articles, competitor_company, keywords_to_use, industry, competitor_max, is_competitor=True)
+    return articles
+
+def fetch_news(company_name, api_key, product_keywords, industry="tech", min_articles=3, max_articles=7, competitor_company=None):
+    articles = fetch_company_news(company_name, api_key, product_keywords, industry, min_articles, max_articles)
+    articles.extend(fetch_competitor_news(competitor_company, api_key, product_keywords, industry, max_articles))
+    return articles
+
+def search_google_news(company_name, product_keywords, industry, api_key, known_urls=()):
+    """Google News results via Serper, scraped and scored; links in `known_urls` are skipped before scraping."""
     if not api_key:
         return []
-    url = "https://google.serper.dev/search"
+    url = SERPER_API_URL
     if isinstance(product_keywords, str):
         product_keywords = [k.strip() for k in product_keywords.split(",") if k.strip()]
     keywords_to_use = product_keywords if product_keywords else DEFAULT_KEYWORDS[:3]
@@ -215,35 +337,38 @@ def search_google_news(company_name, product_keywords, industry, api_key):
         "num": 10,
         "type": "news"
     })
-    with st.spinner(f"Searching alternate sources for {company_name} news..."):
-        try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status()
-            data = response.json()
-            articles = []
-            if "news" in data:
-                for item in data["news"]:
-                    article = {
-                        "title": item.get("title", ""),
-                        "description": item.get("snippet", ""),
-                        "content": item.get("snippet", ""),
-                        "url": item.get("link", ""),
-                        "publishedAt": item.get("date", ""),
-                        "source": item.get("source", "Google Search"),
-                        "company_name": company_name,
-                        "is_competitor": False
-                    }
-                    if article["url"]:
-                        additional_content = extract_content_from_url(article["url"])
-                        if additional_content:
-                            article["full_content"] = additional_content
-                    text_for_scoring = article["title"] + " " + article.get("description", "") + " " + article.get("content", "")
-                    score, details = calculate_relevance_score(text_for_scoring, company_name, product_keywords, industry)
-                    article["relevance_score"] = score
-                    article["relevance_details"] = details
-                    articles.append(article)
-            articles.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-            return articles[:5]
-        except Exception as e:
-            logger.error(f"Google Search API Error: {str(e)}")
-            return []
\ No newline at end of file
+    try:
+        response = _traced_request("serper", "POST", url, company_name, headers=headers, data=payload)
+        response.raise_for_status()
+        data = response.json()
+        articles = []
+        if "news" in data:
+            for item in data["news"]:
+                if item.get("link") and item.get("link") in known_urls:
+                    continue
+                article = {
+                    "title": item.get("title", ""),
+                    "description": item.get("snippet", ""),
+                    "content": item.get("snippet", ""),
+                    "url": item.get("link", ""),
+                    "publishedAt": _serper_published(item.get("date", "")),
+                    "source": item.get("source", "Google Search"),
+                    "company_name": company_name,
+                    "is_competitor": False,
+                    "provider": "serper"
+                }
+                if article["url"]:
+                    additional_content = extract_content_from_url(article["url"])
+                    if additional_content:
+                        article["full_content"] = additional_content
+                text_for_scoring = article["title"] + " " + article.get("description", "") + " " + article.get("content", "")
+                score, details = calculate_relevance_score(text_for_scoring, company_name, product_keywords, industry)
+                article["relevance_score"] = score
+                article["relevance_details"] = details
+                article["relevance_metrics"] = relevance_metrics(article)
+                articles.append(article)
+        articles.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
+        return articles[:5]
+    except Exception as e:
+        logger.error(f"Google Search API Error: {str(e)}")
+        return []
\ No newline at end of file
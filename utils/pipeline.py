@@ -0,0 +1,523 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Annotated
+from typing_extensions import TypedDict
+from utils.news_fetcher import fetch_company_news, fetch_competitor_news
+from utils.summarizer import summarize_news, extractive_summary, SUMMARY_PROMPT_VERSION
+from utils.sales_context import generate_sales_context, build_email_prompts, generate_email_option, invalid_email_type_message, generate_email_batches
+from utils.session_store import ArticleRecord
+from utils.staged_executor import Stage, StagedPipeline, StageFailure
+from utils.tracing import span, trace, bind
+from utils.metering import attribution, over_budget
+from utils.scheduler import priority, BATCH
+from utils.config import BATCH_STAGE_CONCURRENCY, BATCH_QUEUE_SIZE, EMAIL_BATCH_MAX_PROSPECTS, EMAIL_BATCH_LINGER_SECONDS, SHARED_NEWS_CACHE_ENTRIES, SHARED_NEWS_CACHE_BUCKET_SECONDS, NEWS_HISTORY_ENTRIES, ARTICLE_SUMMARY_CACHE_ENTRIES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+EMAIL_OPTION_COUNT = 3
+EMAIL_OPTION_NODES = tuple(f"email_option_{number}" for number in range(1, EMAIL_OPTION_COUNT + 1))
+# Nodes each stage of a staged CSV batch runs ("assemble" finishes rows whose options came from a batched call)
+BATCH_STAGE_NODES = {
+    "fetch": ("fetch_prospect_news", "fetch_competitor_news"),
+    "summarize": ("summarize_prospect_news", "summarize_competitor_news"),
+    "context": ("generate_sales_context", "build_email_prompts"),
+    "email": (*EMAIL_OPTION_NODES, "assemble_email"),
+    "assemble": ("assemble_email",),
+}
+SUMMARY_WORKERS = 4
+# Key a node's update sets to True when part of it is an error fallback (e.g. a summary that is
+# just the title after an LLM 429); such updates are not stored in the node caches.
+DEGRADED = "degraded"
+# Cached nodes whose output differs in economy mode (over the user's LLM budget)
+ECONOMY_CACHED_NODES = ("summarize_prospect_news", "summarize_competitor_news")
+
+def merge_dicts(left, right):
+    return {**(left or {}), **(right or {})}
+
+class PipelineState(TypedDict, total=False):
+    row: dict
+    row_index: int
+    completed_stages: list
+    email_data: dict
+    settings: dict
+    prospect_articles: list
+    competitor_articles: list
+    summaries: list
+    competitor_summaries: list
+    news_summary: str
+    competitor_summary: str
+    sales_context: str
+    email_prompts: list
+    email_options: Annotated[dict, merge_dicts]
+    email_content: str
+    timings: Annotated[dict, merge_dicts]
+    cache_hits: Annotated[dict, merge_dicts]
+
+def fingerprint(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class NodeCache:
+    """Thread-safe cache of pipeline node outputs, keyed by (node, company, input fingerprint).
+
+    With `max_entries`, the least recently used entries are evicted so long batch runs stay bounded;
+    with `ttl` (seconds), entries older than that are treated as missing.
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._guard = threading.Lock()
+
+    def key_lock(self, key):
+        # One lock per key so concurrent runs for the same company compute a node once.
+        with self._guard:
+            if self.max_entries and len(self._key_locks) > 4 * self.max_entries:
+                self._key_locks = {k: lock for k, lock in self._key_locks.items() if lock.locked()}
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._guard:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *companies):
+        companies = {c for c in companies if c}
+        with self._guard:
+            for key in [k for k in self._entries if k[1] in companies]:
+                del self._entries[key]
+
+@lru_cache(maxsize=1)
+def get_shared_news_cache():
+    """Fetch and summarize outputs shared by every session and batch in this process.
+
+    Keys carry a time bucket, so a popular company is fetched at most once per bucket per
+    server; entries expire with the bucket. Returns None when disabled (0 entries).
+    """
+    if SHARED_NEWS_CACHE_ENTRIES <= 0:
+        return None
+    return NodeCache(max_entries=SHARED_NEWS_CACHE_ENTRIES, ttl=SHARED_NEWS_CACHE_BUCKET_SECONDS)
+
+@lru_cache(maxsize=1)
+def get_news_history():
+    """The last ranked fetch result per fetch key, kept past cache expiry and news refreshes.
+
+    A fetch that misses the node caches passes it to the news fetcher, which then asks
+    NewsAPI only for articles newer than those and merges them in. None when disabled.
+    """
+    if NEWS_HISTORY_ENTRIES <= 0:
+        return None
+    return NodeCache(max_entries=NEWS_HISTORY_ENTRIES)
+
+@lru_cache(maxsize=1)
+def get_article_summary_cache():
+    """LLM summaries per article, so a changed article set only summarizes its new articles."""
+    if ARTICLE_SUMMARY_CACHE_ENTRIES <= 0:
+        return None
+    return NodeCache(max_entries=ARTICLE_SUMMARY_CACHE_ENTRIES)
+
+def time_bucket(now=None):
+    return int((now if now is not None else time.time()) // SHARED_NEWS_CACHE_BUCKET_SECONDS)
+
+def _normalized_keywords(keywords):
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    # Order is kept: only the first few keywords make it into the search query.
+    return list(dict.fromkeys(k.strip().lower() for k in keywords or [] if k.strip()))
+
+def _article_fingerprint(articles):
+    return fingerprint([(a.get("url", ""), a.get("title", "")) for a in articles])
+
+def _fetch_prospect_key(state):
+    settings = state["settings"]
+    company = state["email_data"]["prospect_company"]
+    return ("fetch_prospect_news", company, fingerprint(_normalized_keywords(settings.get("product_keywords")), (settings.get("industry") or "").lower(), settings.get("min_articles"), settings.get("max_articles")))
+
+def _fetch_competitor_key(state):
+    settings = state["settings"]
+    competitor = state["email_data"].get("competitor_company") or ""
+    return ("fetch_competitor_news", competitor, fingerprint(_normalized_keywords(settings.get("product_keywords")), (settings.get("industry") or "").lower(), settings.get("max_articles")))
+
+def _summarize_prospect_key(state):
+    company = state["email_data"]["prospect_company"]
+    return ("summarize_prospect_news", company, _article_fingerprint(state.get("prospect_articles", [])))
+
+def _summarize_competitor_key(state):
+    competitor = state["email_data"].get("competitor_company") or ""
+    return ("summarize_competitor_news", competitor, _article_fingerprint(state.get("competitor_articles", [])))
+
+def _cached(caches, compute):
+    """Look the value up in each (cache, key) in turn, computing it once under the key locks on a miss.
+
+    A computed update marked DEGRADED (part of it is an error fallback) is returned but not stored.
+    """
+    if not caches:
+        return compute(), False
+    (cache, key), rest = caches[0], caches[1:]
+    with cache.key_lock(key):
+        value = cache.get(key)
+        if value is not None:
+            return value, True
+        value, hit = _cached(rest, compute)
+        if not value.get(DEGRADED):
+            cache.set(key, value)
+        return value, hit
+
+def _node(name, fn, cache_key=None):
+    def run(state, config):
+        configurable = config.get("configurable", {})
+        started = time.perf_counter()
+        with attribution(company=state["email_data"].get("prospect_company")):
+            # Over the user's daily LLM budget: economy mode, with its own summary cache entries.
+            economy = over_budget()
+            if economy:
+                configurable = {**configurable, "economy": True}
+            caches = []
+            if cache_key is not None:
+                key = (*cache_key(state), "economy") if economy and name in ECONOMY_CACHED_NODES else cache_key(state)
+                if configurable.get("node_cache") is not None:
+                    caches.append((configurable["node_cache"], key))
+                if configurable.get("shared_cache") is not None:
+                    caches.append((configurable["shared_cache"], (*key, time_bucket())))
+            with span(f"node.{name}") as current:
+                update, hit = _cached(caches, lambda: fn(state, configurable))
+                degraded = update.get(DEGRADED, False)
+                if DEGRADED in update:
+                    update = {key: value for key, value in update.items() if key != DEGRADED}  # cached values are shared
+                current.set(cached=hit, economy=economy, degraded=degraded)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Pipeline node {name} finished in {elapsed:.2f}s{' (cached)' if hit else ''}")
+        return {**update, "timings": {name: elapsed}, "cache_hits": {name: hit}}
+    return run
+
+def _summarize_article(article, model):
+    cache = get_article_summary_cache()
+    if cache is None:
+        return summarize_news(article, model)
+    key = ("article_summary", article.get("company_name", ""), fingerprint(article.get("url", ""), article.get("title", ""), SUMMARY_PROMPT_VERSION))
+    with cache.key_lock(key):
+        summary = cache.get(key)
+        if summary is None:
+            summary = summarize_news(article, model)
+            # summarize_news falls back to the title on errors; those are retried next time.
+            if summary and summary != article.get("title"):
+                cache.set(key, summary)
+        return summary
+
+def _summarize_articles(articles, model, economy=False):
+    """(summaries, degraded): degraded when any LLM summary fell back to the article title."""
+    if not articles:
+        return [], False
+    if economy:
+        return [extractive_summary(article) for article in articles], False
+    with ThreadPoolExecutor(max_workers=min(SUMMARY_WORKERS, len(articles))) as executor:
+        summaries = list(executor.map(bind(lambda article: _summarize_article(article, model)), articles))
+    degraded = any(summary == article.get("title") for summary, article in zip(summaries, articles))
+    return [summary for summary in summaries if summary], degraded
+
+def _fetch_with_history(key, fetch):
+    # The previous result for this key turns the fetch into an incremental refresh.
+    history = get_news_history()
+    previous = history.get(key) if history is not None else None
+    # Compact records from here on: every cache and session holding them keeps bodies compressed.
+    articles = [ArticleRecord.from_article(article) for article in fetch(previous)]
+    if history is not None:
+        history.set(key, articles)
+    return articles
+
+def fetch_prospect_news_node(state, configurable):
+    settings = state["settings"]
+    company = state["email_data"]["prospect_company"]
+    articles = _fetch_with_history(_fetch_prospect_key(state), lambda previous: fetch_company_news(
+        company,
+        settings.get("news_api_key"),
+        settings.get("product_keywords", []),
+        settings.get("industry", "tech"),
+        settings.get("min_articles", 3),
+        settings.get("max_articles", 7),
+        previous=previous
+    ))
+    return {"prospect_articles": articles[:settings.get("max_articles", 7)]}
+
+def fetch_competitor_news_node(state, configurable):
+    settings = state["settings"]
+    articles = _fetch_with_history(_fetch_competitor_key(state), lambda previous: fetch_competitor_news(
+        state["email_data"].get("competitor_company"),
+        settings.get("news_api_key"),
+        settings.get("product_keywords", []),
+        settings.get("industry", "tech"),
+        settings.get("max_articles", 7),
+        previous=previous
+    ))
+    return {"competitor_articles": articles[:min(2, settings.get("max_articles", 7))]}
+
+def summarize_prospect_news_node(state, configurable):
+    company = state["email_data"]["prospect_company"]
+    summaries, degraded = _summarize_articles(state.get("prospect_articles", []), configurable.get("model"), configurable.get("economy"))
+    news_summary = "\n\n".join(summaries[:3]) if summaries else f"No specific recent news found for {company}."
+    return {"summaries": summaries, "news_summary": news_summary, DEGRADED: degraded}
+
+def summarize_competitor_news_node(state, configurable):
+    competitor_summaries, degraded = _summarize_articles(state.get("competitor_articles", []), configurable.get("model"), configurable.get("economy"))
+    competitor_summary = "\n\n".join(competitor_summaries[:2]) if competitor_summaries else ""
+    return {"competitor_summaries": competitor_summaries, "competitor_summary": competitor_summary, DEGRADED: degraded}
+
+def sales_context_node(state, configurable):
+    company = state["email_data"]["prospect_company"]
+    competitor = state["email_data"].get("competitor_company")
+    if not state.get("prospect_articles") and not state.get("competitor_summaries"):
+        logger.info(f"No news found for {company} or {competitor}. Falling back to industry trends.")
+    elif not state.get("prospect_articles"):
+        logger.info(f"No news found for {company}. Using competitor news for {competitor}.")
+    if not state["settings"].get("generate_context", True) or configurable.get("economy"):
+        return {"sales_context": ""}
+    sales_context = generate_sales_context(state["email_data"], state.get("news_summary", ""), state.get("competitor_summary", ""), configurable.get("graph"))
+    return {"sales_context": sales_context}
+
+def email_prompts_node(state, configurable):
+    prompts = build_email_prompts(state["email_data"], state.get("news_summary", ""), state.get("sales_context", ""), state.get("competitor_summary", ""))
+    return {"email_prompts": prompts}
+
+def email_option_node(option_number):
+    def run(state, configurable):
+        prompts = state.get("email_prompts", [])
+        if option_number > len(prompts) or (option_number > 1 and configurable.get("economy")):
+            return {}
+        email_type = state["email_data"].get("email_type", "initial pitch")
+        option = generate_email_option(prompts[option_number - 1], option_number, email_type, configurable.get("graph"))
+        return {"email_options": {option_number: option}}
+    return run
+
+def assemble_email_node(state, configurable):
+    options = state.get("email_options", {})
+    if not options:
+        return {"email_content": invalid_email_type_message(state["email_data"].get("email_type", "initial pitch"))}
+    return {"email_content": "\n".join(options[i] for i in sorted(options))}
+
+def _pipeline_nodes():
+    """(name, fn, cache_key, upstream nodes) for every node: the single definition of the pipeline's wiring."""
+    return [
+        ("fetch_prospect_news", fetch_prospect_news_node, _fetch_prospect_key, ()),
+        ("fetch_competitor_news", fetch_competitor_news_node, _fetch_competitor_key, ()),
+        ("summarize_prospect_news", summarize_prospect_news_node, _summarize_prospect_key, ("fetch_prospect_news",)),
+        ("summarize_competitor_news", summarize_competitor_news_node, _summarize_competitor_key, ("fetch_competitor_news",)),
+        ("generate_sales_context", sales_context_node, None, ("summarize_prospect_news", "summarize_competitor_news")),
+        ("build_email_prompts", email_prompts_node, None, ("generate_sales_context",)),
+        *[(name, email_option_node(number), None, ("build_email_prompts",)) for number, name in enumerate(EMAIL_OPTION_NODES, 1)],
+        ("assemble_email", assemble_email_node, None, EMAIL_OPTION_NODES),
+    ]
+
+def _build_graph(names):
+    """Compile the nodes in `names` with the edges between them; nodes with no upstream in the set start the graph."""
+    from langgraph.graph import StateGraph, START, END  # deferred: slow import, only needed to run the graph
+    builder = StateGraph(PipelineState)
+    nodes = [node for node in _pipeline_nodes() if node[0] in names]
+    has_downstream = set()
+    for name, fn, cache_key, upstream in nodes:
+        builder.add_node(name, _node(name, fn, cache_key))
+        upstream = [node for node in upstream if node in names]
+        has_downstream.update(upstream)
+        if not upstream:
+            builder.add_edge(START, name)
+        else:
+            builder.add_edge(upstream if len(upstream) > 1 else upstream[0], name)
+    for name, _, _, _ in nodes:
+        if name not in has_downstream:
+            builder.add_edge(name, END)
+    return builder.compile()
+
+@lru_cache(maxsize=1)
+def get_pipeline():
+    return _build_graph([node[0] for node in _pipeline_nodes()])
+
+@lru_cache(maxsize=None)
+def get_stage_graph(stage):
+    """The nodes of one batch stage (BATCH_STAGE_NODES) as a graph wired like get_pipeline()."""
+    return _build_graph(BATCH_STAGE_NODES[stage])
+
+def run_pipeline(email_data, settings, model, graph, node_cache=None, on_step=None):
+    """Run fetch -> summarize -> context -> email for one prospect and return the final pipeline state."""
+    config = {"configurable": {"model": model, "graph": graph, "node_cache": node_cache, "shared_cache": get_shared_news_cache()}}
+    final_state = {}
+    for mode, chunk in get_pipeline().stream({"email_data": email_data, "settings": settings}, config=config, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+        elif on_step:
+            for node_name, update in chunk.items():
+                on_step(node_name, update)
+    return final_state
+
+def prospect_email_data(base_email_data, row):
+    email_data = base_email_data.copy()
+    email_data.update({
+        "prospect_name": row['prospect_name'],
+        "prospect_title": row['prospect_title'],
+        "prospect_email": row['prospect_email'],
+        "prospect_company": row['prospect_company'],
+        "company_name": row['prospect_company']
+    })
+    return email_data
+
+def _run_stage_graph(stage, state, configurable):
+    # Graph output holds only PipelineState keys; row bookkeeping such as trace_id is kept from the input.
+    return {**state, **get_stage_graph(stage).invoke(state, config={"configurable": configurable})}
+
+def _resumable(stage_name, fn, journal):
+    def run(state):
+        if stage_name in state.get("completed_stages", ()):
+            return state
+        # One trace per row and stage (scheduled as batch work); the shared trace_id ties a row's stages together.
+        with trace(f"batch_{stage_name}", trace_id=state.setdefault("trace_id", uuid.uuid4().hex), row_index=state["row_index"]), priority(BATCH):
+            state = fn(state)
+        state["completed_stages"] = [*state.get("completed_stages", []), stage_name]
+        if journal is not None:
+            journal.record(state["row_index"], stage_name, state)
+        return state
+    return run
+
+def _resumable_group(stage_name, fn, journal):
+    # _resumable for a batched stage: fn gets the rows still to run and returns a result or an exception per row.
+    def run(states):
+        todo = [state for state in states if stage_name not in state.get("completed_stages", ())]
+        if not todo:
+            return states
+        with trace(f"batch_{stage_name}", row_indices=[state["row_index"] for state in todo]), priority(BATCH):
+            results = dict(zip(map(id, todo), fn(todo)))
+        for result in results.values():
+            if not isinstance(result, Exception):
+                result["completed_stages"] = [*result.get("completed_stages", []), stage_name]
+                if journal is not None:
+                    journal.record(result["row_index"], stage_name, result)
+        return [results.get(id(state), state) for state in states]
+    return run
+
+def _email_batch_key(state):
+    # Rows share a batched email call only with rows at the same company and with the same context.
+    if "email" in state.get("completed_stages", ()):
+        return None
+    company = (state["email_data"].get("prospect_company") or "").strip().lower()
+    return company, fingerprint(state.get("news_summary"), state.get("sales_context"), state.get("competitor_summary"))
+
+def batch_stages(model, graph, node_cache, stage_concurrency=None, journal=None, email_batch_size=EMAIL_BATCH_MAX_PROSPECTS):
+    """The pipeline regrouped into four cross-prospect stages for StagedPipeline.
+
+    Stages already listed in a row's `completed_stages` (restored from a journal) are skipped.
+    With email_batch_size > 1, rows at the same company get their emails from shared LLM calls.
+    """
+    stage_concurrency = {**BATCH_STAGE_CONCURRENCY, **(stage_concurrency or {})}
+    configurable = {"model": model, "graph": graph, "node_cache": node_cache, "shared_cache": get_shared_news_cache()}
+
+    def fetch(state):
+        return _run_stage_graph("fetch", state, configurable)
+
+    def summarize(state):
+        return _run_stage_graph("summarize", state, configurable)
+
+    def context(state):
+        return _run_stage_graph("context", state, configurable)
+
+    def email(state):
+        return _run_stage_graph("email", state, configurable)
+
+    def email_group(states):
+        # One company's rows: emails from batched calls where they parse, per-row email() otherwise.
+        emails = [None] * len(states)
+        elapsed = 0.0
+        with attribution(company=states[0]["email_data"].get("prospect_company")):
+            if len(states) > 1 and not over_budget():
+                started = time.perf_counter()
+                first = states[0]
+                emails = generate_email_batches([state["email_data"] for state in states], first.get("news_summary", ""), first.get("sales_context", ""), first.get("competitor_summary", ""), model)
+                elapsed = time.perf_counter() - started
+        results = []
+        for state, options in zip(states, emails):
+            try:
+                if options is None:
+                    results.append(email(state))
+                    continue
+                state["email_options"] = merge_dicts(state.get("email_options"), options)
+                state["timings"] = merge_dicts(state.get("timings"), {"email_batch": elapsed})
+                state["cache_hits"] = merge_dicts(state.get("cache_hits"), {"email_batch": False})
+                results.append(_run_stage_graph("assemble", state, configurable))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    if email_batch_size > 1:
+        email_stage = Stage("email", _resumable_group("email", email_group, journal), stage_concurrency["email"], email_batch_size, _email_batch_key, EMAIL_BATCH_LINGER_SECONDS)
+    else:
+        email_stage = Stage("email", _resumable("email", email, journal), stage_concurrency["email"])
+    return [
+        Stage("fetch", _resumable("fetch", fetch, journal), stage_concurrency["fetch"]),
+        Stage("summarize", _resumable("summarize", summarize, journal), stage_concurrency["summarize"]),
+        Stage("context", _resumable("context", context, journal), stage_concurrency["context"]),
+        email_stage,
+    ]
+
+def iter_staged_batch(rows, base_email_data, settings, model, graph, node_cache=None, stage_concurrency=None, queue_size=BATCH_QUEUE_SIZE, journal=None, email_batch_size=EMAIL_BATCH_MAX_PROSPECTS):
+    """Pipeline prospects across stages so one row's fetch overlaps another's summarization and email.
+
+    `rows` may be any iterable; yields (index, row, result) in completion order. With a
+    RunJournal, every completed stage is logged and a rerun resumes each row where it stopped;
+    the journal is deleted once every row has succeeded.
+    Rows at the same company that reach the email stage together share batched email calls.
+    """
+    node_cache = node_cache if node_cache is not None else NodeCache()
+    resumed = journal.load() if journal is not None else {}
+    staged = StagedPipeline(batch_stages(model, graph, node_cache, stage_concurrency, journal, email_batch_size), queue_size)
+    states = (
+        {**resumed.get(index, {}), "row": row, "row_index": index, "email_data": prospect_email_data(base_email_data, row), "settings": settings}
+        for index, row in enumerate(rows)
+    )
+    failed = 0
+    finished = False
+    try:
+        for index, result in staged.run(states):
+            if isinstance(result, StageFailure):
+                company = result.item["row"]['prospect_company']
+                error = f"Error generating email for {company} during {result.stage}: {str(result.error)}"
+                if journal is not None:
+                    journal.record_error(index, result.stage, result.error)
+                result = {**result.item, "email_content": error, "error": error}
+                failed += 1
+            yield index, result["row"], result
+        finished = True
+    finally:
+        if journal is not None:
+            # A clean run leaves nothing to resume; with failed rows, a rerun retries just those.
+            if finished and not failed:
+                journal.discard()
+            else:
+                journal.close()
+    logger.info("Batch stage busy time: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in staged.busy_seconds.items()))
+
+def run_staged_batch(rows, base_email_data, settings, model, graph, node_cache=None, stage_concurrency=None, queue_size=BATCH_QUEUE_SIZE, on_result=None, journal=None, email_batch_size=EMAIL_BATCH_MAX_PROSPECTS):
+    results = [None] * len(rows)
+    for index, row, result in iter_staged_batch(rows, base_email_data, settings, model, graph, node_cache, stage_concurrency, queue_size, journal, email_batch_size):
+        results[index] = result
+        if on_result:
+            on_result(index, row, result)
+    return results
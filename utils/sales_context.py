@@ -1,41 +1,47 @@
-import streamlit as st
-import google.generativeai as genai
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
+import json
 from typing import Annotated
 from typing_extensions import TypedDict
-from utils.config import gemini_api_key
+from utils.config import gemini_api_key, EMAIL_BATCH_MAX_PROSPECTS, EMAIL_BATCH_MAX_INPUT_TOKENS, EMAIL_BATCH_MAX_OUTPUT_TOKENS, EMAIL_BATCH_TOKENS_PER_EMAIL
+from utils.context_cache import get_sales_context_cache, news_fingerprint
+from utils.tracing import traced, span, annotate, estimate_tokens
+
+# Bump whenever the sales context prompt changes so cached contexts from the old prompt stop matching.
+SALES_CONTEXT_PROMPT_VERSION = "1"
+# Likewise for the email prompts in build_email_prompts; metered usage is attributed to it.
+EMAIL_PROMPT_VERSION = "1"
+# The batched email prompt wraps the same briefs; bump it when the wrapper or the JSON format changes.
+EMAIL_BATCH_PROMPT_VERSION = "1"
+PROSPECT_NAME_PLACEHOLDER = "[PROSPECT NAME]"
+PROSPECT_TITLE_PLACEHOLDER = "[PROSPECT TITLE]"
+CHATBOT_ERROR_RESPONSE = "Error generating response. Please try again."
+
+def setup_graph(llm):
+    # langgraph is slow to import; load it only when a graph is actually built.
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.graph.message import add_messages
+
+    class State(TypedDict):
+        messages: Annotated[list, add_messages]
 
-class State(TypedDict):
-    messages: Annotated[list, add_messages]
-
-def setup_graph(api_key):
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash-001')
     graph_builder = StateGraph(State)
     
     def chatbot(state: State):
         prompt = state['messages'][-1].content
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "max_output_tokens": 1500,
-                    "temperature": 0.6,
-                    "top_p": 0.95
-                }
-            )
-            return {"messages": [("assistant", response.text)]}
+            response = llm.generate(prompt, max_output_tokens=1500, temperature=0.6, top_p=0.95)
+            return {"messages": [("assistant", response)]}
         except Exception as e:
-            print(f"Error with Gemini API: {str(e)}")
-            return {"messages": [("assistant", "Error generating response. Please try again.")]}
+            print(f"Error with {llm.name} LLM provider: {str(e)}")
+            annotate(error=type(e).__name__)
+            return {"messages": [("assistant", CHATBOT_ERROR_RESPONSE)]}
 
     graph_builder.add_node("chatbot", chatbot)
     graph_builder.add_edge(START, "chatbot")
     graph_builder.add_edge("chatbot", END)
     return graph_builder.compile()
 
-def generate_sales_context(company_data, news_summary, competitor_summary, graph):
+@traced("generate_sales_context", prompt_version=SALES_CONTEXT_PROMPT_VERSION)
+def generate_sales_context(company_data, news_summary, competitor_summary, graph, use_cache=True):
     prospect_company = company_data.get("prospect_company", "")
     company_name = company_data.get("company_name", prospect_company)
     product_name = company_data.get("product_name", "")
@@ -68,15 +74,26 @@ def generate_sales_context(company_data, news_summary, competitor_summary, graph
 
     Ensure the analysis is concise, professional, and avoids generic statements. Use specific examples or metrics where possible. If no news is available for {company_name}, base the analysis on competitor news (if provided) or common {industry} challenges.
     """
-    with st.spinner("Generating sales context..."):
-        try:
-            response = graph.invoke({"messages": [("user", prompt)]})
-            if response and "messages" in response and len(response["messages"]) > 0:
-                return response["messages"][-1].content
-            return f"No specific context generated for {company_name}. Using industry-standard challenges."
-        except Exception as e:
-            print(f"Error generating sales context: {str(e)}")
-            return f"Error generating sales context. Please check your API keys and try again."
+    context_cache = get_sales_context_cache() if use_cache else None
+    fingerprint = news_fingerprint(news_summary, competitor_summary, competitor_company)
+    cache_key = None
+    if context_cache:
+        cache_key = context_cache.make_key(company_name, industry, product_name, product_description, fingerprint, SALES_CONTEXT_PROMPT_VERSION)
+        cached = context_cache.get(cache_key)
+        if cached:
+            annotate(cached=True)
+            return cached
+    try:
+        response = graph.invoke({"messages": [("user", prompt)]})
+        if response and "messages" in response and len(response["messages"]) > 0:
+            sales_context = response["messages"][-1].content
+            if context_cache and sales_context and sales_context != CHATBOT_ERROR_RESPONSE:
+                context_cache.set(cache_key, company_name, industry, product_name, fingerprint, SALES_CONTEXT_PROMPT_VERSION, sales_context)
+            return sales_context
+        return f"No specific context generated for {company_name}. Using industry-standard challenges."
+    except Exception as e:
+        print(f"Error generating sales context: {str(e)}")
+        return f"Error generating sales context. Please check your API keys and try again."
 
 def parse_chatbot_input(chat_input, collected_data):
     """Parse chatbot input to populate email_data, returning updated data and next prompt."""
@@ -122,7 +139,8 @@ def parse_chatbot_input(chat_input, collected_data):
     
     return collected_data, ""
 
-def generate_email_pitch(email_data, news_summary, sales_context, competitor_summary, graph):
+def build_email_prompts(email_data, news_summary, sales_context, competitor_summary):
+    """Build the three tone-variant prompts for an email, or an empty list for an unknown email type."""
     # Default salesperson details
     salesperson_name = email_data.get("salesperson_name", "Vishal Mahajan")
     salesperson_title = email_data.get("salesperson_title", "Sales Manager")
@@ -345,22 +363,124 @@ def generate_email_pitch(email_data, news_summary, sales_context, competitor_sum
             8. Structure for readability with short paragraphs, plain text bullet points (using hyphens), and a clear flow. Ensure professional, polished, and adheres to the specified word count, using only plain text.
             """
         else:
-            return f"Error: Invalid email type '{email_type}'. Please choose 'initial pitch', 'follow-up', 'thank you', or 'schedule meeting/demo'."
+            return []
         prompts.append(prompt)
-    
+    return prompts
+
+def invalid_email_type_message(email_type):
+    return f"Error: Invalid email type '{email_type}'. Please choose 'initial pitch', 'follow-up', 'thank you', or 'schedule meeting/demo'."
+
+def format_email_option(option_number, content):
+    return f"=== Email Option {option_number} ===\n{content}\n"
+
+def generate_email_option(prompt, option_number, email_type, graph):
+    try:
+        with span("email_variant", option=option_number, prompt_version=EMAIL_PROMPT_VERSION):
+            response = graph.invoke({"messages": [("user", prompt)]})
+        if response and "messages" in response and len(response["messages"]) > 0:
+            return format_email_option(option_number, response['messages'][-1].content)
+        return f"=== Email Option {option_number} ===\nError: No valid response generated for option {option_number}. Please try again.\n"
+    except Exception as e:
+        print(f"Error generating email {option_number} for {email_type}: {str(e)}")
+        return f"=== Email Option {option_number} ===\nError generating email {option_number}. Please check your API keys and try again.\n"
+
+def build_batch_email_prompt(briefs, email_data_list):
+    """One prompt asking for an email per brief for every prospect, answered as JSON keyed by prospect id.
+
+    `briefs` are build_email_prompts() output written for the placeholder prospect, so the
+    instruction block and the shared product, salesperson and news context are sent once.
+    """
+    prospects = [
+        {"id": f"p{number}", "name": data.get("prospect_name", ""), "title": data.get("prospect_title", "")}
+        for number, data in enumerate(email_data_list, 1)
+    ]
+    brief_text = "\n".join(f"=== BRIEF {number} ===\n{brief.strip()}\n" for number, brief in enumerate(briefs, 1))
+    return f"""
+    You are writing sales emails for several prospects at the same company. Below are {len(briefs)} email briefs written for a placeholder prospect, {PROSPECT_NAME_PLACEHOLDER}, {PROSPECT_TITLE_PLACEHOLDER}. For EACH prospect listed under PROSPECTS, write one email per brief, following that brief exactly with the placeholder name and title replaced by the prospect's own.
+
+    PROSPECTS:
+    {json.dumps(prospects)}
+
+{brief_text}
+    Return only a JSON object, with no text before or after it, of the form
+    {{"emails": [{{"id": "<prospect id>", "options": ["<email for brief 1>", "<email for brief 2>", ...]}}]}}
+    with exactly one entry per prospect id and one plain text email per brief, in brief order.
+    """
+
+def parse_batch_emails(response, prospect_ids, option_count):
+    """{prospect id: [email per brief]} from a batched response; missing or malformed entries are left out."""
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    emails = {}
+    for entry in data.get("emails", []) if isinstance(data, dict) else []:
+        if not isinstance(entry, dict) or entry.get("id") not in prospect_ids:
+            continue
+        options = entry.get("options")
+        if isinstance(options, list) and len(options) == option_count and all(isinstance(o, str) and o.strip() for o in options):
+            emails[entry["id"]] = [o.strip() for o in options]
+    return emails
+
+def _generate_email_batch(briefs, email_data_list, llm):
+    prompt = build_batch_email_prompt(briefs, email_data_list)
+    prospect_ids = [f"p{number}" for number in range(1, len(email_data_list) + 1)]
+    try:
+        with span("email_batch", prospects=len(email_data_list), prompt_version=EMAIL_BATCH_PROMPT_VERSION):
+            response = llm.generate(
+                prompt,
+                max_output_tokens=min(EMAIL_BATCH_MAX_OUTPUT_TOKENS, len(email_data_list) * len(briefs) * EMAIL_BATCH_TOKENS_PER_EMAIL),
+                temperature=0.6, top_p=0.95, json_output=True
+            )
+            emails = parse_batch_emails(response, prospect_ids, len(briefs))
+            annotate(parsed=len(emails))
+    except Exception as e:
+        print(f"Error generating batched emails with {llm.name}: {str(e)}")
+        return [None] * len(email_data_list)
+    if len(emails) < len(prospect_ids):
+        print(f"Batched email response covered {len(emails)} of {len(prospect_ids)} prospects; the rest fall back to single calls.")
+    return [
+        {number: format_email_option(number, text) for number, text in enumerate(emails[prospect_id], 1)} if prospect_id in emails else None
+        for prospect_id in prospect_ids
+    ]
+
+def generate_email_batches(email_data_list, news_summary, sales_context, competitor_summary, llm):
+    """Email options for several prospects at one company from as few LLM calls as the token budgets allow.
+
+    Returns one {option number: email} per prospect, in order, or None where the batched answer
+    was missing or malformed (or batching does not fit the budgets); the caller falls back to
+    single calls for those.
+    """
+    results = [None] * len(email_data_list)
+    template_data = {**email_data_list[0], "prospect_name": PROSPECT_NAME_PLACEHOLDER, "prospect_title": PROSPECT_TITLE_PLACEHOLDER}
+    briefs = build_email_prompts(template_data, news_summary, sales_context, competitor_summary)
+    if not briefs or len(email_data_list) < 2:
+        return results
+    # Prospects per call: bounded by the output budget (every brief's email for each) and the input left after the briefs.
+    prospect_tokens = estimate_tokens(json.dumps({"id": "p00", "name": "", "title": ""})) + 20
+    input_room = EMAIL_BATCH_MAX_INPUT_TOKENS - estimate_tokens(build_batch_email_prompt(briefs, []))
+    per_call = min(EMAIL_BATCH_MAX_PROSPECTS, EMAIL_BATCH_MAX_OUTPUT_TOKENS // (len(briefs) * EMAIL_BATCH_TOKENS_PER_EMAIL), input_room // prospect_tokens)
+    if per_call < 2:
+        return results
+    for start in range(0, len(email_data_list), per_call):
+        chunk = email_data_list[start:start + per_call]
+        if len(chunk) > 1:
+            results[start:start + len(chunk)] = _generate_email_batch(briefs, chunk, llm)
+    return results
+
+def generate_email_pitch(email_data, news_summary, sales_context, competitor_summary, graph):
+    email_type = email_data.get("email_type", "initial pitch")
+    prompts = build_email_prompts(email_data, news_summary, sales_context, competitor_summary)
+    if not prompts:
+        return invalid_email_type_message(email_type)
+
     # Generate three emails
     emails = []
-    with st.spinner(f"Generating three personalized {email_type} emails..."):
-        for i, prompt in enumerate(prompts, 1):
-            try:
-                response = graph.invoke({"messages": [("user", prompt)]})
-                if response and "messages" in response and len(response["messages"]) > 0:
-                    emails.append(f"=== Email Option {i} ===\n{response['messages'][-1].content}\n")
-                else:
-                    emails.append(f"=== Email Option {i} ===\nError: No valid response generated for option {i}. Please try again.\n")
-            except Exception as e:
-                print(f"Error generating email {i} for {email_type}: {str(e)}")
-                emails.append(f"=== Email Option {i} ===\nError generating email {i}. Please check your API keys and try again.\n")
+    for i, prompt in enumerate(prompts, 1):
+        emails.append(generate_email_option(prompt, i, email_type, graph))
     
     # Combine emails with separators
     return "\n".join(emails)
\ No newline at end of file
@@ -0,0 +1,324 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache
+from utils.config import (
+    SCHEDULER_LIMITS, SCHEDULER_AGING_SECONDS, SCHEDULER_USER_WEIGHTS,
+    LLM_AIMD_MIN_CONCURRENCY, LLM_AIMD_MAX_CONCURRENCY, LLM_AIMD_DECREASE, LLM_AIMD_LATENCY_TOLERANCE,
+)
+from utils.metering import current_user
+from utils.tracing import record, register_collector
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first
+INTERACTIVE, BATCH, PREFETCH = "interactive", "batch", "prefetch"
+PRIORITIES = (INTERACTIVE, BATCH, PREFETCH)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# HTTP statuses and google.api_core exception names that mean the upstream is overloaded
+OVERLOAD_STATUSES = (429, 500, 502, 503, 504)
+OVERLOAD_ERRORS = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded")
+
+_priority = contextvars.ContextVar("call_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(name):
+    """Outbound calls made inside the block are scheduled in this priority class."""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{name}'. Choose from {', '.join(PRIORITIES)}.")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority():
+    return _priority.get()
+
+def parse_weights(spec):
+    """{user: weight} from "alice@example.com=2,bob@example.com=0.5"."""
+    weights = {}
+    for part in spec.split(","):
+        user, _, weight = part.strip().rpartition("=")
+        if user:
+            weights[user] = float(weight)
+    return weights
+
+class _Waiter:
+    __slots__ = ("user", "priority", "enqueued", "event")
+
+    def __init__(self, user, priority):
+        self.user = user
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+
+class ResourceQueue:
+    """Concurrency slots for one upstream, granted by priority class, then fair share across users.
+
+    A freed slot goes to the most urgent class with waiters; a waiter is promoted one class
+    for every `aging_seconds` it has waited, so batch and prefetch calls are never starved.
+    Within a class, users are served in start-time fair queuing order: each grant advances
+    the user's virtual time by 1/weight, and the user with the lowest virtual time goes next.
+    """
+
+    def __init__(self, name, limit, aging_seconds=SCHEDULER_AGING_SECONDS, weights=None):
+        self.name = name
+        self.limit = limit
+        self.aging_seconds = aging_seconds
+        self.weights = weights or {}
+        self.in_use = 0
+        self._waiting = {p: OrderedDict() for p in PRIORITIES}  # priority -> user -> deque of waiters
+        self._vtime = {}
+        self._clock = 0.0
+        self._lock = threading.Lock()
+        self._stats = {p: {"granted": 0, "promoted": 0, "wait_sum": 0.0, "buckets": [0] * len(WAIT_BUCKETS)} for p in PRIORITIES}
+
+    def depth(self, priority_name=None):
+        names = [priority_name] if priority_name else PRIORITIES
+        return sum(len(waiters) for p in names for waiters in self._waiting[p].values())
+
+    def _grant(self, user, priority_name, waited, promoted=False):
+        start = max(self._vtime.get(user, 0.0), self._clock)
+        self._vtime[user] = start + 1.0 / self.weights.get(user, 1.0)
+        self._clock = start
+        stats = self._stats[priority_name]
+        stats["granted"] += 1
+        stats["promoted"] += promoted
+        stats["wait_sum"] += waited
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                stats["buckets"][i] += 1
+
+    def _next(self):
+        now = time.monotonic()
+        best = None
+        for rank, priority_name in enumerate(PRIORITIES):
+            for user, waiters in self._waiting[priority_name].items():
+                head = waiters[0]
+                effective = max(0, rank - int((now - head.enqueued) // self.aging_seconds)) if self.aging_seconds > 0 else rank
+                key = (effective, max(self._vtime.get(user, 0.0), self._clock), head.enqueued)
+                if best is None or key < best[0]:
+                    best = (key, priority_name, user, effective < rank)
+        if best is None:
+            return None
+        _, priority_name, user, promoted = best
+        waiters = self._waiting[priority_name][user]
+        waiter = waiters.popleft()
+        if not waiters:
+            del self._waiting[priority_name][user]
+        self._grant(user, priority_name, now - waiter.enqueued, promoted)
+        return waiter
+
+    def acquire(self, user, priority_name):
+        """Block until a slot is granted; returns the seconds spent waiting."""
+        with self._lock:
+            if self.in_use < self.limit and not self.depth():
+                self.in_use += 1
+                self._grant(user, priority_name, 0.0)
+                return 0.0
+            waiter = _Waiter(user, priority_name)
+            self._waiting[priority_name].setdefault(user, deque()).append(waiter)
+        waiter.event.wait()
+        return time.monotonic() - waiter.enqueued
+
+    def release(self):
+        with self._lock:
+            if self.in_use > self.limit:
+                # The limit was lowered while this call ran; the slot goes away.
+                self.in_use -= 1
+                return
+            waiter = self._next()
+            if waiter is None:
+                self.in_use -= 1
+            else:
+                # The slot passes straight to the next waiter.
+                waiter.event.set()
+
+    def set_limit(self, limit):
+        """Change the concurrency limit; a raised limit is granted to waiters right away."""
+        with self._lock:
+            self.limit = limit
+            while self.in_use < self.limit:
+                waiter = self._next()
+                if waiter is None:
+                    break
+                self.in_use += 1
+                waiter.event.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_use": self.in_use,
+                "depth": {p: self.depth(p) for p in PRIORITIES},
+                "stats": {p: {**stats, "buckets": list(stats["buckets"])} for p, stats in self._stats.items()},
+            }
+
+def is_overload(error):
+    """Whether a failed call was refused for quota or capacity (429/5xx) rather than rejected."""
+    status = getattr(error, "code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in OVERLOAD_STATUSES
+    return type(error).__name__ in OVERLOAD_ERRORS
+
+class AIMDController:
+    """Additive-increase, multiplicative-decrease control of a ResourceQueue's limit.
+
+    Each call that finishes healthy while the queue is saturated earns 1/limit of a slot, so
+    the limit grows by about one per round of calls. An overload error, or a call slower than
+    `tolerance` times the running average for its latency class, multiplies the limit by
+    `decrease`. Calls that started before the last decrease are not counted either way:
+    they ran under the old limit, and one burst of 429s should cut the limit only once.
+    """
+
+    def __init__(self, queue, min_limit=LLM_AIMD_MIN_CONCURRENCY, max_limit=LLM_AIMD_MAX_CONCURRENCY,
+                 decrease=LLM_AIMD_DECREASE, tolerance=LLM_AIMD_LATENCY_TOLERANCE, warmup=10, smoothing=0.05):
+        self.queue = queue
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.warmup = warmup
+        self.smoothing = smoothing
+        self._credit = 0.0
+        self._baselines = {}  # latency class -> [samples, average seconds]
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"increases": 0, "decreases": {"overload": 0, "latency": 0}}
+        queue.set_limit(min(max(queue.limit, min_limit), max_limit))
+
+    def _spiked(self, latency_class, seconds):
+        baseline = self._baselines.setdefault(latency_class, [0, seconds])
+        spiked = baseline[0] >= self.warmup and seconds > baseline[1] * self.tolerance
+        baseline[0] += 1
+        baseline[1] += (seconds - baseline[1]) * (self.smoothing if baseline[0] > self.warmup else 1.0 / baseline[0])
+        return spiked
+
+    def _cut(self, reason):
+        limit = max(self.min_limit, int(self.queue.limit * self.decrease))
+        self._last_decrease = time.monotonic()
+        self._credit = 0.0
+        self.stats["decreases"][reason] += 1
+        if limit != self.queue.limit:
+            logger.info(f"Lowering {self.queue.name} concurrency {self.queue.limit} -> {limit} ({reason})")
+            self.queue.set_limit(limit)
+
+    def on_success(self, started, seconds, latency_class=None):
+        with self._lock:
+            spiked = self._spiked(latency_class, seconds)
+            if started < self._last_decrease:
+                return
+            if spiked:
+                self._cut("latency")
+            elif self.queue.in_use >= self.queue.limit or self.queue.depth():
+                self._credit += 1.0 / self.queue.limit
+                if self._credit >= 1.0 and self.queue.limit < self.max_limit:
+                    self._credit = 0.0
+                    self.stats["increases"] += 1
+                    self.queue.set_limit(self.queue.limit + 1)
+
+    def on_error(self, started, error):
+        if not is_overload(error):
+            return
+        with self._lock:
+            if started >= self._last_decrease:
+                self._cut("overload")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "limit": self.queue.limit,
+                "increases": self.stats["increases"],
+                "decreases": dict(self.stats["decreases"]),
+                "baseline_seconds": {str(key): round(average, 4) for key, (_, average) in self._baselines.items()},
+            }
+
+class Scheduler:
+    """Every outbound NewsAPI, Serper, article and LLM call in this process takes a slot here.
+
+    Limits are per process; resources with no limit (0) are not queued. The LLM limit adapts
+    to the provider's quota and latency through an AIMDController unless LLM_AIMD_MAX_CONCURRENCY is 0.
+    """
+
+    def __init__(self, limits=SCHEDULER_LIMITS, aging_seconds=SCHEDULER_AGING_SECONDS, weights=None, adaptive=("llm",)):
+        weights = parse_weights(SCHEDULER_USER_WEIGHTS) if weights is None else weights
+        self.queues = {name: ResourceQueue(name, limit, aging_seconds, weights) for name, limit in limits.items() if limit > 0}
+        self.controllers = {name: AIMDController(self.queues[name]) for name in adaptive if name in self.queues and LLM_AIMD_MAX_CONCURRENCY > 0}
+
+    @contextmanager
+    def slot(self, resource, latency_class=None):
+        """Hold one of the resource's slots for the block; `latency_class` groups calls of similar
+        expected duration (e.g. output size) for the adaptive controller's latency baseline."""
+        queue = self.queues.get(resource)
+        if queue is None:
+            yield
+            return
+        controller = self.controllers.get(resource)
+        waited = queue.acquire(current_user(), current_priority())
+        if waited:
+            record(queue_seconds=waited)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if controller is not None:
+                controller.on_error(started, e)
+            raise
+        else:
+            if controller is not None:
+                controller.on_success(started, time.monotonic() - started, latency_class)
+        finally:
+            queue.release()
+
+    def snapshot(self):
+        snapshot = {name: queue.snapshot() for name, queue in self.queues.items()}
+        for name, controller in self.controllers.items():
+            snapshot[name]["adaptive"] = controller.snapshot()
+        return snapshot
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP email_generator_scheduler_queue_depth Outbound calls waiting for a slot.",
+            "# TYPE email_generator_scheduler_queue_depth gauge",
+        ]
+        for name, queue in sorted(snapshot.items()):
+            for p in PRIORITIES:
+                lines.append(f'email_generator_scheduler_queue_depth{{resource="{name}",priority="{p}"}} {queue["depth"][p]}')
+        lines += ["# HELP email_generator_scheduler_in_use Slots in use.", "# TYPE email_generator_scheduler_in_use gauge"]
+        lines += [f'email_generator_scheduler_in_use{{resource="{name}"}} {queue["in_use"]}' for name, queue in sorted(snapshot.items())]
+        lines += ["# HELP email_generator_scheduler_limit Concurrent calls allowed.", "# TYPE email_generator_scheduler_limit gauge"]
+        lines += [f'email_generator_scheduler_limit{{resource="{name}"}} {queue["limit"]}' for name, queue in sorted(snapshot.items())]
+        lines += ["# HELP email_generator_scheduler_wait_seconds Time outbound calls waited for a slot.", "# TYPE email_generator_scheduler_wait_seconds histogram"]
+        for name, queue in sorted(snapshot.items()):
+            for p, stats in queue["stats"].items():
+                labels = f'resource="{name}",priority="{p}"'
+                for bound, count in zip(WAIT_BUCKETS, stats["buckets"]):
+                    lines.append(f'email_generator_scheduler_wait_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'email_generator_scheduler_wait_seconds_bucket{{{labels},le="+Inf"}} {stats["granted"]}')
+                lines.append(f'email_generator_scheduler_wait_seconds_sum{{{labels}}} {stats["wait_sum"]:.6f}')
+                lines.append(f'email_generator_scheduler_wait_seconds_count{{{labels}}} {stats["granted"]}')
+        lines += ["# HELP email_generator_scheduler_promoted_total Calls granted after aging into a more urgent class.", "# TYPE email_generator_scheduler_promoted_total counter"]
+        for name, queue in sorted(snapshot.items()):
+            for p, stats in queue["stats"].items():
+                lines.append(f'email_generator_scheduler_promoted_total{{resource="{name}",priority="{p}"}} {stats["promoted"]}')
+        adaptive = {name: queue["adaptive"] for name, queue in snapshot.items() if "adaptive" in queue}
+        if adaptive:
+            lines += ["# HELP email_generator_scheduler_limit_increases_total Additive increases of an adaptive limit.", "# TYPE email_generator_scheduler_limit_increases_total counter"]
+            lines += [f'email_generator_scheduler_limit_increases_total{{resource="{name}"}} {stats["increases"]}' for name, stats in sorted(adaptive.items())]
+            lines += ["# HELP email_generator_scheduler_limit_decreases_total Multiplicative decreases of an adaptive limit.", "# TYPE email_generator_scheduler_limit_decreases_total counter"]
+            for name, stats in sorted(adaptive.items()):
+                for reason, count in stats["decreases"].items():
+                    lines.append(f'email_generator_scheduler_limit_decreases_total{{resource="{name}",reason="{reason}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+@lru_cache(maxsize=1)
+def get_scheduler():
+    scheduler = Scheduler()
+    register_collector(scheduler.prometheus_text)
+    return scheduler
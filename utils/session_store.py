@@ -0,0 +1,274 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from utils.config import SESSION_STORE_MAX_COMPANIES, SESSION_STORE_MAX_BYTES, SESSION_METRICS_MAX_COMPANIES, CONTENT_STORE_MAX_BYTES, ARTICLE_COMPRESSION
+from utils.news_fetcher import relevance_metrics
+from utils.compression import compress_text, decompress_text
+
+class ContentStore:
+    """Compressed article bodies shared by every session in this process, keyed by content hash.
+
+    put() returns the shared blob, so the same article scraped by several sessions or batches
+    is held once. The index is bounded by total compressed bytes and forgets the least recently
+    used blobs; records keep their own reference, so forgetting a blob only ends its sharing.
+    """
+
+    def __init__(self, max_bytes=CONTENT_STORE_MAX_BYTES, codec=ARTICLE_COMPRESSION):
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is not None:
+                self._entries.move_to_end(key)
+                return blob
+        blob = compress_text(text, self.codec)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = blob
+            self.size += len(blob)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return blob
+
+@lru_cache(maxsize=1)
+def get_content_store():
+    return ContentStore()
+
+# ArticleRecord attribute for each article dict key the UI reads
+_ARTICLE_FIELDS = {
+    "title": "title",
+    "description": "description",
+    "content": "content",
+    "url": "url",
+    "publishedAt": "published_at",
+    "source": "source",
+    "company_name": "company_name",
+    "is_competitor": "is_competitor",
+    "relevance_score": "relevance_score",
+    "relevance_details": "relevance_details",
+    "relevance_metrics": "relevance_metrics",
+    "provider": "provider",
+}
+
+METRIC_COLUMNS = (
+    "company", "title", "source", "published", "is_competitor",
+    "score", "company_mentions", "keyword_matches", "industry_matches", "recency_days",
+)
+
+@dataclass(frozen=True, slots=True)
+class ArticleRecord:
+    """Compact, read-only article used by the pipeline, its caches and session state.
+
+    The scraped body is kept compressed (shared through the ContentStore) and only
+    decompressed when read, for summarizing or display. Source and company names are
+    interned, and a content that repeats the description shares its string.
+    """
+    title: str
+    description: str
+    content: str
+    url: str
+    published_at: str
+    source: str
+    company_name: str
+    is_competitor: bool
+    relevance_score: float
+    relevance_details: dict
+    relevance_metrics: dict
+    provider: str = "newsapi"
+    body: bytes = None
+
+    @classmethod
+    def from_article(cls, article, content_store=None):
+        if isinstance(article, cls):
+            return article
+        full_content = article.get("full_content")
+        description = article.get("description", "") or ""
+        content = article.get("content", "") or ""
+        return cls(
+            title=article.get("title", ""),
+            description=description,
+            content=description if content == description else content,
+            url=article.get("url", ""),
+            published_at=article.get("publishedAt", ""),
+            source=sys.intern(str(article.get("source") or "Unknown")),
+            company_name=sys.intern(article.get("company_name", "")),
+            is_competitor=article.get("is_competitor", False),
+            relevance_score=article.get("relevance_score", 0),
+            relevance_details=article.get("relevance_details", {}),
+            relevance_metrics=article.get("relevance_metrics") or relevance_metrics(article),
+            provider=sys.intern(article.get("provider") or "newsapi"),
+            body=(content_store or get_content_store()).put(full_content) if full_content else None,
+        )
+
+    @property
+    def full_content(self):
+        return decompress_text(self.body) if self.body is not None else None
+
+    def to_dict(self, body=True):
+        """The article as a plain dict, body decompressed, in the news fetcher's shape; body=False leaves it out."""
+        article = {key: getattr(self, attr) for key, attr in _ARTICLE_FIELDS.items()}
+        if body and self.body is not None:
+            article["full_content"] = self.full_content
+        return article
+
+    # Dict-style reads so display code written against article dicts keeps working.
+    def get(self, key, default=None):
+        if key == "full_content":
+            value = self.full_content
+        elif key in _ARTICLE_FIELDS:
+            value = getattr(self, _ARTICLE_FIELDS[key])
+        else:
+            return default
+        return default if value is None else value
+
+    def __contains__(self, key):
+        if key == "full_content":
+            return self.body is not None
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def metric_row(self, company):
+        metrics = self.relevance_metrics
+        return (
+            company, self.title, self.source, self.published_at[:10], self.is_competitor,
+            metrics["score"], metrics["company_mentions"], metrics["keyword_matches"], metrics["industry_matches"], metrics["recency_days"],
+        )
+
+    def approx_bytes(self):
+        # A body blob shared with other records is counted by each of them.
+        content = 0 if self.content is self.description else len(self.content)
+        return len(self.title) + len(self.description) + content + len(self.url) + len(self.body or b"") + 200
+
+@dataclass(frozen=True, slots=True)
+class CompanyNews:
+    articles: tuple
+    summaries: tuple
+    competitor_summaries: tuple
+    sales_context: str
+
+    def approx_bytes(self):
+        return (
+            sum(article.approx_bytes() for article in self.articles)
+            + sum(len(s) for s in self.summaries)
+            + sum(len(s) for s in self.competitor_summaries)
+            + len(self.sales_context)
+        )
+
+class SessionNewsStore:
+    """Per-session news, summaries and sales context by company, with LRU eviction.
+
+    Bounded both by company count and by the approximate size of the session-owned text,
+    so a long session or a large CSV batch cannot grow session state without limit.
+    Relevance metrics are small, so they are kept for many more companies (a whole batch)
+    and served as one columnar table for the cross-account analysis.
+    """
+
+    def __init__(self, max_companies=SESSION_STORE_MAX_COMPANIES, max_bytes=SESSION_STORE_MAX_BYTES, max_metric_companies=SESSION_METRICS_MAX_COMPANIES):
+        self.max_companies = max_companies
+        self.max_bytes = max_bytes
+        self.max_metric_companies = max_metric_companies
+        self.size = 0
+        self._entries = OrderedDict()
+        self._metrics = OrderedDict()
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def record(self, company, result):
+        """Store the articles, summaries and sales context of one pipeline result."""
+        entry = CompanyNews(
+            articles=tuple(ArticleRecord.from_article(a) for a in result.get("prospect_articles", []) + result.get("competitor_articles", [])),
+            summaries=tuple(result.get("summaries", [])),
+            competitor_summaries=tuple(result.get("competitor_summaries", [])),
+            sales_context=result.get("sales_context", "") or "",
+        )
+        entry_bytes = entry.approx_bytes()
+        with self._lock:
+            previous = self._entries.pop(company, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[company] = (entry, entry_bytes)
+            self.size += entry_bytes
+            self._metrics.pop(company, None)
+            self._metrics[company] = [article.metric_row(company) for article in entry.articles]
+            while len(self._metrics) > self.max_metric_companies:
+                self._metrics.popitem(last=False)
+            self._frames = {}
+            while len(self._entries) > 1 and (len(self._entries) > self.max_companies or self.size > self.max_bytes):
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.size -= evicted_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._metrics.clear()
+            self._frames = {}
+            self.size = 0
+
+    def companies(self):
+        """Companies with full news kept, least recently recorded first."""
+        with self._lock:
+            return list(self._entries)
+
+    def get(self, company):
+        with self._lock:
+            entry = self._entries.get(company)
+        return entry[0] if entry else None
+
+    def metrics_frame(self):
+        """All recorded articles' relevance metrics as one DataFrame, rebuilt only after a change."""
+        import pandas as pd  # not needed by headless batch runs
+        with self._lock:
+            if "metrics" not in self._frames:
+                rows = [row for company_rows in self._metrics.values() for row in company_rows]
+                self._frames["metrics"] = pd.DataFrame.from_records(rows, columns=METRIC_COLUMNS)
+            return self._frames["metrics"]
+
+    def account_summary(self):
+        """Per-company aggregates over metrics_frame(), best average relevance first."""
+        frame = self.metrics_frame()
+        with self._lock:
+            if "accounts" not in self._frames:
+                self._frames["accounts"] = frame.groupby("company", sort=False).agg(
+                    articles=("title", "size"),
+                    avg_score=("score", "mean"),
+                    max_score=("score", "max"),
+                    company_mentions=("company_mentions", "sum"),
+                    keyword_matches=("keyword_matches", "sum"),
+                    competitor_articles=("is_competitor", "sum"),
+                ).sort_values("avg_score", ascending=False)
+            return self._frames["accounts"]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _view(self, field):
+        with self._lock:
+            return {company: getattr(entry, field) for company, (entry, _) in self._entries.items()}
+
+    def articles_dict(self):
+        return self._view("articles")
+
+    def summaries_dict(self):
+        return self._view("summaries")
+
+    def competitor_summaries_dict(self):
+        return self._view("competitor_summaries")
+
+    def sales_context_dict(self):
+        return self._view("sales_context")
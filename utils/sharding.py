@@ -0,0 +1,56 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.batch import run_batch_file, merge_results, read_columns, validate_columns
+from utils.llm import get_llm_provider
+from utils.sales_context import setup_graph
+from utils.metering import attribution
+from utils.config import BATCH_QUEUE_SIZE
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def shard_output_path(output_path, shard_index, shard_count):
+    root = output_path[:-len(".eml.zip")] if output_path.lower().endswith(".eml.zip") else os.path.splitext(output_path)[0]
+    return f"{root}.shard{shard_index}of{shard_count}.jsonl"
+
+def run_shard(input_path, output_path, base_email_data, settings, shard_index, shard_count, stage_concurrency=None, llm_provider=None, resume=True, user=None, queue_size=BATCH_QUEUE_SIZE):
+    """Process one hash partition of the CSV; safe to call on another machine sharing CACHE_DIR."""
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index must be between 0 and {shard_count - 1}, got {shard_index}")
+    llm = get_llm_provider(llm_provider)
+    graph = setup_graph(llm)
+    with attribution(user=user):
+        summary = run_batch_file(
+            input_path, output_path, base_email_data, settings, llm, graph, stage_concurrency, queue_size,
+            resume=resume, shard=(shard_index, shard_count)
+        )
+    summary.pop("recent", None)
+    return {**summary, "shard": shard_index, "pid": os.getpid()}
+
+def run_sharded_batch(input_path, output_path, base_email_data, settings, workers, stage_concurrency=None, llm_provider=None, resume=True, keep_shards=False, user=None, queue_size=BATCH_QUEUE_SIZE):
+    """Split the CSV by prospect_company hash across `workers` processes and merge the results in row order.
+
+    Rows for one company always land in the same shard, so per-company news and summary
+    caching keeps working inside each process.
+    """
+    validate_columns(read_columns(input_path))  # fail here rather than once per worker process
+    started = time.perf_counter()
+    shard_paths = [shard_output_path(output_path, index, workers) for index in range(workers)]
+    # spawn rather than fork: the parent may already hold threads and gRPC channels
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(run_shard, input_path, shard_paths[index], base_email_data, settings, index, workers, stage_concurrency, llm_provider, resume, user, queue_size)
+            for index in range(workers)
+        ]
+        shard_summaries = [future.result() for future in futures]
+    merged = merge_results(shard_paths, output_path, base_email_data)
+    if not keep_shards:
+        for path in shard_paths:
+            os.remove(path)
+    elapsed = time.perf_counter() - started
+    errors = sum(summary["errors"] for summary in shard_summaries)
+    logger.info(f"Sharded batch finished: {merged} rows across {workers} workers in {elapsed:.1f}s")
+    return {"processed": merged, "errors": errors, "elapsed": elapsed, "shards": shard_summaries}
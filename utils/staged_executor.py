@@ -0,0 +1,171 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class Stage:
+    """One pipeline stage. With batch_size > 1, fn takes a list of items and returns a list of results.
+
+    Items are grouped by batch_key(item) (None: never grouped); a group is handed to fn once it
+    has batch_size items or its first item has waited `linger` seconds. A result that is an
+    exception fails just that item.
+    """
+
+    def __init__(self, name, fn, concurrency=1, batch_size=1, batch_key=None, linger=0.0):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.batch_key = batch_key or (lambda item: None)
+        self.linger = linger
+
+class StageFailure:
+    """Carried downstream in place of an item whose stage raised, so later stages skip it."""
+
+    def __init__(self, stage, error, item):
+        self.stage = stage
+        self.error = error
+        self.item = item
+
+class StagedPipeline:
+    """Runs items through a chain of stages, each with its own worker pool.
+
+    Stages are connected by bounded queues, so item i+1 can be in the first stage while
+    item i is in the second; a slow stage applies backpressure instead of buffering the
+    whole input. Throughput approaches the rate of the slowest stage. Workers run in a copy
+    of the caller's context, so tracing and usage attribution follow items into the stages.
+    """
+
+    def __init__(self, stages, queue_size=8):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.busy_seconds = {stage.name: 0.0 for stage in stages}
+        self._busy_lock = threading.Lock()
+
+    def _process(self, stage, entries):
+        """Run stage.fn over the live (index, item) entries; returns the entries to pass downstream."""
+        live = [(index, item) for index, item in entries if not isinstance(item, StageFailure)]
+        if not live:
+            return entries
+        started = time.perf_counter()
+        try:
+            results = stage.fn([item for _, item in live]) if stage.batch_size > 1 else [stage.fn(live[0][1])]
+        except Exception as e:
+            results = [e] * len(live)
+        with self._busy_lock:
+            self.busy_seconds[stage.name] += time.perf_counter() - started
+        processed = {}
+        for (index, item), result in zip(live, results):
+            if isinstance(result, Exception):
+                logger.error(f"Stage {stage.name} failed for item {index}: {str(result)}")
+                result = StageFailure(stage.name, result, item)
+            processed[index] = result
+        return [(index, processed.get(index, item)) for index, item in entries]
+
+    def _worker(self, stage, in_queue, out_queue, finished, next_concurrency):
+        while True:
+            entry = in_queue.get()
+            if entry is _DONE:
+                break
+            for processed in self._process(stage, entry if stage.batch_size > 1 else [entry]):
+                out_queue.put(processed)
+        with finished["lock"]:
+            finished["count"] += 1
+            last = finished["count"] == stage.concurrency
+        if last:
+            for _ in range(next_concurrency):
+                out_queue.put(_DONE)
+
+    def _batcher(self, stage, in_queue, batch_queue):
+        """Group a batched stage's input by batch_key into lists for its workers."""
+        pending = OrderedDict()  # batch key -> (deadline, entries)
+        upstream_open = stage.concurrency  # the previous stage (or feeder) sends one _DONE per worker
+        while upstream_open:
+            timeout = max(0.0, min(deadline for deadline, _ in pending.values()) - time.monotonic()) if pending else None
+            try:
+                entry = in_queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = None
+            if entry is _DONE:
+                upstream_open -= 1
+            elif entry is not None:
+                key = None if isinstance(entry[1], StageFailure) else stage.batch_key(entry[1])
+                if key is None:
+                    batch_queue.put([entry])
+                else:
+                    group = pending.setdefault(key, (time.monotonic() + stage.linger, []))[1]
+                    group.append(entry)
+                    if len(group) >= stage.batch_size:
+                        batch_queue.put(pending.pop(key)[1])
+            now = time.monotonic()
+            for key in [k for k, (deadline, _) in pending.items() if deadline <= now]:
+                batch_queue.put(pending.pop(key)[1])
+        for _, group in pending.values():
+            batch_queue.put(group)
+        for _ in range(stage.concurrency):
+            batch_queue.put(_DONE)
+
+    def run(self, items):
+        """Yield (index, result) pairs in completion order; failed items yield a StageFailure.
+
+        An exception raised while iterating `items` stops the input, lets the items already
+        fed finish, and is then re-raised here.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for position, stage in enumerate(self.stages):
+            next_concurrency = self.stages[position + 1].concurrency if position + 1 < len(self.stages) else 1
+            finished = {"count": 0, "lock": threading.Lock()}
+            stage_queue = queues[position]
+            if stage.batch_size > 1:
+                stage_queue = queue.Queue(maxsize=stage.concurrency)
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(self._batcher, stage, queues[position], stage_queue),
+                    name=f"stage-{stage.name}-batcher",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+            for worker_number in range(stage.concurrency):
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(self._worker, stage, stage_queue, queues[position + 1], finished, next_concurrency),
+                    name=f"stage-{stage.name}-{worker_number}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        feed_error = []
+
+        def feed():
+            try:
+                for index, item in enumerate(items):
+                    queues[0].put((index, item))
+            except Exception as e:
+                feed_error.append(e)
+            finally:
+                # Always close the input, or the stages and the loop below wait forever.
+                for _ in range(self.stages[0].concurrency):
+                    queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="stage-feeder", daemon=True)
+        feeder.start()
+        while True:
+            entry = queues[-1].get()
+            if entry is _DONE:
+                break
+            yield entry
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        if feed_error:
+            raise feed_error[0]
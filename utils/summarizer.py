@@ -1,21 +1,23 @@
-import streamlit as st
-import google.generativeai as genai
 import re
 from datetime import datetime
 import logging
 from utils.config import gemini_api_key
+from utils.llm import GeminiProvider, get_llm_provider
+from utils.tracing import traced
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@st.cache_resource(ttl=3600)  # Cache Gemini configuration
+# Bump whenever the summarization prompt changes; metered usage is attributed to this version.
+SUMMARY_PROMPT_VERSION = "1"
+
 def configure_gemini():
-    if not gemini_api_key:
-        raise ValueError("Gemini API key not found. Please set GEMINI_API_KEY in the .env file.")
-    genai.configure(api_key=gemini_api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash-001')
-    return model
+    return GeminiProvider(gemini_api_key)
+
+def configure_llm():
+    return get_llm_provider()
 
+@traced("summarize_news", prompt_version=SUMMARY_PROMPT_VERSION)
 def summarize_news(article, model):
     try:
         title = article.get('title', '')
@@ -42,16 +44,7 @@ def summarize_news(article, model):
 
         Article: {text_to_summarize}
         """
-        with st.spinner("Summarizing news with Gemini API..."):
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "max_output_tokens": 150,
-                    "temperature": 0.6,
-                    "top_p": 0.95
-                }
-            )
-            summary = response.text.strip()
+        summary = model.generate(prompt, max_output_tokens=150, temperature=0.6, top_p=0.95).strip()
         
         # Ensure key entities and company name are included
         summary = ensure_entities_in_summary(summary, key_entities, company_name)
@@ -68,9 +61,17 @@ def summarize_news(article, model):
         summary = format_summary(summary)
         return summary
     except Exception as e:
-        logger.error(f"Error summarizing article with Gemini API: {str(e)}")
+        logger.error(f"Error summarizing article with LLM provider: {str(e)}")
         return article.get('title', 'Summary unavailable')
 
+def extractive_summary(article):
+    """Summary without an LLM call (title plus description), for generations in economy mode."""
+    title = article.get('title', '')
+    description = article.get('description', '') or ''
+    if not description or description.lower() in title.lower():
+        return title
+    return format_summary(f"{title}. {description}")
+
 def extract_key_entities(text, company_name):
     entities = []
     if company_name:
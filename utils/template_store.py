@@ -0,0 +1,118 @@
+import logging
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from utils.config import TEMPLATES_DB_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def fts_query(text):
+    """Turn free text into an FTS5 query where every word must match as a prefix."""
+    return " AND ".join(f'"{term}"*' for term in re.findall(r"\w+", text.lower()))
+
+class TemplateStore:
+    """Saved email templates per user in SQLite, with an FTS5 index over name and content.
+
+    The index is an external-content FTS5 table kept in sync by triggers, so searches and
+    paged listings stay index lookups with tens of thousands of templates per user.
+    """
+
+    def __init__(self, path=TEMPLATES_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS templates (
+                    id INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (owner, name)
+                );
+                CREATE INDEX IF NOT EXISTS idx_templates_owner_updated ON templates (owner, updated_at);
+                CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts USING fts5(
+                    name, content, content='templates', content_rowid='id', prefix='2 3'
+                );
+                CREATE TRIGGER IF NOT EXISTS templates_ai AFTER INSERT ON templates BEGIN
+                    INSERT INTO templates_fts (rowid, name, content) VALUES (new.id, new.name, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS templates_ad AFTER DELETE ON templates BEGIN
+                    INSERT INTO templates_fts (templates_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS templates_au AFTER UPDATE ON templates BEGIN
+                    INSERT INTO templates_fts (templates_fts, rowid, name, content) VALUES ('delete', old.id, old.name, old.content);
+                    INSERT INTO templates_fts (rowid, name, content) VALUES (new.id, new.name, new.content);
+                END;
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def save_many(self, owner, templates):
+        """Insert or overwrite several {name: content} templates in one transaction."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO templates (owner, name, content, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (owner, name) DO UPDATE SET content = excluded.content, updated_at = excluded.updated_at
+                """,
+                [(owner, name, content, now, now) for name, content in templates.items()]
+            )
+        return len(templates)
+
+    def save(self, owner, name, content):
+        return self.save_many(owner, {name: content}) == 1
+
+    def get(self, owner, name):
+        with self._connect() as conn:
+            row = conn.execute("SELECT content FROM templates WHERE owner = ? AND name = ?", (owner, name)).fetchone()
+        return row["content"] if row else None
+
+    def delete(self, owner, name):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM templates WHERE owner = ? AND name = ?", (owner, name)).rowcount > 0
+
+    def search(self, owner, query="", limit=20, offset=0):
+        """One page of (name, updated_at, preview) rows and the total match count.
+
+        An empty query lists the newest templates first; otherwise every word of the query
+        must prefix-match a word in the name or content, best matches first.
+        """
+        match = fts_query(query)
+        with self._connect() as conn:
+            if not match:
+                total = conn.execute("SELECT COUNT(*) FROM templates WHERE owner = ?", (owner,)).fetchone()[0]
+                rows = conn.execute(
+                    "SELECT name, updated_at, substr(content, 1, 120) AS preview FROM templates WHERE owner = ? ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?",
+                    (owner, limit, offset)
+                ).fetchall()
+            else:
+                # CROSS JOIN pins the FTS table as the outer loop; otherwise SQLite may scan the
+                # user's templates and re-run the MATCH for each one.
+                total = conn.execute(
+                    "SELECT COUNT(*) FROM templates_fts CROSS JOIN templates t ON t.id = templates_fts.rowid WHERE templates_fts MATCH ? AND t.owner = ?",
+                    (match, owner)
+                ).fetchone()[0]
+                rows = conn.execute(
+                    """
+                    SELECT t.name, t.updated_at, snippet(templates_fts, 1, '', '', '…', 16) AS preview
+                    FROM templates_fts CROSS JOIN templates t ON t.id = templates_fts.rowid
+                    WHERE templates_fts MATCH ? AND t.owner = ?
+                    ORDER BY rank LIMIT ? OFFSET ?
+                    """,
+                    (match, owner, limit, offset)
+                ).fetchall()
+        return [dict(row) for row in rows], total
+
+@lru_cache(maxsize=1)
+def get_template_store():
+    return TemplateStore()
@@ -0,0 +1,262 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from utils.config import TRACE_EXPORT_PATH, METRICS_PORT, METRICS_HOST
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Numeric span attributes summed into the per-stage breakdown and the Prometheus counters
+COUNTERS = ("bytes", "prompt_tokens", "completion_tokens")
+DURATION_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+# Callables returning extra Prometheus text for /metrics (e.g. the outbound call scheduler)
+_collectors = []
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for providers that report no usage."""
+    return (len(text) + 3) // 4 if text else 0
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "started_at", "duration", "attrs", "error")
+
+    def __init__(self, name, trace_id=None, parent_id=None, attrs=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.started_at = time.time()
+        self.duration = None
+        self.attrs = dict(attrs or {})
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "error": self.error,
+            **self.attrs,
+        }
+
+class Trace:
+    """Finished spans of one traced operation, such as one email generation or one batch stage."""
+
+    def __init__(self, name, trace_id=None, **attrs):
+        self.name = name
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.attrs = attrs
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self):
+        """Per span name: calls, total seconds, errors and summed counters, slowest first."""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span.name, {"stage": span.name, "calls": 0, "seconds": 0.0, "errors": 0, **{c: 0 for c in COUNTERS}})
+            stage["calls"] += 1
+            stage["seconds"] += span.duration or 0.0
+            stage["errors"] += span.error is not None
+            for counter in COUNTERS:
+                stage[counter] += span.attrs.get(counter, 0)
+        return sorted(stages.values(), key=lambda s: s["seconds"], reverse=True)
+
+class SpanMetrics:
+    """Process-wide aggregates of every finished span, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span):
+        with self._lock:
+            stats = self._stats.setdefault(span.name, {"count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * len(self.buckets), **{c: 0 for c in COUNTERS}})
+            stats["count"] += 1
+            stats["sum"] += span.duration
+            stats["errors"] += span.error is not None
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    stats["buckets"][i] += 1
+            for counter in COUNTERS:
+                stats[counter] += span.attrs.get(counter, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {**stats, "buckets": list(stats["buckets"])} for name, stats in self._stats.items()}
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP email_generator_span_duration_seconds Duration of traced pipeline spans.",
+            "# TYPE email_generator_span_duration_seconds histogram",
+        ]
+        for name, stats in sorted(snapshot.items()):
+            for bound, count in zip(self.buckets, stats["buckets"]):
+                lines.append(f'email_generator_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'email_generator_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'email_generator_span_duration_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+            lines.append(f'email_generator_span_duration_seconds_count{{span="{name}"}} {stats["count"]}')
+        for metric, help_text in (("errors", "Traced spans that raised or reported an error."),) + tuple((c, f"Sum of the {c} recorded on traced spans.") for c in COUNTERS):
+            lines.append(f"# HELP email_generator_span_{metric}_total {help_text}")
+            lines.append(f"# TYPE email_generator_span_{metric}_total counter")
+            for name, stats in sorted(snapshot.items()):
+                lines.append(f'email_generator_span_{metric}_total{{span="{name}"}} {stats[metric]}')
+        return "\n".join(lines) + "\n"
+
+@lru_cache(maxsize=1)
+def get_span_metrics():
+    return SpanMetrics()
+
+class JsonlExporter:
+    """Appends every span of a finished trace to a JSON lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, trace):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in trace.spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+@lru_cache(maxsize=1)
+def get_exporter():
+    return JsonlExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else None
+
+def current_trace():
+    return _current_trace.get()
+
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block as a child of the current span; finished spans go to the trace and the metrics."""
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(name, trace.trace_id if trace else None, parent.span_id if parent else None, attrs)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        if trace is not None:
+            trace.add(current)
+        get_span_metrics().observe(current)
+
+@contextmanager
+def trace(name, trace_id=None, **attrs):
+    """Collect the spans of one operation under a root span; exported as JSON lines when it ends."""
+    current = Trace(name, trace_id, **attrs)
+    token = _current_trace.set(current)
+    try:
+        with span(name, **attrs):
+            yield current
+    finally:
+        _current_trace.reset(token)
+        exporter = get_exporter()
+        if exporter is not None:
+            try:
+                exporter.export(current)
+            except OSError as e:
+                logger.error(f"Could not export trace {current.trace_id}: {str(e)}")
+
+def traced(name, **attrs):
+    """Decorator form of span() for functions traced on every call."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attrs):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def record(**counts):
+    """Add counts (bytes, tokens) to the current span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(**counts)
+
+def annotate(**attrs):
+    """Set attributes on the current span, if any; `error` also marks the span as failed."""
+    current = _current_span.get()
+    if current is not None:
+        if "error" in attrs:
+            current.error = attrs.pop("error")
+        current.set(**attrs)
+
+def bind(fn):
+    """Wrap fn to run in a copy of the caller's trace context, for work handed to thread pools."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+def register_collector(collector):
+    """Add a callable returning Prometheus text to what /metrics serves."""
+    _collectors.append(collector)
+
+def metrics_text():
+    return get_span_metrics().prometheus_text() + "".join(collector() for collector in list(_collectors))
+
+@lru_cache(maxsize=1)
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics in the Prometheus text format from a daemon thread; no-op when port is 0."""
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        # Another server process on this host already owns the port.
+        logger.warning(f"Metrics endpoint not started on port {port}: {str(e)}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on {host}:{port}/metrics")
+    return server
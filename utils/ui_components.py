@@ -1,40 +1,77 @@
 import streamlit as st
 import pandas as pd
+import os
 from datetime import datetime
-from utils.config import DEFAULT_KEYWORDS
+from utils.config import DEFAULT_KEYWORDS, BATCH_RESULTS_PAGE_SIZE, TEMPLATE_PAGE_SIZE
+from utils.jobs import read_job_results
+from utils.template_store import get_template_store
 
-def analyze_news_relevance(articles_dict, summaries_dict, product_keywords):
+def analyze_news_relevance(account_summary, metrics, company=None):
+    """Cross-account relevance overview plus one account's articles, from the precomputed metrics table."""
     st.subheader("📊 News Relevance Analysis")
-    if not articles_dict:
+    if metrics.empty:
         st.info("No news data available.")
         return
-    for company, articles in articles_dict.items():
-        if not articles:
-            continue
-        with st.expander(f"Relevance Analysis for {company}"):
-            metrics = []
-            for article in articles:
-                metrics.append({
-                    'title': article.get('title', '')[:50] + "...",
-                    'score': article.get('relevance_score', 0),
-                    'company_mentions': article.get('relevance_details', {}).get('company_mentions', 0),
-                    'keyword_matches': len(article.get('relevance_details', {}).get('keyword_matches', [])),
-                    'date': article.get('publishedAt', '')[:10],
-                    'source': article.get('source', 'Unknown'),
-                    'is_competitor': article.get('is_competitor', False)
-                })
-            df = pd.DataFrame(metrics)
-            if len(df) > 0:
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Average Relevance Score", f"{df['score'].mean():.1f}")
-                with col2:
-                    st.metric("Company Mentions", f"{df['company_mentions'].sum()}")
-                with col3:
-                    st.metric("Keyword Matches", f"{df['keyword_matches'].sum()}")
-                st.bar_chart(df.set_index('title')['score'])
-            else:
-                st.info(f"No relevant articles foundcq for {company}.")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Accounts", f"{len(account_summary)}")
+    with col2:
+        st.metric("Articles", f"{len(metrics)}")
+    with col3:
+        st.metric("Average Relevance Score", f"{metrics['score'].mean():.1f}")
+    st.markdown("### Relevance by Account")
+    st.dataframe(account_summary.round(1), use_container_width=True)
+    st.bar_chart(account_summary['avg_score'].head(25))
+
+    if company is None:
+        return
+    company_metrics = metrics[metrics['company'] == company]
+    st.markdown(f"### Relevance Analysis for {company}")
+    if company_metrics.empty:
+        st.info(f"No relevant articles found for {company}.")
+        return
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Average Relevance Score", f"{company_metrics['score'].mean():.1f}")
+    with col2:
+        st.metric("Company Mentions", f"{company_metrics['company_mentions'].sum()}")
+    with col3:
+        st.metric("Keyword Matches", f"{company_metrics['keyword_matches'].sum()}")
+    st.bar_chart(company_metrics.assign(title=company_metrics['title'].str.slice(0, 50) + "...").set_index('title')['score'])
+
+def display_timing_breakdown(breakdown):
+    """Where one generation's time went: seconds, calls, bytes and tokens per traced stage."""
+    if not breakdown:
+        return
+    with st.expander("⏱ Timing Breakdown", expanded=False):
+        # The root span covers the whole run; the rest are its stages (nested stages overlap).
+        total, stages = breakdown[0], pd.DataFrame(breakdown[1:])
+        st.metric("Total Time", f"{total['seconds']:.1f}s")
+        if stages.empty:
+            return
+        stages = stages.set_index("stage")
+        st.dataframe(stages.round(3), use_container_width=True)
+        st.bar_chart(stages["seconds"])
+
+def display_llm_usage(store, user, days=30):
+    """The user's LLM spend today against the daily budget, and the last `days` by stage and by account."""
+    from utils.config import LLM_USER_DAILY_BUDGET
+    from utils.metering import get_budget_tracker
+    spent = get_budget_tracker().spent_today(user)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Spent Today", f"${spent:.4f}")
+    with col2:
+        st.metric("Daily Budget", f"${LLM_USER_DAILY_BUDGET:.2f}" if LLM_USER_DAILY_BUDGET > 0 else "Unlimited")
+    since = datetime.now().timestamp() - days * 86400
+    by_stage = store.summary(("stage", "prompt_version"), user=user, since=since)
+    if not by_stage:
+        st.info(f"No LLM usage in the last {days} days.")
+        return
+    st.markdown(f"**By stage (last {days} days)**")
+    st.dataframe(pd.DataFrame(by_stage), use_container_width=True, hide_index=True)
+    st.markdown("**Top accounts**")
+    st.dataframe(pd.DataFrame(store.summary(("company",), user=user, since=since, limit=20)), use_container_width=True, hide_index=True)
 
 def display_news_articles(articles_dict, product_keywords=None):
     st.subheader("📰 News Articles")
@@ -82,8 +119,9 @@ def display_news_articles(articles_dict, product_keywords=None):
                             metrics_text.append(f"Article age: {details['recency_days']} days old")
                         st.markdown("• " + "\n• ".join(metrics_text))
                     st.markdown("### Content:")
-                    if 'full_content' in article and article['full_content']:
-                        content = article['full_content'][:1000] + "..." if len(article['full_content']) > 1000 else article['full_content']
+                    full_content = article.get('full_content')  # decompressed on each read
+                    if full_content:
+                        content = full_content[:1000] + "..." if len(full_content) > 1000 else full_content
                     elif 'content' in article and article['content']:
                         content = article['content']
                     else:
@@ -128,38 +166,154 @@ def display_sales_context(sales_context_dict):
 def save_email_template(email_content, template_name):
     if not email_content or not template_name:
         return False
-    if 'email_templates' not in st.session_state:
-        st.session_state.email_templates = {}
-    st.session_state.email_templates[template_name] = email_content
-    return True
-
-def load_email_template():
-    if 'email_templates' not in st.session_state or not st.session_state.email_templates:
-        st.info("No saved templates found.")
-        return None
-    template_name = st.selectbox("Select a template:", list(st.session_state.email_templates.keys()))
-    if template_name:
-        st.session_state.selected_template = template_name
-        return st.session_state.email_templates[template_name]
-    return None
-
-def display_multiple_emails(batch_emails):
+    return get_template_store().save(st.session_state.user["email"], template_name, email_content)
+
+def save_email_templates(templates):
+    """Save several {template_name: email_content} templates in one write."""
+    templates = {name: content for name, content in templates.items() if name and content}
+    return get_template_store().save_many(st.session_state.user["email"], templates) if templates else 0
+
+def display_template_library(owner, page_size=TEMPLATE_PAGE_SIZE, key="templates"):
+    """Search the user's saved templates by name or content words (prefix match), one page at a time."""
+    store = get_template_store()
+    query = st.text_input("Search templates (name or content):", key=f"{key}_search", on_change=_set_results_page, args=(key, 0))
+    page = st.session_state.get(f"{key}_page", 0)
+    rows, total = store.search(owner, query, limit=page_size, offset=page * page_size)
+    if total == 0:
+        st.info("No templates match this search." if query.strip() else "No saved templates yet. Save templates in the Email Generator tab.")
+        return
+    page_count = (total + page_size - 1) // page_size
+    if page >= page_count:
+        page = page_count - 1
+        rows, total = store.search(owner, query, limit=page_size, offset=page * page_size)
+
+    st.dataframe(pd.DataFrame([{
+        "Template": row['name'],
+        "Saved": datetime.fromtimestamp(row['updated_at']).strftime('%Y-%m-%d %H:%M'),
+        "Preview": row['preview'].replace("\n", " "),
+    } for row in rows]), hide_index=True, use_container_width=True)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", key=f"{key}_prev", disabled=page == 0, on_click=_set_results_page, args=(key, page - 1))
+    with col2:
+        st.caption(f"Page {page + 1} of {page_count} ({total} templates)")
+    with col3:
+        st.button("Next ▶", key=f"{key}_next", disabled=page >= page_count - 1, on_click=_set_results_page, args=(key, page + 1))
+
+    template_name = st.selectbox("Select a template:", [row['name'] for row in rows], key=f"{key}_open")
+    template_content = store.get(owner, template_name)
+    if template_content is None:
+        return
+    st.text_area("Template Content", template_content, height=400, key=f"{key}_body_{template_name}")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Copy Template", key=f"{key}_copy"):
+            st.success("✅ Template copied to clipboard!")
+    with col2:
+        if st.button("Delete Template", key=f"{key}_delete"):
+            store.delete(owner, template_name)
+            st.success(f"✅ Template '{template_name}' deleted!")
+            st.rerun()
+
+def filter_batch_emails(batch_emails, query="", status="All"):
+    """Indices of the emails matching a prospect search (name, email or company) and status."""
+    query = query.strip().lower()
+    matches = []
+    for i, email_data in enumerate(batch_emails):
+        if status != "All" and email_data.get('status', 'ok') != status:
+            continue
+        if query and not any(query in str(email_data.get(field, '')).lower() for field in ('prospect_name', 'prospect_email', 'prospect_company')):
+            continue
+        matches.append(i)
+    return matches
+
+def _set_results_page(key, page):
+    st.session_state[f"{key}_page"] = page
+
+def display_multiple_emails(batch_emails, page_size=BATCH_RESULTS_PAGE_SIZE, key="batch_results"):
+    """Paginated batch results: one summary table per page, and only the selected email is rendered in full.
+
+    The widget count stays the same however many emails the batch produced, so reruns
+    triggered by these controls cost the same for 10 or 10,000 prospects.
+    """
     if not batch_emails:
         st.info("No emails generated.")
         return
-    for i, email_data in enumerate(batch_emails):
-        with st.expander(f"Email {i+1}: To {email_data['prospect_name']} ({email_data['prospect_email']})"):
-            st.text_area("", email_data['email_content'], height=300, key=f"email_{i}")
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("Copy to Clipboard", key=f"copy_{i}"):
-                    st.success(f"✅ Email for {email_data['prospect_name']} copied to clipboard!")
-            with col2:
-                filename = f"email_{email_data['prospect_email'].replace('@', '_')}_{datetime.now().strftime('%Y%m%d')}.txt"
-                st.download_button(
-                    label="Download Email",
-                    data=email_data['email_content'],
-                    file_name=filename,
-                    mime="text/plain",
-                    key=f"download_{i}"
-                )
\ No newline at end of file
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("Search prospects (name, email or company):", key=f"{key}_search", on_change=_set_results_page, args=(key, 0))
+    with col2:
+        status = st.selectbox("Status:", ["All", "ok", "error"], key=f"{key}_status", on_change=_set_results_page, args=(key, 0))
+    matches = filter_batch_emails(batch_emails, query, status)
+    if not matches:
+        st.info("No emails match this search.")
+        return
+    page_count = (len(matches) + page_size - 1) // page_size
+    page = min(st.session_state.get(f"{key}_page", 0), page_count - 1)
+    page_indices = matches[page * page_size:(page + 1) * page_size]
+
+    st.dataframe(pd.DataFrame([{
+        "#": i + 1,
+        "Prospect": batch_emails[i].get('prospect_name', ''),
+        "Email": batch_emails[i].get('prospect_email', ''),
+        "Company": batch_emails[i].get('prospect_company', ''),
+        "Status": batch_emails[i].get('status', 'ok'),
+        "Preview": batch_emails[i].get('email_content', '')[:80].replace("\n", " "),
+    } for i in page_indices]), hide_index=True, use_container_width=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Previous", key=f"{key}_prev", disabled=page == 0, on_click=_set_results_page, args=(key, page - 1))
+    with col2:
+        st.caption(f"Page {page + 1} of {page_count} ({len(matches)} of {len(batch_emails)} emails)")
+    with col3:
+        st.button("Next ▶", key=f"{key}_next", disabled=page >= page_count - 1, on_click=_set_results_page, args=(key, page + 1))
+
+    labels = [f"Email {i + 1}: To {batch_emails[i].get('prospect_name', '')} ({batch_emails[i].get('prospect_email', '')})" for i in page_indices]
+    selected = page_indices[labels.index(st.selectbox("Open email:", labels, key=f"{key}_open"))]
+    email_data = batch_emails[selected]
+    if email_data.get('error'):
+        st.warning(f"Generation failed: {email_data['error']}")
+    st.text_area("Email", email_data['email_content'], height=300, key=f"{key}_body_{selected}", label_visibility="collapsed")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Copy to Clipboard", key=f"{key}_copy"):
+            st.success(f"✅ Email for {email_data['prospect_name']} copied to clipboard!")
+    with col2:
+        filename = f"email_{email_data['prospect_email'].replace('@', '_')}_{datetime.now().strftime('%Y%m%d')}.txt"
+        st.download_button(
+            label="Download Email",
+            data=email_data['email_content'],
+            file_name=filename,
+            mime="text/plain",
+            key=f"{key}_download"
+        )
+
+def display_batch_jobs(queue, owner):
+    st.subheader("🗂 Background Batch Jobs")
+    if st.button("Refresh job status"):
+        st.rerun()
+    jobs = queue.list_jobs(owner)
+    if not jobs:
+        st.info("No background jobs yet. Tick 'Run CSV batch as a background job' when uploading a CSV.")
+        return
+    st.caption(f"Jobs waiting for a worker: {queue.queue_depth()}")
+    for job in jobs:
+        created = datetime.fromtimestamp(job['created_at']).strftime('%Y-%m-%d %H:%M')
+        with st.expander(f"Job {job['id']} ({job['status']}) - {job['processed']}/{job['total']} prospects, created {created}"):
+            st.progress(min(job['processed'] / max(1, job['total']), 1.0))
+            if job['errors']:
+                st.warning(f"{job['errors']} prospects failed; see their results below.")
+            if job['error']:
+                st.error(f"Job failed: {job['error']}")
+            if job['status'] == 'queued' and st.button("Cancel job", key=f"cancel_{job['id']}"):
+                queue.cancel(job['id'], owner)
+                st.rerun()
+            download_path = job['export_path'] if job['status'] == 'done' and job['export_path'] else job['output_path']
+            if job['status'] == 'done' and os.path.exists(download_path):
+                with open(download_path, "rb") as f:
+                    st.download_button("Download results", data=f, file_name=os.path.basename(download_path), key=f"job_download_{job['id']}")
+            records = read_job_results(job, limit=5)
+            for record in records:
+                st.markdown(f"**Row {record['row'] + 1}: {record['prospect_name']}** ({record['prospect_email']}) - {record['status']}")
+                st.text(record['email_content'][:500] + ("..." if len(record['email_content']) > 500 else ""))
@@ -0,0 +1,84 @@
+import logging
+import os
+import sqlite3
+import time
+from functools import lru_cache
+from utils.config import USAGE_DB_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Columns usage can be grouped by in summary()
+GROUP_COLUMNS = ("user", "company", "stage", "prompt_version", "provider", "day")
+
+class UsageStore:
+    """One row per LLM call: tokens and cost, attributed to user, prospect company, stage and prompt version."""
+
+    def __init__(self, path=USAGE_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS llm_usage (
+                    id INTEGER PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    user TEXT NOT NULL DEFAULT '',
+                    company TEXT NOT NULL DEFAULT '',
+                    stage TEXT NOT NULL DEFAULT '',
+                    prompt_version TEXT NOT NULL DEFAULT '',
+                    provider TEXT NOT NULL DEFAULT '',
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    cost REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_llm_usage_user_created ON llm_usage (user, created_at);
+                CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage (created_at);
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL with synchronous=NORMAL: a metered call costs an append, not an fsync.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record(self, user, company, stage, prompt_version, provider, prompt_tokens, completion_tokens, cost, created_at=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO llm_usage (created_at, user, company, stage, prompt_version, provider, prompt_tokens, completion_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (created_at or time.time(), user or "", company or "", stage or "", prompt_version or "", provider or "", prompt_tokens, completion_tokens, cost)
+            )
+
+    def spend_since(self, user, since):
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(cost), 0) FROM llm_usage WHERE user = ? AND created_at >= ?", (user, since)).fetchone()[0]
+
+    def summary(self, group_by=("stage",), user=None, since=None, limit=None):
+        """Calls, tokens and cost per group, most expensive first; `day` groups by UTC date."""
+        for column in group_by:
+            if column not in GROUP_COLUMNS:
+                raise ValueError(f"Cannot group LLM usage by '{column}'. Choose from {', '.join(GROUP_COLUMNS)}.")
+        columns = ", ".join("date(created_at, 'unixepoch') AS day" if c == "day" else c for c in group_by)
+        where, params = [], []
+        if user is not None:
+            where.append("user = ?")
+            params.append(user)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        sql = (
+            f"SELECT {columns}{', ' if columns else ''}COUNT(*) AS calls, SUM(prompt_tokens) AS prompt_tokens, "
+            f"SUM(completion_tokens) AS completion_tokens, SUM(cost) AS cost FROM llm_usage"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + (f" GROUP BY {', '.join(group_by)}" if group_by else "")
+            + " ORDER BY cost DESC"
+            + (" LIMIT ?" if limit else "")
+        )
+        with self._connect() as conn:
+            rows = conn.execute(sql, (*params, limit) if limit else params).fetchall()
+        return [dict(row) for row in rows if row["calls"]]
+
+@lru_cache(maxsize=1)
+def get_usage_store():
+    return UsageStore()
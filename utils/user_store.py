@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from utils.config import USERS_DB_PATH, USERS_JSON_PATH
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = (
+    "salesperson_name", "salesperson_title", "salesperson_company", "salesperson_email",
+    "salesperson_mobile", "salesperson_website", "salesperson_linkedin",
+)
+
+class UserStore:
+    """User accounts in SQLite, keyed by login email.
+
+    Lookups go through the primary key index, and every write is a single transaction,
+    so concurrent signups from several sessions or server processes cannot overwrite
+    each other the way whole-file rewrites of users.json could.
+    """
+
+    def __init__(self, path=USERS_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS users (
+                    email TEXT PRIMARY KEY,
+                    {", ".join(f"{field} TEXT NOT NULL DEFAULT ''" for field in PROFILE_FIELDS)},
+                    password TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, email):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return dict(row) if row else None
+
+    def create(self, email, profile, password, created_at=None):
+        """Insert a user; returns False if the email is already registered."""
+        values = [profile.get(field, "") or "" for field in PROFILE_FIELDS]
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    f"INSERT INTO users (email, {', '.join(PROFILE_FIELDS)}, password, created_at) VALUES ({', '.join('?' * (len(PROFILE_FIELDS) + 3))})",
+                    (email, *values, password, created_at or datetime.now().isoformat())
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def update_profile(self, email, profile):
+        """Update the given profile fields; returns False if the user does not exist."""
+        fields = [field for field in PROFILE_FIELDS if field in profile]
+        if not fields:
+            return self.get(email) is not None
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE users SET {', '.join(f'{field} = ?' for field in fields)} WHERE email = ?",
+                (*(profile[field] or "" for field in fields), email)
+            )
+        return cursor.rowcount > 0
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def import_json(self, json_path):
+        """One-time import of a legacy users.json; the file is renamed afterwards so it is not read again."""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                users = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read {json_path} for migration: {str(e)}")
+            return 0
+        rows = [
+            (email, *[user.get(field, "") or "" for field in PROFILE_FIELDS], user.get("password", ""), user.get("created_at") or datetime.now().isoformat())
+            for email, user in users.items()
+        ]
+        with self._connect() as conn:
+            # OR IGNORE: accounts created in SQLite before a rerun of the migration win.
+            conn.executemany(
+                f"INSERT OR IGNORE INTO users (email, {', '.join(PROFILE_FIELDS)}, password, created_at) VALUES ({', '.join('?' * (len(PROFILE_FIELDS) + 3))})",
+                rows
+            )
+        try:
+            os.replace(json_path, f"{json_path}.migrated")
+        except FileNotFoundError:
+            pass  # another server process migrated the same file first
+        logger.info(f"Migrated {len(rows)} users from {json_path} to {self.path}")
+        return len(rows)
+
+@lru_cache(maxsize=1)
+def get_user_store():
+    store = UserStore()
+    store.import_json(USERS_JSON_PATH)
+    return store
@@ -0,0 +1,101 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+from utils.batch import run_batch_file, export_results
+from utils.jobs import get_job_queue
+from utils.llm import get_llm_provider
+from utils.sales_context import setup_graph
+from utils.tracing import start_metrics_server
+from utils.metering import attribution
+from utils.config import news_api_key, JOB_POLL_INTERVAL, JOB_STALE_SECONDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def process_job(queue, job, llm, graph):
+    params = job["params"]
+    settings = {**params["settings"], "news_api_key": news_api_key}
+    progress = {"processed": 0, "errors": 0, "reported_at": 0.0}
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        # Rows can take minutes; keep the job claimed even when no result lands for a while.
+        while not stop_heartbeat.wait(JOB_STALE_SECONDS / 4):
+            queue.heartbeat(job["id"])
+
+    def on_result(index, row, record):
+        progress["processed"] += 1
+        progress["errors"] += record["status"] == "error"
+        if time.time() - progress["reported_at"] > 1:
+            queue.update_progress(job["id"], progress["processed"], progress["errors"])
+            progress["reported_at"] = time.time()
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    try:
+        with attribution(user=job["owner"]):
+            summary = run_batch_file(
+                job["input_path"], job["output_path"], params["base_email_data"], settings, llm, graph,
+                params.get("stage_concurrency"), on_result=on_result
+            )
+        queue.update_progress(job["id"], summary["processed"], summary["errors"])
+        if job.get("export_path"):
+            export_results(job["output_path"], job["export_path"], params["base_email_data"])
+        queue.finish(job["id"], "done")
+        logger.info(f"Job {job['id']} done: {summary['processed']} rows in {summary['elapsed']:.1f}s")
+    except Exception as e:
+        logger.error(f"Job {job['id']} failed: {str(e)}")
+        queue.finish(job["id"], "failed", str(e))
+    finally:
+        stop_heartbeat.set()
+
+def worker_loop(worker_number, poll_interval=JOB_POLL_INTERVAL, run_once=False):
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{worker_number}"
+    queue = get_job_queue()
+    llm = get_llm_provider()
+    graph = setup_graph(llm)
+    start_metrics_server()  # with several worker processes, the first to bind METRICS_PORT serves it
+    logger.info(f"Worker {worker_id} waiting for batch jobs")
+    while True:
+        job = queue.claim_next(worker_id)
+        if job:
+            logger.info(f"Worker {worker_id} claimed job {job['id']} ({job['total']} prospects)")
+            process_job(queue, job, llm, graph)
+        elif run_once:
+            return
+        else:
+            time.sleep(poll_interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background workers for batch email jobs submitted from the app.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Worker processes to start")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+    args = parser.parse_args(argv)
+    if not news_api_key:
+        print("Missing API key: NEWS_API! Set it in your .env file.", file=sys.stderr)
+        return 1
+    if args.processes <= 1:
+        worker_loop(0, args.poll_interval, args.once)
+        return 0
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(number, args.poll_interval, args.once), name=f"batch-worker-{number}")
+        for number in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())